@@ -0,0 +1,315 @@
+# Arena for standalone bots: any program speaking the stdin/stdout protocol.
+#
+# Each game runs both bots as subprocesses, many games at once on one asyncio loop. The turn
+# time limits are real wall-clock timeouts: a late answer loses the game, as on the contest
+# servers. --cpu-share runs each bot only that fraction of the time (SIGSTOP/SIGCONT in 10ms
+# slices) to approach slower contest hardware. The response times of each bot are reported,
+# to find timeout risks before submitting:
+#
+#   python arena.py "python3 main.py" "python3 old/main.py" --games 20 --parallel 4
+#   python arena.py "python3 main.py" "./opponent" --cpu-share 0.5 --stderr-dir logs/
+#   python arena.py "python3 main.py" "python3 main.py" --server --games 200   # bulk runs
+
+import argparse
+import asyncio
+import os
+import shlex
+import signal
+import sys
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from referee import (
+    Command,
+    Game,
+    GameResult,
+    InvalidCommand,
+    TIME_FIRST_TURN_MS,
+    TIME_PER_TURN_MS,
+    format_init,
+    format_turn,
+    parse_command,
+)
+
+THROTTLE_PERIOD_S = 0.010
+
+
+class BotTimeout(Exception):
+    pass
+
+
+class ResponseTimes(NamedTuple):
+    first: List[float]  # ms, first turn of each game
+    later: List[float]
+
+
+class BotProcess:
+    def __init__(self, command: List[str], name: str, cpu_share: float = 1.0, stderr_path: Optional[str] = None):
+        self.command = command
+        self.name = name
+        self.cpu_share = cpu_share
+        self.stderr_path = stderr_path
+        self.env: Optional[Dict[str, str]] = None
+        self.proc: Optional[asyncio.subprocess.Process] = None
+        self.tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        self.proc = await asyncio.create_subprocess_exec(
+            *self.command, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE, env=self.env)
+        # the bots debug on stderr: it has to be drained, or they block on a full pipe
+        self.tasks.append(asyncio.create_task(self.drain_stderr()))
+        if self.cpu_share < 1:
+            self.tasks.append(asyncio.create_task(self.throttle()))
+
+    async def drain_stderr(self):
+        out = open(self.stderr_path, "wb") if self.stderr_path else None
+        try:
+            while True:
+                chunk = await self.proc.stderr.read(65536)  # type:ignore
+                if not chunk:
+                    break
+                if out:
+                    out.write(chunk)
+        finally:
+            if out:
+                out.close()
+
+    async def throttle(self):
+        running = THROTTLE_PERIOD_S * self.cpu_share
+        pid = self.proc.pid  # type:ignore
+        try:
+            while self.proc.returncode is None:  # type:ignore
+                await asyncio.sleep(running)
+                os.kill(pid, signal.SIGSTOP)
+                await asyncio.sleep(THROTTLE_PERIOD_S - running)
+                os.kill(pid, signal.SIGCONT)
+        except ProcessLookupError:
+            pass
+
+    async def play(self, lines: List[str], answers: int, timeout_ms: float) -> List[str]:
+        # send a turn, then wait for one command per drone; returns the commands and the time they took
+        self.proc.stdin.write(("\n".join(lines) + "\n").encode())  # type:ignore
+        await self.proc.stdin.drain()  # type:ignore
+        commands = []
+
+        async def read_answers():
+            for _ in range(answers):
+                line = await self.proc.stdout.readline()  # type:ignore
+                if not line:
+                    raise InvalidCommand(f"{self.name} exited (code {self.proc.returncode})")  # type:ignore
+                commands.append(line.decode().strip())
+
+        try:
+            await asyncio.wait_for(read_answers(), timeout_ms / 1000)
+        except asyncio.TimeoutError:
+            raise BotTimeout(f"{self.name} answered {len(commands)}/{answers} commands within {timeout_ms:.0f}ms")
+        return commands
+
+    async def stop(self):
+        if self.proc and self.proc.returncode is None:
+            try:
+                os.kill(self.proc.pid, signal.SIGCONT)
+                self.proc.kill()
+            except ProcessLookupError:
+                pass
+            await self.proc.wait()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+class BotServer(BotProcess):
+    # One long-lived bot process playing all the games of a run (UTG_SERVE=1, see serve() in
+    # extras.py): saves an interpreter start and the imports per game. The server plays one turn
+    # at a time, so turns queue behind each other: time limits are not enforced in this mode.
+    def __init__(self, command: List[str], name: str):
+        super().__init__(command, name)
+        self.env = dict(os.environ, UTG_SERVE="1")
+        self.pending: Dict[str, asyncio.Future] = {}
+
+    async def start(self):
+        await super().start()
+        self.tasks.append(asyncio.create_task(self.dispatch()))
+
+    async def dispatch(self):
+        stdout = self.proc.stdout  # type:ignore
+        while True:
+            header = await stdout.readline()
+            if not header:
+                break
+            game_id, count = header.decode().split()
+            commands = [(await stdout.readline()).decode().strip() for _ in range(int(count))]
+            self.pending.pop(game_id).set_result(commands)
+        for future in self.pending.values():
+            future.set_exception(InvalidCommand(f"{self.name} exited (code {self.proc.returncode})"))  # type:ignore
+
+    def send(self, game_id: str, lines: List[str]):
+        message = [f"{game_id} {len(lines)}"] + lines if lines else [f"{game_id} END"]
+        self.proc.stdin.write(("\n".join(message) + "\n").encode())  # type:ignore
+
+    async def request(self, game_id: str, lines: List[str]) -> List[str]:
+        future = asyncio.get_running_loop().create_future()
+        self.pending[game_id] = future
+        self.send(game_id, lines)
+        await self.proc.stdin.drain()  # type:ignore
+        return await future
+
+
+class ServerGame:
+    # one game of a BotServer, with the interface of a BotProcess
+    def __init__(self, server: BotServer, game_id: str):
+        self.server = server
+        self.game_id = game_id
+        self.name = server.name
+
+    async def start(self):
+        pass
+
+    async def play(self, lines: List[str], answers: int, timeout_ms: float) -> List[str]:
+        commands = await self.server.request(self.game_id, lines)
+        if len(commands) != answers:
+            raise InvalidCommand(f"{self.name} sent {len(commands)}/{answers} commands")
+        return commands
+
+    async def stop(self):
+        if self.server.proc and self.server.proc.returncode is None:
+            self.server.send(self.game_id, [])
+
+
+async def play_game(seed: int, bots: List[Any], times: Dict[str, ResponseTimes]) -> GameResult:
+    # bots: BotProcess or ServerGame, one per player
+    game = Game(seed)
+    error = None
+    loser = None
+    try:
+        for bot in bots:
+            await bot.start()
+        init = format_init(game.init_view())
+        while not game.over and loser is None:
+            first = game.turn == 0
+            timeout_ms = TIME_FIRST_TURN_MS if first else TIME_PER_TURN_MS
+            turn_commands: Dict[int, Command] = {}
+            for player, bot in enumerate(bots):
+                drones = game.player_drones(player)
+                lines = format_turn(game.view(player))
+                start = time.perf_counter()
+                try:
+                    answers = await bot.play(init + lines if first else lines, len(drones), timeout_ms)
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    (times[bot.name].first if first else times[bot.name].later).append(elapsed_ms)
+                    for d, answer in zip(drones, answers):
+                        turn_commands[d.drone_id] = parse_command(answer)
+                except (BotTimeout, InvalidCommand, ConnectionError) as e:
+                    error = f"player {player} turn {game.turn}: {type(e).__name__}: {e}"
+                    loser = player
+                    break
+            if loser is None:
+                game.step(turn_commands)
+    finally:
+        await asyncio.gather(*(bot.stop() for bot in bots))
+    winner = game.winner() if loser is None else 1 - loser
+    return GameResult(seed, game.scores, game.turn, winner, error)
+
+
+async def run_arena(commands: List[List[str]], names: List[str], seeds: List[int], parallel: int,
+                    cpu_share: float = 1.0, stderr_dir: Optional[str] = None, server: bool = False):
+    times = {name: ResponseTimes([], []) for name in names}
+    limit = asyncio.Semaphore(parallel)
+    servers = []
+    if server:
+        servers = [BotServer(command, name) for command, name in zip(commands, names)]
+        for s in servers:
+            await s.start()
+
+    def make_bot(i, seed, player):
+        if server:
+            return ServerGame(servers[i], f"{seed}-{player}")
+        stderr_path = os.path.join(stderr_dir, f"seed{seed}-p{player}.log") if stderr_dir else None
+        return BotProcess(commands[i], names[i], cpu_share, stderr_path)
+
+    errors = []  # games lost on a timeout, a crash or an invalid command
+
+    async def one(seed, swap):
+        order = [1, 0] if swap else [0, 1]
+        async with limit:
+            result = await play_game(seed, [make_bot(i, seed, player) for player, i in enumerate(order)], times)
+        if result.error:
+            errors.append(result.error)
+        scores = result.scores[::-1] if swap else result.scores
+        winner = None if result.winner is None else order[result.winner]
+        print(f"seed {seed}{' (swapped)' if swap else ''}: {names[0]} {scores[0]} - {scores[1]} {names[1]}"
+              f" in {result.turns} turns{'' if winner is None else f', {names[winner]} wins'}"
+              f"{f' ({result.error})' if result.error else ''}", flush=True)
+        return winner
+
+    try:
+        winners = await asyncio.gather(*(one(seed, swap) for seed in seeds for swap in (False, True)))
+    finally:
+        for s in servers:
+            await s.stop()
+    return winners, times, errors
+
+
+def print_times(times: Dict[str, ResponseTimes], out=sys.stdout):
+    print(f"\n{'bot':20s} {'turns':>6s} {'first':>8s} {'p50':>8s} {'p90':>8s} {'p99':>8s} {'max':>8s} {'>80%':>6s}", file=out)
+    for name, t in times.items():
+        later = sorted(t.later)
+        if not later:
+            continue
+
+        def q(p):
+            return later[min(len(later) - 1, int(len(later) * p))]
+
+        # answers taking most of the budget are the ones that will time out on a busy server
+        risky = len([x for x in later if x > 0.8 * TIME_PER_TURN_MS])
+        print(f"{name:20.20s} {len(later):6d} {max(t.first, default=0):8.1f} {q(0.5):8.1f} {q(0.9):8.1f}"
+              f" {q(0.99):8.1f} {later[-1]:8.1f} {risky:6d}", file=out)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Play standalone bots against each other, with real time limits")
+    parser.add_argument("bot_a", help="command line of the first bot")
+    parser.add_argument("bot_b", help="command line of the second bot")
+    parser.add_argument("--games", type=int, default=10, help="seeds, each played on both sides")
+    parser.add_argument("--seed", type=int, default=0, help="first seed")
+    parser.add_argument("--parallel", type=int, default=os.cpu_count() or 1, help="games in flight")
+    parser.add_argument("--cpu-share", type=float, default=1.0, help="fraction of the time each bot may run")
+    parser.add_argument("--stderr-dir", help="keep the bots' stderr in this directory")
+    parser.add_argument("--server", action="store_true",
+                        help="one long-lived process per bot plays all the games (no time limits)")
+    parser.add_argument("--compare-server", action="store_true",
+                        help="play the games both ways and compare the throughput in games per second"
+                             " (not when a game ends on an error or a timeout)")
+    args = parser.parse_args(argv)
+
+    commands = [shlex.split(args.bot_a), shlex.split(args.bot_b)]
+    names = [args.bot_a, args.bot_b]
+    if names[0] == names[1]:
+        names = [names[0] + " #1", names[1] + " #2"]
+    if args.stderr_dir:
+        os.makedirs(args.stderr_dir, exist_ok=True)
+    seeds = list(range(args.seed, args.seed + args.games))
+    modes = [False, True] if args.compare_server else [args.server]
+    throughput = {}
+    for server in modes:
+        start = time.perf_counter()
+        winners, times, errors = asyncio.run(run_arena(commands, names, seeds, args.parallel, args.cpu_share,
+                                                       args.stderr_dir, server))
+        throughput[server] = len(winners) / (time.perf_counter() - start)
+        wins = [winners.count(0), winners.count(1)]
+        print(f"\n{names[0]}: {wins[0]} wins, {names[1]}: {wins[1]} wins, {winners.count(None)} draws,"
+              f" {len(errors)} ended on an error or a timeout")
+        print_times(times)
+        if errors and args.compare_server:
+            # a game cut short takes less time: the throughputs would not compare the same games
+            print(f"\n{'server' if server else 'process per game'}: {len(errors)} games ended on an error or"
+                  f" a timeout, no throughput comparison")
+            return
+    if args.compare_server:
+        print(f"\nprocess per game: {throughput[False]:.2f} games/s, server: {throughput[True]:.2f} games/s"
+              f" ({throughput[True] / throughput[False]:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
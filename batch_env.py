@@ -0,0 +1,414 @@
+# Batched version of the referee (referee.py): thousands of games stepped at once with numpy.
+#
+# The state of every game lives in arrays with a leading games dimension; creatures are
+# indexed by `fish_id - 4` (padded when a game has fewer monsters) and drones by id.
+# Commands come as arrays too, so simple policies can be evaluated over huge samples:
+#
+#   python batch_env.py --games 10000                 # sinker policy, light every 3 turns
+#   python batch_env.py --games 5000 --depth 7500 --light-every 2
+#   python batch_env.py --games 200 --check           # compare every turn with referee.py
+#
+# The rules and the rounding are the referee's, the results are identical: see
+# check_against_referee(), used by the tests.
+
+import argparse
+import sys
+import time
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from referee import (
+    BATTERY_CAPACITY,
+    BATTERY_DRAIN_POWERFUL_LIGHT,
+    BATTERY_RECHARGE_RATE,
+    BONUS_POINTS_SAME_COLOR,
+    BONUS_POINTS_SAME_TYPE,
+    COLOR_COUNT,
+    Command,
+    DRONE_EMERGENCY_SPEED,
+    DRONE_LIGHT_RADIUS,
+    DRONE_LIGHT_RADIUS_POWERFUL,
+    DRONE_MOVE_SPEED,
+    DRONE_SINK_SPEED,
+    DRONE_SURFACE_Y_THRESHOLD,
+    FIRST_CREATURE_ID,
+    FIRST_TO_SAVE_MULTIPLIER,
+    FISH_AVOID_DISTANCE,
+    FISH_FRIGHTENED_DISTANCE_THRESHOLD,
+    FISH_FRIGHTENED_MOVE_DISTANCE,
+    FISH_MOVE_DISTANCE,
+    Game,
+    MAP_SIZE,
+    MAX_TURNS,
+    MONSTER_AGGRESSIVE_SPEED,
+    MONSTER_DETECTION_EXTRA,
+    MONSTER_INTERACTION_RADIUS,
+    MONSTER_NON_AGGRESSIVE_SPEED,
+    TYPE_COUNT,
+    TYPE_POINTS,
+)
+
+CREATURE_SLOTS = 18  # 12 fish and up to 3 pairs of monsters
+DRONE_COUNT = 4
+OWNER = np.arange(DRONE_COUNT) % 2  # drone id -> player
+FAR = np.iinfo(np.int64).max
+
+# the state arrays, in the order of BatchEnv.pack
+STATE_FIELDS = (
+    "exists", "is_monster", "color", "type", "min_y", "max_y",
+    "cx", "cy", "cvx", "cvy", "alive", "frightened",
+    "dx", "dy", "battery", "light", "emergency", "scans",
+    "saved", "color_combos", "type_combos", "scores", "turn", "over",
+)
+
+
+class Commands(NamedTuple):
+    target: np.ndarray  # (games, drones, 2) int, ignored when waiting
+    wait: np.ndarray  # (games, drones) bool
+    light: np.ndarray  # (games, drones) bool
+
+
+def rnd(v: np.ndarray) -> np.ndarray:
+    # half-up, as referee.rnd
+    return np.floor(v + 0.5).astype(np.int64)
+
+
+def normalize(x: np.ndarray, y: np.ndarray, length: float):
+    norm = np.sqrt(x * x + y * y)
+    zero = norm == 0
+    safe = np.where(zero, 1.0, norm)
+    return np.where(zero, 0.0, x * length / safe), np.where(zero, 0.0, y * length / safe)
+
+
+def closest(d2: np.ndarray, within: np.ndarray):
+    # index of the first closest among `within` along the last axis, and whether there is one
+    masked = np.where(within, d2, FAR)
+    return masked.argmin(axis=-1), within.any(axis=-1)
+
+
+class BatchEnv:
+    def __init__(self, seeds: Sequence[int], monster_pairs: Optional[int] = None):
+        self.seeds = np.asarray(seeds)
+        self.pack([Game(int(seed), monster_pairs) for seed in seeds])
+
+    #---------------------------
+    #     State
+    #---------------------------
+    def pack(self, games: List[Game]):
+        # (re)load the state from referee games
+        n, c, d = len(games), CREATURE_SLOTS, DRONE_COUNT
+        self.exists = np.zeros((n, c), bool)
+        self.is_monster = np.zeros((n, c), bool)
+        self.color = np.full((n, c), -1, np.int64)
+        self.type = np.full((n, c), -1, np.int64)
+        self.min_y = np.zeros((n, c), np.int64)
+        self.max_y = np.zeros((n, c), np.int64)
+        self.cx, self.cy, self.cvx, self.cvy = (np.zeros((n, c), np.int64) for _ in range(4))
+        self.alive = np.zeros((n, c), bool)
+        self.frightened = np.zeros((n, c), bool)
+        self.dx, self.dy, self.battery = (np.zeros((n, d), np.int64) for _ in range(3))
+        self.light = np.zeros((n, d), bool)
+        self.emergency = np.zeros((n, d), bool)
+        self.scans = np.zeros((n, d, c), bool)
+        self.saved = np.zeros((n, 2, c), bool)
+        self.color_combos = np.zeros((n, 2, COLOR_COUNT), bool)
+        self.type_combos = np.zeros((n, 2, TYPE_COUNT), bool)
+        self.scores = np.zeros((n, 2), np.int64)
+        self.turn = np.zeros(n, np.int64)
+        self.over = np.zeros(n, bool)
+        for g, game in enumerate(games):
+            for creature in game.creatures:
+                i = creature.fish_id - FIRST_CREATURE_ID
+                self.exists[g, i] = True
+                self.is_monster[g, i] = creature.is_monster
+                self.color[g, i], self.type[g, i] = creature.color, creature.type
+                self.min_y[g, i], self.max_y[g, i] = creature.min_y, creature.max_y
+                self.cx[g, i], self.cy[g, i] = creature.x, creature.y
+                self.cvx[g, i], self.cvy[g, i] = creature.vx, creature.vy
+                self.alive[g, i] = creature.alive
+                self.frightened[g, i] = creature.frightened
+            for drone in game.drones:
+                i = drone.drone_id
+                self.dx[g, i], self.dy[g, i], self.battery[g, i] = drone.x, drone.y, drone.battery
+                self.light[g, i], self.emergency[g, i] = drone.light, drone.emergency
+                self.scans[g, i, [f - FIRST_CREATURE_ID for f in drone.scans]] = True
+            for player in (0, 1):
+                self.saved[g, player, [f - FIRST_CREATURE_ID for f in game.scoring.saved[player]]] = True
+                for kind, key in game.scoring.combos[player]:
+                    (self.color_combos if kind == "color" else self.type_combos)[g, player, key] = True
+            self.scores[g] = game.scores
+            self.turn[g] = game.turn
+            self.over[g] = game.over
+        self.fish = self.exists & ~self.is_monster
+        self.points = np.where(self.fish, np.asarray(TYPE_POINTS)[self.type.clip(0)], 0)
+        # (games, group, creature): the fish of each color / type
+        self.color_groups = self.fish[:, None, :] & (self.color[:, None, :] == np.arange(COLOR_COUNT)[None, :, None])
+        self.type_groups = self.fish[:, None, :] & (self.type[:, None, :] == np.arange(TYPE_COUNT)[None, :, None])
+
+    @property
+    def games(self) -> int:
+        return len(self.seeds)
+
+    #---------------------------
+    #     Turn
+    #---------------------------
+    def step(self, commands: Commands):
+        # games that are over keep their final state
+        frozen = self.over.copy()
+        snapshot = {name: getattr(self, name)[frozen] for name in STATE_FIELDS} if frozen.any() else None
+
+        tx, ty = commands.target[..., 0], commands.target[..., 1]
+        was_emergency = self.emergency
+        self.light = ~was_emergency & commands.light & (self.battery >= BATTERY_DRAIN_POWERFUL_LIGHT)
+        self.battery = np.where(self.light, self.battery - BATTERY_DRAIN_POWERFUL_LIGHT,
+                                np.minimum(BATTERY_CAPACITY, self.battery + BATTERY_RECHARGE_RATE))
+
+        move_x = (tx - self.dx).astype(np.int64)
+        move_y = (ty - self.dy).astype(np.int64)
+        too_far = move_x * move_x + move_y * move_y > DRONE_MOVE_SPEED * DRONE_MOVE_SPEED
+        far_x, far_y = normalize(move_x, move_y, DRONE_MOVE_SPEED)
+        vx = np.where(too_far, far_x, move_x)
+        vy = np.where(too_far, far_y, move_y)
+        vx = np.where(was_emergency | commands.wait, 0.0, vx)
+        vy = np.where(was_emergency, -DRONE_EMERGENCY_SPEED, np.where(commands.wait, DRONE_SINK_SPEED, vy))
+
+        # swept collisions, (games, drones, creatures)
+        px = self.dx[:, :, None] - self.cx[:, None, :]
+        py = self.dy[:, :, None] - self.cy[:, None, :]
+        rvx = vx[:, :, None] - self.cvx[:, None, :]
+        rvy = vy[:, :, None] - self.cvy[:, None, :]
+        speed2 = rvx * rvx + rvy * rvy
+        t = np.clip(-(px * rvx + py * rvy) / np.where(speed2 == 0, 1.0, speed2), 0.0, 1.0)
+        t = np.where(speed2 == 0, 0.0, t)
+        ex, ey = px + rvx * t, py + rvy * t
+        hit = (ex * ex + ey * ey <= MONSTER_INTERACTION_RADIUS * MONSTER_INTERACTION_RADIUS) & self.is_monster[:, None, :]
+        hit = hit.any(axis=-1) & ~was_emergency
+        self.emergency = was_emergency | hit
+        self.light = self.light & ~hit
+        self.scans = self.scans & ~hit[:, :, None]
+
+        self.dx = np.clip(rnd(self.dx + vx), 0, MAP_SIZE - 1)
+        self.dy = np.clip(rnd(self.dy + vy), 0, MAP_SIZE - 1)
+        alive = self.alive
+        cx = np.where(alive, self.cx + self.cvx, self.cx)
+        self.cy = np.where(alive, np.clip(self.cy + self.cvy, self.min_y, self.max_y - 1), self.cy)
+        out = (cx < 0) | (cx > MAP_SIZE - 1)
+        self.cx = np.where(self.is_monster, np.clip(cx, 0, MAP_SIZE - 1), cx)
+        self.alive = alive & ~(out & ~self.is_monster)
+
+        self.scan_and_save()
+        self.update_speeds()
+        self.turn = self.turn + 1
+        self.check_end()
+
+        if snapshot is not None:
+            for name, values in snapshot.items():
+                getattr(self, name)[frozen] = values
+
+    def distance2(self, ax, ay, bx, by):
+        # (games, a, b) squared distances
+        ddx = ax[:, :, None] - bx[:, None, :]
+        ddy = ay[:, :, None] - by[:, None, :]
+        return ddx * ddx + ddy * ddy
+
+    def scan_and_save(self):
+        active = ~self.emergency
+        radius = np.where(self.light, DRONE_LIGHT_RADIUS_POWERFUL, DRONE_LIGHT_RADIUS)
+        in_light = self.distance2(self.dx, self.dy, self.cx, self.cy) <= (radius * radius)[:, :, None]
+        scannable = (self.alive & self.fish)[:, None, :] & ~self.saved[:, OWNER, :] & active[:, :, None]
+        self.scans = self.scans | (in_light & scannable)
+
+        at_surface = self.dy <= DRONE_SURFACE_Y_THRESHOLD
+        saving = at_surface & ~self.emergency
+        self.emergency = self.emergency & ~at_surface  # repaired at the surface
+        carried = self.scans & saving[:, :, None]
+        new_saves = np.stack([carried[:, OWNER == player].any(axis=1) for player in (0, 1)], axis=1)
+        self.scans = self.scans & ~saving[:, :, None]
+        self.save(new_saves)
+        self.scans = self.scans & ~self.saved[:, OWNER, :]
+
+    def save(self, new_saves: np.ndarray):
+        # (games, players, creatures), both players at once: see referee.Scoring.save
+        new_saves = new_saves & ~self.saved
+        first = np.where(self.saved[:, ::-1], 1, FIRST_TO_SAVE_MULTIPLIER)
+        self.scores = self.scores + (new_saves * self.points[:, None, :] * first).sum(axis=-1)
+        self.saved = self.saved | new_saves
+        for name, groups, bonus in (("color_combos", self.color_groups, BONUS_POINTS_SAME_COLOR),
+                                    ("type_combos", self.type_groups, BONUS_POINTS_SAME_TYPE)):
+            combos = getattr(self, name)
+            completed = self.completed(groups, self.saved)
+            new_combos = completed & ~combos
+            first = np.where(combos[:, ::-1], 1, FIRST_TO_SAVE_MULTIPLIER)
+            self.scores = self.scores + (new_combos * bonus * first).sum(axis=-1)
+            setattr(self, name, combos | new_combos)
+
+    @staticmethod
+    def completed(groups: np.ndarray, saved: np.ndarray) -> np.ndarray:
+        # (games, players, group): every fish of the group is in `saved`
+        return (saved[:, :, None, :] | ~groups[:, None, :, :]).all(axis=-1) & groups.any(axis=-1)[:, None, :]
+
+    def update_speeds(self):
+        active = ~self.emergency
+        fish = self.alive & self.fish
+        n = np.arange(CREATURE_SLOTS)
+        not_self = n[:, None] != n[None, :]
+        g = np.arange(self.games)[:, None]
+
+        to_drones = self.distance2(self.cx, self.cy, self.dx, self.dy)  # (games, creatures, drones)
+        threat, frightened = closest(to_drones, active[:, None, :] & (to_drones <= FISH_FRIGHTENED_DISTANCE_THRESHOLD ** 2))
+        flee_x, flee_y = normalize(self.cx - self.dx[g, threat], self.cy - self.dy[g, threat], FISH_FRIGHTENED_MOVE_DISTANCE)
+
+        between = self.distance2(self.cx, self.cy, self.cx, self.cy)  # (games, creatures, creatures)
+        neighbour, crowded = closest(between, fish[:, None, :] & not_self & (between <= FISH_AVOID_DISTANCE ** 2))
+        avoid_x, avoid_y = normalize(self.cx - self.cx[g, neighbour], self.cy - self.cy[g, neighbour], FISH_MOVE_DISTANCE)
+        swim_x, swim_y = normalize(self.cvx, self.cvy, FISH_MOVE_DISTANCE)
+        fish_vx = rnd(np.where(frightened, flee_x, np.where(crowded, avoid_x, swim_x)))
+        fish_vy = rnd(np.where(frightened, flee_y, np.where(crowded, avoid_y, swim_y)))
+
+        detection = np.where(self.light, DRONE_LIGHT_RADIUS_POWERFUL, DRONE_LIGHT_RADIUS) + MONSTER_DETECTION_EXTRA
+        prey, chasing = closest(to_drones, active[:, None, :] & (to_drones <= (detection * detection)[:, None, :]))
+        chase_x, chase_y = normalize(self.dx[g, prey] - self.cx, self.dy[g, prey] - self.cy, MONSTER_AGGRESSIVE_SPEED)
+        other, close = closest(between, self.is_monster[:, None, :] & not_self & (between <= FISH_AVOID_DISTANCE ** 2))
+        away_x, away_y = normalize(self.cx - self.cx[g, other], self.cy - self.cy[g, other], MONSTER_NON_AGGRESSIVE_SPEED)
+        slow_x, slow_y = normalize(self.cvx, self.cvy, MONSTER_NON_AGGRESSIVE_SPEED)
+        monster_vx = rnd(np.where(chasing, chase_x, np.where(close, away_x, slow_x)))
+        monster_vy = rnd(np.where(chasing, chase_y, np.where(close, away_y, slow_y)))
+
+        vx = np.where(fish, fish_vx, np.where(self.is_monster, monster_vx, self.cvx))
+        vy = np.where(fish, fish_vy, np.where(self.is_monster, monster_vy, self.cvy))
+        self.frightened = np.where(fish, frightened, self.frightened)
+        # rebound on the habitat, and on the sides unless fleeing
+        moving = fish | self.is_monster
+        vy = np.where(moving & ((self.cy + vy < self.min_y) | (self.cy + vy > self.max_y - 1)), -vy, vy)
+        side = moving & ~(fish & self.frightened) & ((self.cx + vx < 0) | (self.cx + vx > MAP_SIZE - 1))
+        self.cvx, self.cvy = np.where(side, -vx, vx), vy
+
+    def max_scores(self) -> np.ndarray:
+        # (games, players): see referee.Scoring.max_score
+        carried = np.stack([self.scans[:, OWNER == player].any(axis=1) for player in (0, 1)], axis=1)
+        obtainable = (self.alive & self.fish)[:, None, :] | carried
+        first = np.where(self.saved[:, ::-1], 1, FIRST_TO_SAVE_MULTIPLIER)
+        scores = self.scores + ((obtainable & ~self.saved) * self.points[:, None, :] * first).sum(axis=-1)
+        reachable = self.saved | obtainable
+        for combos, groups, bonus in ((self.color_combos, self.color_groups, BONUS_POINTS_SAME_COLOR),
+                                      (self.type_combos, self.type_groups, BONUS_POINTS_SAME_TYPE)):
+            possible = self.completed(groups, reachable) & ~combos
+            scores = scores + (possible * bonus * np.where(combos[:, ::-1], 1, FIRST_TO_SAVE_MULTIPLIER)).sum(axis=-1)
+        return scores
+
+    def check_end(self):
+        best = self.max_scores()
+        s0, s1 = self.scores[:, 0], self.scores[:, 1]
+        ending = (self.turn >= MAX_TURNS) | (s0 > best[:, 1]) | (s1 > best[:, 0]) | ((best[:, 0] == s0) & (best[:, 1] == s1))
+        ending &= ~self.over
+        if ending.any():
+            # unsaved scans are saved at the end of the game
+            carried = np.stack([self.scans[:, OWNER == player].any(axis=1) for player in (0, 1)], axis=1)
+            self.save(carried & ending[:, None, None])
+            self.scans = self.scans & ~ending[:, None, None]
+            self.over = self.over | ending
+
+    def winners(self) -> np.ndarray:
+        # 0, 1, or -1 on a draw
+        return np.where(self.scores[:, 0] > self.scores[:, 1], 0, np.where(self.scores[:, 1] > self.scores[:, 0], 1, -1))
+
+
+#===========================================================================
+#                            Policies
+#===========================================================================
+
+class SinkerPolicy:
+    # run_sinker-like: dive straight down to `depth`, come back up to save, again; powerful
+    # light every `light_every` turns below the first habitat
+    def __init__(self, env: BatchEnv, depth: int = 8500, light_every: int = 3):
+        self.depth = depth
+        self.light_every = light_every
+        self.rising = np.zeros((env.games, DRONE_COUNT), bool)
+
+    def __call__(self, env: BatchEnv) -> Commands:
+        self.rising = (self.rising | (env.dy >= self.depth)) & (env.dy > DRONE_SURFACE_Y_THRESHOLD)
+        target = np.stack([env.dx, np.where(self.rising, 0, MAP_SIZE - 1)], axis=-1)
+        light = (env.turn[:, None] % self.light_every == 0) & (env.dy > 2500)
+        return Commands(target, np.zeros_like(self.rising), light)
+
+
+class RandomPolicy:
+    # random targets kept for a few turns, random lights, seeded: covers the rules (chases,
+    # collisions, fish pushed out of the map) for check_against_referee
+    def __init__(self, env: BatchEnv, seed: int = 0):
+        self.rng = np.random.default_rng(seed)
+        self.target = self.rng.integers(-500, MAP_SIZE + 500, size=(env.games, DRONE_COUNT, 2))
+
+    def __call__(self, env: BatchEnv) -> Commands:
+        shape = (env.games, DRONE_COUNT)
+        change = self.rng.random(shape) < 0.1
+        self.target = np.where(change[..., None], self.rng.integers(-500, MAP_SIZE + 500, size=shape + (2,)), self.target)
+        return Commands(self.target, self.rng.random(shape) < 0.05, self.rng.random(shape) < 0.3)
+
+
+def referee_commands(commands: Commands, game: int) -> dict:
+    return {d: Command(None if commands.wait[game, d] else tuple(int(v) for v in commands.target[game, d]),
+                       bool(commands.light[game, d]))
+            for d in range(DRONE_COUNT)}
+
+
+def check_against_referee(seeds: Sequence[int], policy_class=RandomPolicy, turns: int = MAX_TURNS) -> List[str]:
+    # play the same commands in both, compare the whole state after every turn
+    env = BatchEnv(seeds)
+    games = [Game(int(seed)) for seed in seeds]
+    policy = policy_class(env)
+    reference = BatchEnv([])
+    errors = []
+    for _ in range(turns):
+        commands = policy(env)
+        for g, game in enumerate(games):
+            if not game.over:
+                game.step(referee_commands(commands, g))
+        env.step(commands)
+        reference.pack(games)
+        for name in STATE_FIELDS:
+            mismatch = (getattr(env, name) != getattr(reference, name)).reshape(len(games), -1).any(axis=1)
+            for g in np.flatnonzero(mismatch):
+                errors.append(f"seed {seeds[g]} turn {reference.turn[g]}: {name} differs")
+        if errors or env.over.all():
+            break
+    return errors
+
+
+def evaluate(env: BatchEnv, policy) -> float:
+    # play every game to the end, returns turns per second
+    start = time.perf_counter()
+    turns = 0
+    while not env.over.all():
+        turns += int((~env.over).sum())
+        env.step(policy(env))
+    return turns / (time.perf_counter() - start)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Evaluate a simple policy over many games at once")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0, help="first seed")
+    parser.add_argument("--depth", type=int, default=8500)
+    parser.add_argument("--light-every", type=int, default=3)
+    parser.add_argument("--check", action="store_true", help="compare with referee.py, random commands")
+    args = parser.parse_args(argv)
+
+    seeds = list(range(args.seed, args.seed + args.games))
+    if args.check:
+        errors = check_against_referee(seeds)
+        for error in errors[:20]:
+            print(error)
+        print(f"{len(seeds)} games checked, {len(errors)} differences", file=sys.stderr)
+        sys.exit(1 if errors else 0)
+
+    env = BatchEnv(seeds)
+    speed = evaluate(env, SinkerPolicy(env, args.depth, args.light_every))
+    scores = env.scores.ravel()
+    print(f"{args.games} games, score mean {scores.mean():.1f} std {scores.std():.1f},"
+          f" turns mean {env.turn.mean():.1f}, {speed:.0f} game turns/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+# Micro-benchmarks of the bot's hot kernels on generated scenarios.
+#
+# Scenarios are seeded: 13 to 20 creatures, 0 to 6 monsters close to the drone, drones in
+# open water, along a wall or in a corner. Each kernel is timed in microseconds per call
+# (best of --repeat runs) and can be saved as a baseline, then compared on later runs:
+#
+#   python bench.py --save                   # writes bench_baseline.json
+#   python bench.py --compare                # exits 1 if a kernel is slower than the threshold
+#   python bench.py --compare --threshold 0.05 --filter find_safe
+#   python bench.py --clone                  # clones per millisecond and memory per clone of SimState
+
+import argparse
+import gc
+import json
+import math
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from replay import BOT_PATH, load_bot
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+MAP_SIZE = 10000
+FISH_COUNT = 12
+PLACEMENTS = ("open", "wall", "corner")
+
+
+class Scenario(NamedTuple):
+    name: str
+    creatures: int
+    placement: str
+    drone_pos: tuple
+    foe_pos: tuple
+    target: tuple
+    monsters: List[tuple]  # close to the drone
+    far_monsters: List[tuple]
+    fish: List[tuple]  # (fish_id, x, y, vx, vy)
+    scans: List[int]
+    radar: List[tuple]  # (fish_id, dir)
+
+
+#===========================================================================
+#                            Scenarios
+#===========================================================================
+
+def init_lines(creatures: int) -> List[str]:
+    lines = [str(creatures)]
+    for i in range(creatures):
+        fish_id = 4 + i
+        if i < FISH_COUNT:
+            lines.append(f"{fish_id} {i % 4} {i // 4}")
+        else:
+            lines.append(f"{fish_id} -1 -1")
+    return lines
+
+
+def radar_dir(drone_pos, pos):
+    return ("T" if pos[1] <= drone_pos[1] else "B") + ("L" if pos[0] <= drone_pos[0] else "R")
+
+
+def make_scenario(rng: random.Random, creatures: int, close_monsters: int, placement: str) -> Scenario:
+    if placement == "open":
+        drone_pos = (rng.randint(2500, 7500), rng.randint(3000, 7500))
+    elif placement == "wall":
+        drone_pos = (rng.choice([rng.randint(0, 300), rng.randint(9700, 9999)]), rng.randint(3000, 9000))
+    else:
+        drone_pos = (rng.choice([rng.randint(0, 300), rng.randint(9700, 9999)]), rng.randint(9700, 9999))
+    target = (rng.randint(0, MAP_SIZE - 1), rng.choice([499, rng.randint(0, MAP_SIZE - 1)]))
+
+    def around(min_dist, max_dist):
+        while True:
+            angle = rng.uniform(0, 2 * math.pi)
+            d = rng.uniform(min_dist, max_dist)
+            pos = (int(drone_pos[0] + d * math.cos(angle)), int(drone_pos[1] + d * math.sin(angle)))
+            if 0 <= pos[0] < MAP_SIZE and 2500 <= pos[1] < MAP_SIZE:
+                return pos
+
+    monster_count = creatures - FISH_COUNT
+    close_monsters = min(close_monsters, monster_count)
+    monsters = [around(700, 2400) for _ in range(close_monsters)]
+    far_monsters = [around(3000, 9000) for _ in range(monster_count - close_monsters)]
+    fish = []
+    for i in range(FISH_COUNT):
+        fish_type = i // 4
+        x, y = rng.randint(0, MAP_SIZE - 1), rng.randint(2500 * (fish_type + 1), 2500 * (fish_type + 2) - 1)
+        fish.append((4 + i, x, y, rng.randint(-200, 200), rng.randint(-200, 200)))
+    scans = rng.sample(range(4, 4 + FISH_COUNT), rng.randint(0, 6))
+    radar = [(f[0], radar_dir(drone_pos, f[1:3])) for f in fish]
+    radar += [(4 + FISH_COUNT + i, radar_dir(drone_pos, m)) for i, m in enumerate(monsters + far_monsters)]
+    return Scenario(f"c{creatures}-m{close_monsters}-{placement}", creatures, placement, drone_pos,
+                    (MAP_SIZE - drone_pos[0], drone_pos[1]), target, monsters, far_monsters, fish, scans, radar)
+
+
+def make_scenarios(seed: int = 0, per_group: int = 8) -> Dict[int, List[Scenario]]:
+    # grouped by number of monsters close to the drone
+    rng = random.Random(seed)
+    groups = {}
+    for close_monsters in range(7):
+        groups[close_monsters] = [
+            make_scenario(rng, rng.randint(max(13, FISH_COUNT + close_monsters), 20), close_monsters, placement)
+            for _ in range(per_group) for placement in PLACEMENTS]
+    return groups
+
+
+#===========================================================================
+#                            Kernels
+#===========================================================================
+
+class GameSetup(NamedTuple):
+    bot: Any
+    game: Any
+    drone: Any
+    foe: Any
+    visible_fish: List[Any]
+    scenario: Scenario
+
+
+def setup_game(scenario: Scenario, bot_path: str = BOT_PATH) -> GameSetup:
+    bot = load_bot(bot_path)
+    bot.DEBUG_ENABLED = False
+    game = bot.GameEngine(bot.read_init(iter(init_lines(scenario.creatures)).__next__))
+    Vector = bot.Vector
+    drone = bot.Drone(0, Vector(*scenario.drone_pos), False, 30, list(scenario.scans), game)
+    drone.target = Vector(*scenario.target)
+    foe = bot.Drone(1, Vector(*scenario.foe_pos), False, 30, list(scenario.scans[::2]), game)
+    game.my_drones, game.foe_drones = [drone], [foe]
+    game.drone_by_id = {0: drone, 1: foe}
+    game.my_scans = list(scenario.scans[:2])
+    game.loop = 10
+    visible_fish = [bot.VisibleFish(fish_id, Vector(x, y), Vector(vx, vy), game.fish_details[fish_id])
+                    for fish_id, x, y, vx, vy in scenario.fish]
+    monster_ids = range(4 + FISH_COUNT, 4 + scenario.creatures)
+    for fish_id, (x, y) in zip(monster_ids, scenario.monsters + scenario.far_monsters):
+        visible_fish.append(bot.VisibleFish(fish_id, Vector(x, y), Vector(0, 0), game.fish_details[fish_id]))
+    game.visible_fish = visible_fish
+    bot.update_positions(game, [drone], visible_fish)
+    drone.refresh_radar([bot.RadarBlip(fish_id, d) for fish_id, d in scenario.radar])
+    return GameSetup(bot, game, drone, foe, visible_fish, scenario)
+
+
+def kernel_calls(g: GameSetup) -> Dict[str, Callable[[], Any]]:
+    bot, game, drone, s = g.bot, g.game, g.drone, g.scenario
+    monsters = [bot.Vector(*m) for m in s.monsters]
+    state = bot.SimState.from_engine(game)
+    calls = {
+        "update_positions": lambda: bot.update_positions(game, [drone], g.visible_fish),
+        "detect_close_monsters": lambda: drone.detect_close_monsters(bot.MONSTER_VICINITY_RADIUS, 5),
+        "Score.estimated_drone_save": lambda: bot.Score.estimated_drone_save(drone),
+        "radar_unscanned_fish_count": lambda: (drone.get_radar_blips_unscanned_fish_count(bot.RADAR_TOP_LEFT, bot.RADAR_TOP_RIGHT),
+                                               drone.get_radar_blips_unscanned_fish_count(bot.RADAR_BOTTOM_LEFT),
+                                               drone.get_radar_blips_unscanned_fish_count(bot.RADAR_BOTTOM_RIGHT)),
+        "SimState.from_engine": lambda: bot.SimState.from_engine(game),
+        "sim_clone": lambda: bot.sim_clone(state),
+    }
+    if monsters:
+        # find_safe_direction asserts there is something to evade
+        calls["find_safe_direction"] = lambda: bot.find_safe_direction(drone.pos, monsters, drone.target, 3)
+        calls["move_drone_safely"] = lambda: bot.move_drone_safely(drone.pos, monsters, drone.target)
+    return calls
+
+
+def time_calls(calls: List[Callable[[], Any]], repeat: int, min_time: float = 0.05) -> float:
+    # microseconds per call, best of `repeat` runs of the whole scenario group
+    # (garbage collection off, like timeit)
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _time_calls(calls, repeat, min_time)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _time_calls(calls: List[Callable[[], Any]], repeat: int, min_time: float) -> float:
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            for call in calls:
+                call()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2
+    best = elapsed
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            for call in calls:
+                call()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e6 / (number * len(calls))
+
+
+def run_benchmarks(seed: int = 0, repeat: int = 7, name_filter: Optional[str] = None,
+                   per_group: int = 8) -> Dict[str, float]:
+    results = {}
+    for close_monsters, scenarios in make_scenarios(seed, per_group).items():
+        setups = [setup_game(s) for s in scenarios]
+        by_kernel: Dict[str, List[Callable[[], Any]]] = {}
+        for g in setups:
+            for kernel, call in kernel_calls(g).items():
+                by_kernel.setdefault(kernel, []).append(call)
+        for kernel, calls in by_kernel.items():
+            name = f"{kernel}[monsters={close_monsters}]"
+            if name_filter and name_filter not in name:
+                continue
+            results[name] = time_calls(calls, repeat)
+            print(f"{name:55s} {results[name]:10.2f} us/call", file=sys.stderr)
+    return results
+
+
+def clone_report(seed: int = 0, count: int = 10000, out=sys.stdout):
+    # cloning cost of the lookahead state, on the largest scenario
+    scenario = max((s for group in make_scenarios(seed, 1).values() for s in group), key=lambda s: s.creatures)
+    g = setup_game(scenario)
+    state = g.bot.SimState.from_engine(g.game)
+    us = time_calls([lambda: g.bot.sim_clone(state)], 7)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    clones = [g.bot.sim_clone(state) for _ in range(count)]
+    per_clone = (tracemalloc.get_traced_memory()[0] - before) / len(clones)
+    tracemalloc.stop()
+    print(f"sim_clone ({scenario.creatures} creatures, {len(state.x)} drones):"
+          f" {1000 / us:.0f} clones/ms, {per_clone:.0f} bytes/clone", file=out)
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    regressions = []
+    print(f"{'kernel':55s} {'baseline':>10s} {'now':>10s} {'change':>8s}")
+    for name, now in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:55s} {'-':>10s} {now:10.2f}      new")
+            continue
+        change = now / before - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:55s} {before:10.2f} {now:10.2f} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the bot's hot kernels")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--compare", action="store_true", help="compare with the baseline")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown counted as a regression")
+    parser.add_argument("--filter", help="only kernels whose name contains this")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--clone", action="store_true", help="only report the cost of cloning the lookahead state")
+    args = parser.parse_args(argv)
+
+    if args.clone:
+        clone_report(args.seed)
+        return
+
+    results = run_benchmarks(args.seed, args.repeat, args.filter)
+    if args.compare:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+    else:
+        regressions = []
+        for name, us in results.items():
+            print(f"{name:55s} {us:10.2f} us/call")
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    if regressions:
+        print(f"{len(regressions)} kernels slower than the baseline by more than {args.threshold:.0%}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# Compare evasion policies: the copies of move_drone_safely / find_safe_direction.
+#
+# Every policy plays the same seeded scenarios of simu-collision.py: a drone crosses the map
+# from (0, 0) to (9999, 9999) through chasing monsters. Scenarios are played on all cores, in
+# rounds; after each round, a sequential probability ratio test (SPRT) decides each pair of
+# policies on the seeds where one of them did better than the other. A settled pair stops,
+# a policy left in no open pair is not played anymore:
+#
+#   python evasion.py                               # all the registered policies
+#   python evasion.py main simu --max-seeds 4000 --bot-speed 400
+
+import argparse
+import importlib.util
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from referee import MONSTER_AGGRESSIVE_SPEED
+from replay import load_bot
+
+SIMU_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "simu-collision.py")
+MAX_TURNS = 100
+CAUGHT, TIMEOUT, ARRIVED = 0, 1, 2  # outcomes, in order of preference
+
+
+def load_simu():
+    # simu-collision.py, silent; loaded once per process
+    if "simu_collision" not in sys.modules:
+        spec = importlib.util.spec_from_file_location("simu_collision", SIMU_PATH)
+        simu = importlib.util.module_from_spec(spec)  # type:ignore
+        spec.loader.exec_module(simu)  # type:ignore
+        simu.log = lambda *args, **kwargs: None
+        simu.RENDER = False
+        sys.modules["simu_collision"] = simu
+    return sys.modules["simu_collision"]
+
+
+def main_policy(**overrides):
+    def build():
+        bot = load_bot(instance="_evasion_" + "_".join(overrides))
+        bot.DEBUG_ENABLED = False
+        for name, value in overrides.items():
+            setattr(bot, name, value)
+        return lambda drone, bots, target: bot.move_drone_safely(bot.Vector(*drone), bots, target)
+    return build
+
+
+def simu_policy():
+    simu = load_simu()
+    return lambda drone, bots, target: simu.move_drone_safely(simu.Vector(*drone), bots, target)
+
+
+# name -> builder of move(drone, bots, target) -> next drone position
+POLICIES: Dict[str, Callable[[], Callable]] = {
+    "main": main_policy(),  # monsters at full speed the first turn only, SAFETY_WEIGHT
+    "main-aggressive": main_policy(MONSTER_NON_AGGRESSIVE_SPEED=MONSTER_AGGRESSIVE_SPEED),
+    "simu": simu_policy,  # monsters at 400 every turn, plain log(safety)
+}
+
+
+#===========================================================================
+#                            Scenarios
+#===========================================================================
+
+class Outcome(NamedTuple):
+    seed: int
+    result: int  # CAUGHT, TIMEOUT or ARRIVED
+    turns: int
+    decision_s: List[float]  # per call of the policy
+
+
+def scenario(seed: int, simu) -> List[Tuple[int, int]]:
+    # simu-collision.py's monsters: the fixed ones and RANDOM_BOTS away from the start
+    rng = random.Random(seed)
+    bots = list(simu.FIXED_BOTS)
+    while len(bots) < len(simu.FIXED_BOTS) + simu.RANDOM_BOTS:
+        bot = (rng.randint(0, simu.MAP_SIZE - 1), rng.randint(0, simu.MAP_SIZE - 1))
+        if bot[0] ** 2 + bot[1] ** 2 >= simu.MIN_RANDOM_BOT_DISTANCE ** 2:
+            bots.append(bot)
+    return bots
+
+
+_built: Dict[str, Callable] = {}
+
+
+def play_scenario(policy: str, seed: int, bot_speed: int) -> Outcome:
+    # runs in a worker process; the same game as simu-collision.py's main_loop
+    if policy not in _built:
+        _built[policy] = POLICIES[policy]()
+    move = _built[policy]
+    simu = load_simu()
+    target = tuple(simu.TARGET)
+    drone = (0, 0)
+    bots = [simu.Vector(*b) for b in scenario(seed, simu)]
+    decision_s = []
+    for turn in range(1, MAX_TURNS + 1):
+        start = time.perf_counter()
+        new_drone = move(drone, list(bots), target)
+        decision_s.append(time.perf_counter() - start)
+        bots = simu.move_bots(bots, drone, bot_speed)
+        drone = (int(new_drone[0]), int(new_drone[1]))
+        if simu.check_collision(drone, bots):
+            return Outcome(seed, CAUGHT, turn, decision_s)
+        if drone == target:
+            return Outcome(seed, ARRIVED, turn, decision_s)
+    return Outcome(seed, TIMEOUT, MAX_TURNS, decision_s)
+
+
+#===========================================================================
+#                            Sequential test
+#===========================================================================
+
+class Sprt:
+    # Wald's SPRT on the seeds where the outcomes differ: p, the probability that A does
+    # better, is 0.5 - delta (B better) against 0.5 + delta (A better)
+    def __init__(self, a: str, b: str, delta: float, alpha: float):
+        self.a, self.b = a, b
+        self.wins = self.losses = self.ties = 0
+        self.win_llr = math.log((0.5 + delta) / (0.5 - delta))
+        self.upper = math.log((1 - alpha) / alpha)
+        self.decision: Optional[str] = None
+
+    def add(self, a: Outcome, b: Outcome):
+        if a.result > b.result:
+            self.wins += 1
+        elif a.result < b.result:
+            self.losses += 1
+        else:
+            self.ties += 1
+
+    def llr(self) -> float:
+        return (self.wins - self.losses) * self.win_llr
+
+    def update(self):
+        if self.llr() >= self.upper:
+            self.decision = self.a
+        elif self.llr() <= -self.upper:
+            self.decision = self.b
+
+
+def compare(policies: List[str], max_seeds: int, first_seed: int, bot_speed: int, round_seeds: int,
+            delta: float, alpha: float, workers: Optional[int] = None):
+    tests = [Sprt(a, b, delta, alpha) for i, a in enumerate(policies) for b in policies[i + 1:]]
+    outcomes: Dict[str, Dict[int, Outcome]] = {p: {} for p in policies}
+    seed = first_seed
+    with ProcessPoolExecutor(workers) as pool:
+        while seed < first_seed + max_seeds:
+            open_tests = [t for t in tests if t.decision is None]
+            if not open_tests:
+                break
+            active = sorted({p for t in open_tests for p in (t.a, t.b)}, key=policies.index)
+            seeds = range(seed, min(seed + round_seeds, first_seed + max_seeds))
+            futures = {(p, s): pool.submit(play_scenario, p, s, bot_speed) for p in active for s in seeds}
+            for (p, s), f in futures.items():
+                outcomes[p][s] = f.result()
+            for t in open_tests:
+                for s in seeds:
+                    t.add(outcomes[t.a][s], outcomes[t.b][s])
+                t.update()
+            seed = seeds.stop
+            print(f"{seed - first_seed} seeds: {len(open_tests)} comparisons were open, playing {', '.join(active)}",
+                  file=sys.stderr)
+    return outcomes, tests
+
+
+def print_report(outcomes: Dict[str, Dict[int, Outcome]], tests: List[Sprt], out=sys.stdout):
+    print(f"\n{'policy':16s} {'seeds':>6s} {'survival':>9s} {'arrived':>8s} {'turns':>6s} {'us/call':>8s} {'p99':>8s}",
+          file=out)
+    for policy, by_seed in outcomes.items():
+        o = list(by_seed.values())
+        if not o:
+            continue
+        survived = sum(1 for x in o if x.result != CAUGHT) / len(o)
+        arrived = [x.turns for x in o if x.result == ARRIVED]
+        calls = sorted(t for x in o for t in x.decision_s)
+        turns = f"{statistics.mean(arrived):6.1f}" if arrived else f"{'-':>6s}"
+        print(f"{policy:16.16s} {len(o):6d} {survived:9.1%} {len(arrived) / len(o):8.1%} {turns}"
+              f" {statistics.mean(calls) * 1e6:8.0f} {calls[int(len(calls) * 0.99)] * 1e6:8.0f}", file=out)
+    print(file=out)
+    for t in tests:
+        verdict = f"{t.decision} is better" if t.decision else "undecided"
+        print(f"{t.a} vs {t.b}: +{t.wins} -{t.losses} ={t.ties}, LLR {t.llr():+.2f} (bounds ±{t.upper:.2f}): {verdict}",
+              file=out)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare evasion policies on the same seeded scenarios")
+    parser.add_argument("policies", nargs="*", help=f"among {', '.join(POLICIES)}; all by default")
+    parser.add_argument("--max-seeds", type=int, default=2000)
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--round", type=int, default=100, help="seeds per round, between two tests")
+    parser.add_argument("--bot-speed", type=int, default=MONSTER_AGGRESSIVE_SPEED, help="speed of the monsters")
+    parser.add_argument("--delta", type=float, default=0.1, help="SPRT: P(A better on a differing seed) = 0.5 ± delta")
+    parser.add_argument("--alpha", type=float, default=0.05, help="SPRT: error rate of each decision")
+    parser.add_argument("--workers", type=int, help="processes, all cores by default")
+    args = parser.parse_args(argv)
+
+    policies = args.policies or list(POLICIES)
+    unknown = [p for p in policies if p not in POLICIES]
+    if unknown or len(policies) < 2:
+        parser.error(f"need two policies or more among {', '.join(POLICIES)}")
+    outcomes, tests = compare(policies, args.max_seeds, args.first_seed, args.bot_speed, args.round,
+                              args.delta, args.alpha, args.workers)
+    print_report(outcomes, tests)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,134 +1,113 @@
-#  coding challenge  on a platform  CodinGame.
-# Here's a summary of the game mechanics and what players need to consider when creating a strategy or writing code to control their drones:
-# Objective
+#  coding challenge  on a platform  CodinGame (Seabed Security), rules in regles1-bronze.txt and
+# regles2-silver.txt. In short:
+# - a 10,000u square ocean, (0, 0) at the top left; 200 turns, or until one player cannot catch up
+# - two drones each: move up to 600u or sink 300u, scan within 800u or 2000u with the light
+#   (battery 30, -5 per lit turn, +1 otherwise), save the scans by surfacing
+# - fish of 3 types and 4 colors move 200u in their habitat zone, 400u when frightened; points
+#   by type, bonuses for a whole color or type, doubled for the first to save
+# - monsters chase the drones they detect in their light; a contact sends the drone to the
+#   surface in emergency, losing its unsaved scans
+# - a MOVE or WAIT command per drone and turn, with the light on or off, within 100ms (1s on
+#   the first turn)
+
+
+from typing import List, NamedTuple, Dict, Optional, Tuple, TypeAlias, Any, TYPE_CHECKING
+import os
+import sys
+import math
+import itertools
+import time
+import threading
+from enum import Enum
 
-#     Win more points than your opponent by scanning the most fish within a 200-turn game or until one player can no longer catch up in points.
+try:
+    import numpy as np
+except ImportError:
+    np = None  # see Coverage
 
-# The Map
+if TYPE_CHECKING:
+    from extras import MctsNode, serve
 
-#     A square ocean floor with sides of 10,000 units (u).
-#     Coordinates (0, 0) are at the top left corner.
+DEBUG_ENABLED = True
+# precompute next turn in a background thread while blocked on stdin
+PONDER_ENABLED = os.environ.get("UTG_PONDER", "1") == "1"
+# record every input line to this file, to replay the game offline (see replay.py)
+RECORD_INPUT_PATH = os.environ.get("UTG_RECORD_INPUT")
+# play many games in one process, for local runs (see serve() in extras.py and arena.py --server)
+SERVE_ENABLED = os.environ.get("UTG_SERVE") == "1"
+# role of both drones at the start, a DroneRole name; the planner roles MCTS, TOUR (scan tours)
+# and GREEDY need extras.py, so they are for local runs only
+INITIAL_ROLE = os.environ.get("UTG_ROLE", "FEUILLE_MORTE")
+
+# Map dimensions
+MAP_SIZE = 10000  # units (u)
 
 # Drones
-
-#     Each player has two drones.
-#     Drones can move each turn up to 600u if motors are activated or sink 300u if not.
-#     Scanning radius is 800u, extendable to 2000u by increasing light power, which drains the battery.
-#     Drones must resurface to save scans and score points.
-#     Battery starts at 30 points, recharges by 1 if light is not increased, and drains by 5 with increased light.
+DRONE_MOVE_SPEED = 600  # units (u) per turn
+DRONE_SINK_SPEED = 300  # units (u) if motors not activated
+DRONE_LIGHT_RADIUS = 800  # units (u)
+DRONE_LIGHT_RADIUS_POWERFUL = 2000  # units (u)
+MINIMUM_LIGHT_DEPTH_THRESHOLD = 3000  # units (u)
+BATTERY_DRAIN_POWERFUL_LIGHT = 5  # points
+BATTERY_RECHARGE_RATE = 1  # point per turn
+BATTERY_CAPACITY = 30  # full capacity
+DRONE_SURFACE_Y_THRESHOLD = 500  # units (u)
 
 # Fish
-
-#     Fish have specific types and colors and move within defined habitat zones.
-#     Fish move 200u each turn or 400u if frightened by nearby drone activity.
-#     Scanning all fish of the same type or color grants bonus points, especially if you're the first.
-
-# Depth Monsters
-
-#     Monsters chase drones if blinded by the light.
-#     Monsters can cause drones to enter "emergency" mode, losing all unsaved scans.
-#     Monsters swim aggressively towards drones within light range.
+FISH_MOVE_DISTANCE = 200  # units (u) per turn
+FISH_FRIGHTENED_MOVE_DISTANCE = 400  # units (u) per turn
+FISH_FRIGHTENED_DISTANCE_THRESHOLD = 1400  # units (u)
+
+# Fish types and habitat zones
+FISH_TYPE_0_MIN_Y = 2500
+FISH_TYPE_0_MAX_Y = 5000
+FISH_TYPE_1_MIN_Y = 5000
+FISH_TYPE_1_MAX_Y = 7500
+FISH_TYPE_2_MIN_Y = 7500
+FISH_TYPE_2_MAX_Y = 10000
+
+# Monsters
+MONSTER_AGGRESSIVE_SPEED = 540  # units (u) per turn
+MONSTER_NON_AGGRESSIVE_SPEED = 270  # units (u) per turn
+MONSTER_MIN_DETECTION_RADIUS = DRONE_LIGHT_RADIUS + 300  # units (u)
+MONSTER_MAX_DETECTION_RADIUS = DRONE_LIGHT_RADIUS_POWERFUL + 300  # units (u)
+MONSTER_VICINITY_RADIUS = 2500  # units (u)
+MONSTER_INTERACTION_RADIUS = 500  # units (u)
 
 # Scoring
-
-#     Points are awarded for scanning fish, with more points for rarer types.
-#     Bonus points for being the first to save a scan or a combination.
-
-# Victory Conditions
-
-#     The game ends after 200 turns or if a player secures an unassailable lead.
-#     Saving scans of all remaining fish also ends the game.
-
-# Defeat Conditions
-
-#     Failing to provide a valid command within the time limit for each drone.
-
-# Game Protocol
-
-#     The game provides initialization input with details about creatures.
-#     Each game turn provides scores, drone and creature status, and allows players to issue commands.
-#     Players command their drones by sending MOVE or WAIT instructions, with optional light power adjustments.
-
-# Constraints
-
-#     There's a creature count range and a fixed number of drones.
-#     Response time per turn is capped at 100ms, with a longer allowance for the first turn.
-
-
-from typing import List, NamedTuple, Dict, Optional, TypeAlias, Any
-import sys
-import math
-from enum import Enum
-
-DEBUG_ENABLED = True
-
-# Map dimensions  
-MAP_SIZE = 10000  # units (u)  
-  
-# Drones  
-DRONE_MOVE_SPEED = 600  # units (u) per turn  
-DRONE_SINK_SPEED = 300  # units (u) if motors not activated  
-DRONE_LIGHT_RADIUS = 800  # units (u)  
-DRONE_LIGHT_RADIUS_POWERFUL = 2000  # units (u)  
-MINIMUM_LIGHT_DEPTH_THRESHOLD = 3000  # units (u)
-BATTERY_DRAIN_POWERFUL_LIGHT = 5  # points  
-BATTERY_RECHARGE_RATE = 1  # point per turn  
-BATTERY_CAPACITY = 30  # full capacity  
-DRONE_SURFACE_Y_THRESHOLD = 500  # units (u)  
-  
-# Fish  
-FISH_MOVE_DISTANCE = 200  # units (u) per turn  
-FISH_FRIGHTENED_MOVE_DISTANCE = 400  # units (u) per turn  
-FISH_FRIGHTENED_DISTANCE_THRESHOLD = 1400  # units (u)  
-  
-# Fish types and habitat zones  
-FISH_TYPE_0_MIN_Y = 2500  
-FISH_TYPE_0_MAX_Y = 5000  
-FISH_TYPE_1_MIN_Y = 5000  
-FISH_TYPE_1_MAX_Y = 7500  
-FISH_TYPE_2_MIN_Y = 7500  
-FISH_TYPE_2_MAX_Y = 10000  
-  
-# Monsters  
-MONSTER_AGGRESSIVE_SPEED = 540  # units (u) per turn  
-MONSTER_NON_AGGRESSIVE_SPEED = 270  # units (u) per turn  
-MONSTER_MIN_DETECTION_RADIUS = DRONE_LIGHT_RADIUS + 300  # units (u)  
-MONSTER_MAX_DETECTION_RADIUS = DRONE_LIGHT_RADIUS_POWERFUL + 300  # units (u)  
-MONSTER_VICINITY_RADIUS = 2500  # units (u)  
-MONSTER_INTERACTION_RADIUS = 500  # units (u)  
-  
-# Scoring  
-SCAN_POINTS_TYPE_0 = 1  
-SCAN_POINTS_TYPE_1 = 2  
-SCAN_POINTS_TYPE_2 = 3  
-BONUS_POINTS_SAME_COLOR = 3  
-BONUS_POINTS_SAME_TYPE = 4  
-  
-# Multipliers for first to save  
-FIRST_TO_SAVE_MULTIPLIER = 2  
-  
-# Game conditions  
-MAX_TURNS = 200  
-  
-# Creature and monster types  
-CREATURE_TYPE_MONSTER = -1  
-  
-# Radar indicators  
-RADAR_TOP_LEFT = "TL"  
-RADAR_TOP_RIGHT = "TR"  
-RADAR_BOTTOM_RIGHT = "BR"  
-RADAR_BOTTOM_LEFT = "BL"  
-  
-# Time constraints  
-TIME_PER_TURN_MS = 100  # milliseconds  
-TIME_FIRST_TURN_MS = 1000  # milliseconds  
-  
-# Initialization details  
-CREATURE_COUNT_MIN = 13  
-CREATURE_COUNT_MAX = 20  
-DRONE_COUNT = 2  
-
-FAST_MAX_DEPTH = 5000
+SCAN_POINTS_TYPE_0 = 1
+SCAN_POINTS_TYPE_1 = 2
+SCAN_POINTS_TYPE_2 = 3
+BONUS_POINTS_SAME_COLOR = 3
+BONUS_POINTS_SAME_TYPE = 4
+
+# Multipliers for first to save
+FIRST_TO_SAVE_MULTIPLIER = 2
+
+# Game conditions
+MAX_TURNS = 200
+
+# Creature and monster types
+CREATURE_TYPE_MONSTER = -1
+
+# Radar indicators
+RADAR_TOP_LEFT = "TL"
+RADAR_TOP_RIGHT = "TR"
+RADAR_BOTTOM_RIGHT = "BR"
+RADAR_BOTTOM_LEFT = "BL"
+
+# Time constraints
+TIME_PER_TURN_MS = 100  # milliseconds
+TIME_FIRST_TURN_MS = 1000  # milliseconds
+TURN_BUDGET_MARGIN_MS = 15  # kept for parsing, printing orders and scheduler jitter
+TURN_BUDGET_FALLBACK_MS = 10  # below this, skip evasion and emit the plain strategy target
+
+# Initialization details
+CREATURE_COUNT_MIN = 13
+CREATURE_COUNT_MAX = 20
+DRONE_COUNT = 2
+
+FAST_MAX_DEPTH = 5000  # FAST role only, not tuned
 CHASER_DISTANCE_FROM_FOE = 800
 
 X_LEFT_MARGIN = 1000
@@ -137,6 +116,39 @@ X_RIGHT_MARGIN = 9000
 RICH_SCORING = 8
 RUSH_DISTANCE_WITH_FOE = 800
 
+# feuille morte: rise when there are this many times more unscanned fish above than below
+ABOVE_UNSCANNED_FISH_COEFFICIENT = 1.5
+# feuille morte: depth where sinking turns into crossing, before / from turn 40
+FEUILLE_MORTE_CROSSING_DEPTH_EARLY = 7250
+FEUILLE_MORTE_CROSSING_DEPTH = 8500
+# light schedule: expected scans lost per monster attracted, per scan carried (plus one)
+LIGHT_MONSTER_RISK = 0.3
+# light schedule: expected scans a point of battery left after the horizon is worth
+LIGHT_BATTERY_VALUE = 0.02
+# find_safe_direction: weight of log(distance to the closest monster) against distance to target
+SAFETY_WEIGHT = 3
+
+# the constants above can be tuned (see tune.py) and loaded from a JSON file: UTG_CONFIG=best.json
+TUNABLE_CONSTANTS = ("RICH_SCORING", "RUSH_DISTANCE_WITH_FOE", "ABOVE_UNSCANNED_FISH_COEFFICIENT",
+                     "FEUILLE_MORTE_CROSSING_DEPTH_EARLY", "FEUILLE_MORTE_CROSSING_DEPTH",
+                     "LIGHT_MONSTER_RISK", "LIGHT_BATTERY_VALUE", "SAFETY_WEIGHT")
+CONFIG_PATH = os.environ.get("UTG_CONFIG")
+
+
+def load_config(path: str) -> Dict[str, Any]:
+    import json
+    with open(path) as f:
+        config = json.load(f)
+    unknown = set(config) - set(TUNABLE_CONSTANTS)
+    if unknown:
+        raise ValueError(f"unknown constants in {path}: {sorted(unknown)}")
+    # JSON has no tuples
+    return {name: tuple(value) if isinstance(value, list) else value for name, value in config.items()}
+
+
+if CONFIG_PATH:
+    globals().update(load_config(CONFIG_PATH))
+
 # Define the data structures as namedtuples
 #===========================================================================
 #                            Classes
@@ -181,7 +193,6 @@ class FishDetail(NamedTuple):
     color: int
     type: int
 
-# visible_fish = List[Fish]
 class VisibleFish(NamedTuple):
     fish_id: int
     pos: Vector
@@ -201,9 +212,9 @@ class DroneRole(Enum):
     FEUILLE_MORTE = 6
     FEUILLE_MORTE_TOP = 7
     RUSH_TOP = 8
-
-SINKER_COMPATIBLE_POSITIONS = (1, 2)
-FAST_COMPATIBLE_POSITIONS = (0, 3)
+    MCTS = 9
+    TOUR = 10
+    GREEDY = 11
 
 class SinkerSide(Enum):
     LEFT = 1
@@ -217,11 +228,51 @@ class StrategyState(Enum):
     RISING = 3
     INIT = 4
 
-class FastState(Enum):
-    CROSSING_TOP_RIGHT = 1
-    CROSSING_TOP_LEFT = 2
-            
-            
+
+class TurnBudget:
+    # Started when the first line of the turn input arrives, then passed to every
+    # expensive routine, which should check it and return its best answer so far.
+    limit_ms: float
+    started_at: float
+    checks: int
+    cut_short: List[str]
+    counters: Dict[str, int]  # work done by the anytime searches
+
+    def __init__(self, limit_ms, margin_ms=TURN_BUDGET_MARGIN_MS):
+        self.limit_ms = limit_ms - margin_ms
+        self.started_at = time.perf_counter()
+        self.checks = 0
+        self.cut_short = []
+        self.counters = {}
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def remaining_ms(self):
+        return self.limit_ms - self.elapsed_ms()
+
+    def is_expired(self):
+        self.checks += 1
+        return self.remaining_ms() <= 0
+
+    def is_nearly_spent(self):
+        return self.remaining_ms() <= TURN_BUDGET_FALLBACK_MS
+
+    def cut(self, routine: str):
+        # remember which routine returned early, for the instrumentation
+        if routine not in self.cut_short:
+            self.cut_short.append(routine)
+
+    def count(self, name: str, n: int):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def __str__(self):
+        return f"TurnBudget {self.elapsed_ms():.1f}/{self.limit_ms:.0f}ms checks={self.checks}"\
+            f" cut={','.join(self.cut_short) or 'none'}"\
+            + "".join(f" {name}={n}" for name, n in self.counters.items())
+
+    __repr__ = __str__
+
 
 class FishGlobalState:
     fish_id : int
@@ -290,13 +341,16 @@ class Drone:
     target: Vector  # Target is the target that might dodge a monster or just follow the strategy_target
     waiting: bool
     is_light_enabled: bool
+    lit: bool  # the powerful light was on last turn: the battery dropped
     context: Dict[str, Any]
     monsters_nearby = Dict[int, int]
     radar: Radar
     state: StrategyState
+    game: "GameEngine"
 
-    def __init__(self, drone_id, pos: Vector, dead, battery, scans):
+    def __init__(self, drone_id, pos: Vector, dead, battery, scans, game: "GameEngine"):
         self.drone_id = drone_id
+        self.game = game
         self.pos = pos
         self.dead = dead
         self.battery = battery
@@ -305,6 +359,7 @@ class Drone:
         self.target = pos
         self.waiting = False
         self.is_light_enabled = False
+        self.lit = False
         self.state = StrategyState.INIT
         self.context = {}
         self.monsters_nearby = {}
@@ -317,12 +372,11 @@ class Drone:
         return f"MOVE {clamp(round(self.target.x))} {clamp(round(self.target.y))} {str_light}"
 
     def detect_close_monsters(self, max_dist=MONSTER_MAX_DETECTION_RADIUS, turns_since_seen=5):
-        global loop
-        return [fs for fs in fish_global_map.values() \
+        return [fs for fs in self.game.fish_global_map.values() \
                 if fs.is_monster \
                     and fs.predicted_pos \
                     and dist(self.pos, fs.predicted_pos) < max_dist \
-                    and loop - fs.is_chasing_us__last_loop.get(self.drone_id,999) < turns_since_seen]
+                    and self.game.loop - fs.is_chasing_us__last_loop.get(self.drone_id,999) < turns_since_seen]
 
 
     # (1) 2300<>2000 : get around the monster
@@ -330,7 +384,7 @@ class Drone:
     # choose betweeen norm and -norm based on target
     # (2) 0 <> 1000: flee!!!
 
-    def evasion_orchestrator(self):
+    def evasion_orchestrator(self, budget: Optional[TurnBudget] = None):
         # TODO handling of lights to be more aggressive if bot has not seen us (+300)
         close_monsters = self.detect_close_monsters(MONSTER_VICINITY_RADIUS, 5)
         if close_monsters:
@@ -341,21 +395,19 @@ class Drone:
                 monster = close_monsters[0]
                 if dist(self.pos, monster.predicted_pos) < 1000:
                     monster_position_vectors = [monster.predicted_pos for monster in close_monsters if monster.predicted_pos]  # type:ignore (optional)
-                    self.target = move_drone_safely(self.pos, monster_position_vectors, self.target)
+                    self.target = move_drone_safely(self.pos, monster_position_vectors, self.target, budget, self.game.ponder)
                     action = "smart flee"
                     if self.target == self.pos:
                         action = "smart_flee_evade_many_fallback_to_one"
                         self.evade_1_monster(close_monsters[0])
-                    # self.flee(monster)
                     self.context["evading_for_turns"] = 4
                 else:
-                    # closest = min(close_monsters, key=lambda fish: dist(self.pos, fish.predicted_pos))  # type:ignore (optional)
                     self.evade_1_monster(monster)
                     self.context["evading_for_turns"] = 2
                     action = "evade1"
             else:
                 monster_position_vectors = [monster.predicted_pos for monster in close_monsters if monster.predicted_pos]  # type:ignore (optional)
-                self.target = move_drone_safely(self.pos, monster_position_vectors, self.target)
+                self.target = move_drone_safely(self.pos, monster_position_vectors, self.target, budget, self.game.ponder)
                 action = "evade_many"
                 if self.target == self.pos:
                     action = "evade_many_fallback_to_one"
@@ -372,12 +424,6 @@ class Drone:
         # Set the evade target to move during the current loop
         self.target = choose_best_way_around_to_target(self, monster, self.target)
 
-    def flee(self, monster):
-        vector_to_monster = monster.predicted_pos - self.pos
-        direction = (-vector_to_monster).normalize()
-        self.target =  target_from_direction(self.pos, direction)
-        print_debug("want to flee to %s, so, %s", direction, self.target)
-
     def name(self):
         return f"{self.role.name if self.role else 'ø'}-{self.drone_id}"
 
@@ -402,28 +448,25 @@ class Drone:
         return self.radar.get_blips(direction)
 
     def get_radar_blips_unscanned_fish(self, *directions: str) -> list[RadarBlip]:
-        # global scan_list
-        global my_scans
+        fish_global_map = self.game.fish_global_map
         unscanned_fish_blips = []
         for direction in directions:
             for blip in self.get_radar_blips(direction):
-                # if blip.fish_id not in scan_list \
-                if blip.fish_id not in my_scans \
+                if blip.fish_id not in self.game.my_scans \
                         and blip.fish_id in fish_global_map \
-                        and not fish_global_map[blip.fish_id].is_monster:
-                    # print_debug("%s found unscanned fish %d", self.name(), blip.fish_id)
+                        and not fish_global_map[blip.fish_id].is_monster \
+                        and blip.fish_id in self.game.assignment.get(self.drone_id, ()):
                     unscanned_fish_blips.append(blip)
         return unscanned_fish_blips
 
     def get_radar_blips_monsters(self, *directions: str) -> list[RadarBlip]:
-        global scan_list
+        fish_global_map = self.game.fish_global_map
         monsters_blips = []
         for direction in directions:
             for blip in self.get_radar_blips(direction):
                 if blip.fish_id \
                         and blip.fish_id in fish_global_map \
                         and fish_global_map[blip.fish_id].is_monster:
-                    # print_debug("%s found monster %d", self.name(), blip.fish_id)
                     monsters_blips.append(blip)
         return monsters_blips
 
@@ -436,34 +479,10 @@ class Drone:
             print_debug("still evading, light off")
             self.context["evading_for_turns"] -= 1
             return False
+        if self.role in (DroneRole.MCTS, DroneRole.GREEDY):
+            return self.context["planned_light"] and self.battery >= BATTERY_DRAIN_POWERFUL_LIGHT
 
-        turns_off = loop - self.context.get("last_turn_light", 0)  #type:ignore
-        zone =  Zone.get(self.pos.y)
-        is_drone_rising = self.pos.y < self.target.y
-        is_drone_sinking = self.pos.y == self.target.y
-        is_drone_crossing = self.pos.y > self.target.y
-        # - off above 3000
-        # -- when sinking/crossing: every 5 turns when sinking & high / 3 turn middle / 1 turn if low
-        # -- rising : every 6 turns low / 7 turns middle / 8 turns high
-        low_batt = self.battery < BATTERY_CAPACITY / 30  # 10
-        adjust = 1 if low_batt else 0
-        r = False # eg if zone == Zone.SURFACE:
-        if is_drone_sinking or is_drone_crossing:
-            if zone == Zone.HIGH:
-                r = turns_off >= adjust + 5
-            elif zone == Zone.MID:
-                r = turns_off >= adjust + 3 
-            elif zone == Zone.LOW:
-                r = turns_off >= adjust + 1
-        elif is_drone_rising:
-            if zone == Zone.HIGH:
-                r = turns_off >= adjust + 7
-            elif zone == Zone.MID:
-                r = turns_off >= adjust + 6
-            elif zone == Zone.LOW:
-                r = turns_off >= adjust + 5
-        print_debug("%s: enable_light: %s z=%s b=%s +%s (was off %d turns)", self.name(), r, zone, low_batt, adjust, turns_off)
-        return r
+        return plan_light(self)[0]
 
     def get_outpaceable_foes(self, foes: list["Drone"]):
         below_foe_drones = [foe for foe in foes if not foe.dead \
@@ -477,8 +496,8 @@ class Drone:
         ]
         return blocking_monsters
 
-    
-    def are_monsters_in_angle(self):
+
+    def are_monsters_in_angle(self, budget: Optional[TurnBudget] = None):
         bots = [monster.predicted_pos for monster in self.detect_close_monsters()]
         if not bots:
             return False
@@ -489,28 +508,42 @@ class Drone:
             turns_ahead=3,
             min_angle=45,
             max_angle=135,
-            step_angle=10)
+            step_angle=10,
+            budget=budget,
+            ponder=self.game.ponder)
         return going_up_position != self.pos
 
-    def are_monsters_blocking_arise(self):
+    def are_monsters_blocking_arise(self, budget: Optional[TurnBudget] = None):
         if self.pos.y < 5000:
             return len(self.get_monsters_above()) >= 1
         else:
-            return self.are_monsters_in_angle()
-        
+            return self.are_monsters_in_angle(budget)
+
 
     def is_score_enough_to_rush(self):
         potential_score = Score.estimated_drone_save(self)
         return potential_score >= RICH_SCORING
 
-    def force_strategy_change(self, foes: list["Drone"]):
+    def force_strategy_change(self, foes: list["Drone"], budget: Optional[TurnBudget] = None):
+        # * if surfacing guarantees the win, rush to top
         # * if trying to outpace foe, rush to top
         # * if "rich" and > 1 monster on the side/below (??), rush to top
-
-        if not self.are_monsters_blocking_arise() and drone.role != DroneRole.RUSH_TOP:
+        endgame = self.game.endgame
+        if endgame and self.drone_id in endgame.surface and self.role != DroneRole.RUSH_TOP \
+                and not self.are_monsters_blocking_arise(budget):
+            # back to this role once surfaced
+            self.context["role_after_rush"] = self.role
+            self.set_role(DroneRole.RUSH_TOP)
+            print_debug("%s: RUSH_TOP: saving %s wins (foe's best %d)", self.name(), self.scans, endgame.foe_best)
+            return
+        if self.role in (DroneRole.MCTS, DroneRole.TOUR, DroneRole.GREEDY):
+            # these plan the surfacing themselves
+            return
+
+        if not self.are_monsters_blocking_arise(budget) and self.role != DroneRole.RUSH_TOP:
             outpaceable_foes = self.get_outpaceable_foes(foes)
             close_monsters = self.detect_close_monsters()
-            
+
             if self.is_score_enough_to_rush() and len(outpaceable_foes) >= 1:
                 self.set_role(DroneRole.RUSH_TOP)
                 print_debug("%s: RUSH_TOP: predicted score being %d and foes %s are outpaceable",
@@ -520,39 +553,35 @@ class Drone:
             if self.is_score_enough_to_rush() and len(close_monsters) >= 1:
                 self.set_role(DroneRole.RUSH_TOP)
                 print_debug("%s: RUSH_TOP: predicted score being %d and monsters %s are close",
-                            self.name(), 
-                            Score.estimated_drone_save(self), 
+                            self.name(),
+                            Score.estimated_drone_save(self),
                             [monster.fish_id for monster in close_monsters])
-        
+
         if self.role == DroneRole.RUSH_TOP and self.pos.y <= 500:
-            self.role = DroneRole.FEUILLE_MORTE
+            self.role = self.context.pop("role_after_rush", DroneRole.FEUILLE_MORTE)
+
 
-            
     def set_role(self, role):
         self.role = role
         self.state = StrategyState.INIT
         print_debug("%s: role set to %s", self.name(), role.name)
 
 
-
 # END DRONE
 
-                    
+
 # FishId is type alias int
 FishId = int
 
-# Map of all fish with capture status: 
-# type: Dict[int, Fish]
-fish_global_map: Dict[FishId, FishGlobalState] = {}
-
-def update_positions(drones, visible_fish):
+def update_positions(game: "GameEngine", drones, visible_fish):
+    fish_global_map = game.fish_global_map
+    loop = game.loop
 
-    # for fish_id in my_radar_blips:
     # future: identify 9 zones.
 
     def update_dist(fs: FishGlobalState):
         for drone in drones:
-            distance = dist(fs.predicted_pos, drone.pos) # type:ignore (optional)
+            distance = game.ponder.dist(drone.pos, fs.predicted_pos)
             fs.p_distance[drone]  = distance
             if fs.is_monster:
                 drone.monsters_nearby[fs.fish_id] = distance
@@ -586,7 +615,7 @@ def update_positions(drones, visible_fish):
             s += "| %s=%s %s d=%d " % ("M" if o.is_monster else "F", o.fish_id,
                                  "chase_since=%d" % o.is_chasing_us__last_loop.get(drone.drone_id, 999) if o.is_monster else "",
                                  o.p_distance[drone],
-                                 )    
+                                 )
     print_debug("FishGlobalMap n=%s", len(fish_global_map))
 
 
@@ -595,10 +624,10 @@ def target_from_direction(pos, direction):
     target = pos + direction
     initial_target = target
     if target.x < 0:
-        direction = direction / (direction.x/pos.x)
+        direction = direction * (pos.x/direction.x)  # pos.x may be 0, direction.x cannot
         target = pos + direction
     if target.y < 0:
-        direction = direction / (direction.y/pos.y)
+        direction = direction * (pos.y/direction.y)
         target = pos + direction
     if target.x > 10000:
         direction = direction / (direction.x/(10000-pos.x))
@@ -606,7 +635,7 @@ def target_from_direction(pos, direction):
     if target.y > 10000:
         direction = direction / (direction.y/(10000-pos.y))
         target = pos + direction
-    
+
     if target != initial_target:
         print_debug("Target adjusted from %s to %s", initial_target, target)
 
@@ -614,8 +643,8 @@ def target_from_direction(pos, direction):
 
 def choose_best_way_around_to_target(drone: Drone, monster: FishGlobalState, strategic_target: Vector) -> Vector:
     """
-    In Python, you can determine which of two vectors points more directly towards a target 
-    from your position by calculating the dot product of the vectors created 
+    In Python, you can determine which of two vectors points more directly towards a target
+    from your position by calculating the dot product of the vectors created
     from your position to the target and from your position to the end of each vector.
     The dot product will tell you about the alignment of the vectors.
     The vector with the larger dot product (when normalized) points more directly toward the target.
@@ -630,8 +659,8 @@ def choose_best_way_around_to_target(drone: Drone, monster: FishGlobalState, str
 
     # Your position
     pos = drone.pos
-    
-    # Calculate vectors from position to target and to the tips of the vectors  
+
+    # Calculate vectors from position to target and to the tips of the vectors
     to_target_vector = strategic_target - pos
     vector_to_monster = monster.predicted_pos - pos
 
@@ -643,15 +672,15 @@ def choose_best_way_around_to_target(drone: Drone, monster: FishGlobalState, str
     around1 = vector_to_monster.perpendicular()
     around2 = -around1
 
-    # Normalize the vectors  
-    to_target_vector_norm = to_target_vector.normalize()  
-    around_norm1 = around1.normalize()  
-    around_norm2 = around2.normalize()    
+    # Normalize the vectors
+    to_target_vector_norm = to_target_vector.normalize()
+    around_norm1 = around1.normalize()
+    around_norm2 = around2.normalize()
 
-    # Choose the vector that has the larger dot product  
+    # Choose the vector that has the larger dot product
     dot_product1 = to_target_vector_norm.dot(around_norm1)
     dot_product2 = to_target_vector_norm.dot(around_norm2)
-    if dot_product1 > dot_product2:  
+    if dot_product1 > dot_product2:
         print_debug("%s: avoiding monster by right", drone.name())
         direction: Vector = around_norm1
     else:
@@ -661,63 +690,23 @@ def choose_best_way_around_to_target(drone: Drone, monster: FishGlobalState, str
     return target_from_direction(pos, direction)
 
 
-
 #===========================================================================
 #                            Functions
 #===========================================================================
-def order_move(target: Vector, light: int):
-    print(f"MOVE {target.x} {target.y} {1 if light else 0}")
+# per-thread flags: the ponder worker must stay silent and not read its own cache
+_thread_state = threading.local()
 
-def order_wait(light: int):
-    print(f"WAIT {1 if light else 0}")
+# turn shown in the debug output, set by the game being played
+debug_loop = 0
 
 def print_debug(message, *a):
-    if DEBUG_ENABLED:
-        print("#%d| %s" %(loop + 1, message % a) if a else message, flush= True, file= sys.stderr)
-
-def print_blips(blips: list[RadarBlip]):
-    printed_str = {
-        "TL": [],
-        "TR": [],
-        "BL": [],
-        "BR": [],
-    }
-    for blip in blips:
-        printed_str[blip.dir].append(str(blip.fish_id))
-
-    print_debug(printed_str)
-    print_debug(len(printed_str["TL"]), "|", len(printed_str["TR"]))
-    print_debug(7 * "-")
-    print_debug(len(printed_str["BL"]), "|", len(printed_str["BR"]))
+    if DEBUG_ENABLED and not getattr(_thread_state, "pondering", False):
+        print("#%d| %s" %(debug_loop + 1, message % a) if a else message, flush= True, file= sys.stderr)
 
 
 def dist(a: Vector, b: Vector):
     return int(math.dist(a, b))
 
-def is_monster_close(drone):
-    # get the list of blips reconciliated with fish_details via fish_id
-    detected = len([fish for fish in visible_fish if fish.detail.type == CREATURE_TYPE_MONSTER and dist(drone.pos, fish.pos) < MONSTER_MAX_DETECTION_RADIUS])
-    if detected:
-        print_debug("%s detected Monster detected %s")
-    return detected > 0
-
-fish_details: Dict[int, FishDetail] = {}
-fish_count = int(input())
-for _ in range(fish_count):
-    fish_id, color, _type = map(int, input().split())
-    fish_details[fish_id] = FishDetail(color, _type)
-
-
-
-
-
-
-
-
-
-
-
-
 
 #=====================================================================================
 # Smart Evasion strategy
@@ -725,14 +714,14 @@ for _ in range(fish_count):
 
 
 # Function to move bots towards the drone's position
-def move_bots(bots_positions: List[Vector], drone_position: Vector, speed: int) -> List[Vector]:  
+def move_bots(bots_positions: List[Vector], drone_position: Vector, speed: int) -> List[Vector]:
     new_positions = []
-    
+
     for bot_position in bots_positions:
         dx = drone_position[0] - bot_position[0]
         dy = drone_position[1] - bot_position[1]
         distance = math.sqrt(dx**2 + dy**2)
-        
+
         if distance <= speed:
             new_positions.append(drone_position)
         else:
@@ -740,12 +729,12 @@ def move_bots(bots_positions: List[Vector], drone_position: Vector, speed: int)
             move_y = (dy / distance) * speed
             new_position = Vector(int(bot_position[0] + move_x), int(bot_position[1] + move_y))
             new_positions.append(new_position)
-    
+
     return new_positions
 
 
 # Function to check for collision
-def check_collision(drone_position: Vector, bots_positions: List[Vector]) -> bool:  
+def check_collision(drone_position: Vector, bots_positions: List[Vector]) -> bool:
     for bot_position in bots_positions:
         distance = math.sqrt((drone_position[0] - bot_position[0])**2 + (drone_position[1] - bot_position[1])**2)
         if distance <= MONSTER_INTERACTION_RADIUS:
@@ -762,14 +751,25 @@ def move_towards(current_position: Vector, move: Vector) -> Vector:
 
 
 def find_safe_direction(drone_position: Vector, bots_positions: List[Vector], target_position,
-                        turns_ahead, min_angle=0, max_angle=360, step_angle=10) -> Vector:
+                        turns_ahead, min_angle=0, max_angle=360, step_angle=10,
+                        budget: Optional[TurnBudget] = None, ponder: Optional["Ponder"] = None) -> Vector:
     assert bots_positions
+    if ponder:
+        pondered = ponder.lookup((drone_position, tuple(bots_positions), tuple(target_position),
+                                  turns_ahead, min_angle, max_angle, step_angle))
+        if pondered is not None:
+            return pondered
+
     # turns_ahead is How many turns we are simulating
     best_direction = None
     max_score = -float('inf')  # Use a scoring system instead of just safe distance
 
     # Check in all directions
     for angle in range(min_angle,max_angle, step_angle):
+        # Out of time: keep the best direction found so far
+        if budget and budget.is_expired():
+            budget.cut("find_safe_direction")
+            break
         rad = math.radians(angle)
         drone_move = Vector(DRONE_MOVE_SPEED * math.cos(rad), DRONE_MOVE_SPEED * math.sin(rad))
         temp_drone_position = drone_position
@@ -780,7 +780,7 @@ def find_safe_direction(drone_position: Vector, bots_positions: List[Vector], ta
         for turn in range(turns_ahead):
             # Simulate drone's movement
             temp_drone_position = move_towards(temp_drone_position, drone_move)
-            
+
             # Ensure the drone's new position is within the board boundaries
             if not (0 <= temp_drone_position[0] < MAP_SIZE and 0 <= temp_drone_position[1] < MAP_SIZE):
                 safe_for_all_turns = False
@@ -806,7 +806,7 @@ def find_safe_direction(drone_position: Vector, bots_positions: List[Vector], ta
             # Calculate the distance to the target
             distance_to_target = math.hypot(target_position[0] - temp_drone_position[0], target_position[1] - temp_drone_position[1])
             # We want to maximize safe distance and minimize distance to target
-            score = 3 * math.log(safety_distance) - distance_to_target - wall_malus
+            score = SAFETY_WEIGHT * math.log(safety_distance) - distance_to_target - wall_malus
             if score > max_score:
                 best_direction = Vector(int(drone_move[0]), int(drone_move[1]))
                 max_score = score
@@ -822,38 +822,652 @@ def find_safe_direction(drone_position: Vector, bots_positions: List[Vector], ta
     return drone_position
 
 
-
-def move_drone_safely(drone_position: Vector, bots_positions: List[Vector], target_position) -> Vector:
-    target_vector = Vector(target_position[0] - drone_position[0], target_position[1] - drone_position[1])  
-    distance_to_target = math.sqrt(target_vector[0]**2 + target_vector[1]**2)  
+def move_drone_safely(drone_position: Vector, bots_positions: List[Vector], target_position,
+                      budget: Optional[TurnBudget] = None, ponder: Optional["Ponder"] = None) -> Vector:
+    target_vector = Vector(target_position[0] - drone_position[0], target_position[1] - drone_position[1])
+    distance_to_target = math.sqrt(target_vector[0]**2 + target_vector[1]**2)
     if distance_to_target < DRONE_MOVE_SPEED:
         return target_position
 
     # Find a safe direction to move that avoids predicted collisions with bots
-    new_position = find_safe_direction(drone_position, bots_positions, target_position, turns_ahead=3)
+    new_position = find_safe_direction(drone_position, bots_positions, target_position, turns_ahead=3, budget=budget, ponder=ponder)
     if new_position == drone_position:
-        new_position = find_safe_direction(drone_position, bots_positions, target_position,turns_ahead=2)
+        new_position = find_safe_direction(drone_position, bots_positions, target_position,turns_ahead=2, budget=budget, ponder=ponder)
         if new_position == drone_position:
-            new_position = find_safe_direction(drone_position, bots_positions, target_position,turns_ahead=1)
+            new_position = find_safe_direction(drone_position, bots_positions, target_position,turns_ahead=1, budget=budget, ponder=ponder)
 
     return new_position
 
 
+#=====================================================================================
+# Pondering: use the time blocked on stdin to precompute next turn
+#=====================================================================================
+
+def predict_next_drone_pos(drone: Drone) -> Vector:
+    # where the order we just printed should bring the drone
+    if drone.waiting:
+        return Vector(drone.pos.x, min(MAP_SIZE - 1, drone.pos.y + DRONE_SINK_SPEED))
+    target = Vector(clamp(round(drone.target.x)), clamp(round(drone.target.y)))
+    move = target - drone.pos
+    distance = math.hypot(move.x, move.y)
+    if distance <= DRONE_MOVE_SPEED:
+        return target
+    move = move * (DRONE_MOVE_SPEED / distance)
+    return Vector(round(drone.pos.x + move.x), round(drone.pos.y + move.y))
+
+
+class Ponder:
+    # A worker thread starts from our predicted next state (creatures advanced with
+    # their last seen speed, drones moved to their targets) and fills a cache keyed
+    # by the exact inputs of each computation. The next turn uses whatever still
+    # matches; the rest is cancelled when the real input arrives.
+    game: "GameEngine"
+    cache: Dict[tuple, Vector]
+    distances: Dict[tuple, int]
+    thread: Optional[threading.Thread]
+    cancelled: threading.Event
+
+    def __init__(self, game: "GameEngine"):
+        self.game = game
+        self.cache = {}
+        self.distances = {}
+        self.thread = None
+        self.cancelled = threading.Event()
+        self.hits = 0
+        self.misses = 0
+
+    # TurnBudget protocol, so find_safe_direction stops as soon as we are cancelled
+    def is_expired(self):
+        return self.cancelled.is_set()
+
+    def cut(self, routine: str):
+        pass
+
+    def start(self, drones: List[Drone]):
+        if not PONDER_ENABLED:
+            return
+        # snapshot everything in the main thread, the worker only runs pure functions
+        next_loop = self.game.loop + 1
+        next_creatures = [(fs, fs.predicted_pos + fs.last_seen_speed if fs.last_seen_speed else fs.predicted_pos)
+                          for fs in self.game.fish_global_map.values()]
+        tasks = []
+        for drone in drones:
+            if drone.dead:
+                continue
+            pos = predict_next_drone_pos(drone)
+
+            def close_monsters(max_dist):
+                # same selection as Drone.detect_close_monsters, on the predicted state
+                close = []
+                for fs, next_pos in next_creatures:
+                    distance = dist(pos, next_pos)
+                    last_chase = next_loop if distance < drone.current_light_radius() \
+                        else fs.is_chasing_us__last_loop.get(drone.drone_id, 999)
+                    if fs.is_monster and distance < max_dist and next_loop - last_chase < 5:
+                        close.append(next_pos)
+                return close
+
+            tasks.append((pos, drone.target, close_monsters(MONSTER_VICINITY_RADIUS),
+                          close_monsters(MONSTER_MAX_DETECTION_RADIUS)))
+        fish_positions = [next_pos for _, next_pos in next_creatures]
+
+        self.cache = {}
+        self.distances = {}
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(tasks, fish_positions), daemon=True)
+        self.thread.start()
+
+    def run(self, tasks, fish_positions):
+        _thread_state.pondering = True
+        # distance matrix drone x creature, cheap, done first
+        for pos, _, _, _ in tasks:
+            for fish_pos in fish_positions:
+                self.distances[(pos, fish_pos)] = dist(pos, fish_pos)
+        # evasion searches (move_drone_safely tries 3, 2 then 1 turns ahead), then the danger
+        # of rising straight up (are_monsters_in_angle)
+        for pos, target, evade_from, arise_from in tasks:
+            calls = []
+            if evade_from:
+                calls += [(pos, evade_from, tuple(target), turns, 0, 360, 10) for turns in (3, 2, 1)]
+            if arise_from:
+                calls.append((pos, arise_from, (pos.x, DRONE_SURFACE_Y_THRESHOLD), 3, 45, 135, 10))
+            for call in calls:
+                result = find_safe_direction(*call, budget=self)
+                if self.cancelled.is_set():
+                    return  # partial result, drop it
+                position, bots, *rest = call
+                self.cache[(position, tuple(bots), *rest)] = result
+
+    def stop(self):
+        if self.thread:
+            self.cancelled.set()
+            self.thread.join()
+            self.thread = None
+
+    def lookup(self, key: tuple) -> Optional[Vector]:
+        if getattr(_thread_state, "pondering", False) or not self.cache:
+            return None
+        result = self.cache.get(key)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def dist(self, a: Vector, b: Vector) -> int:
+        distance = self.distances.get((a, b))
+        return distance if distance is not None else dist(a, b)
+
+    def __str__(self):
+        return f"Ponder cached={len(self.cache)} distances={len(self.distances)} hits={self.hits} misses={self.misses}"
+
+    __repr__ = __str__
+
+
+#===================================================================================================
+#                                          Fish assignment
+# Every turn, the fish left to scan are split between my drones: exact over all the splits
+# (bitmasks) while there are at most ASSIGN_EXACT_MAX fish, greedy above. A drone's load is
+# the sum of its intercept times (turns to get a fish within scan radius, the fish moving
+# with its last seen speed), each minus the fish's value in points converted to turns; the
+# split minimizes the larger load, then the total. A fish moving to the other drone costs
+# ASSIGN_SWITCH_TURNS, which keeps the sets stable from turn to turn. Each drone's fish come
+# sorted by value per turn of travel.
+#===================================================================================================
 
+ASSIGN_EXACT_MAX = 12
+ASSIGN_POINT_TURNS = 0.5  # turns of travel a point of value is worth
+ASSIGN_SWITCH_TURNS = 3
+ASSIGN_TOTAL_WEIGHT = 0.1  # of the total load, against the larger load
+TOUR_PREDICTION_TURNS = 5  # fish positions further ahead are too uncertain to extrapolate
+
+
+def radar_box(game: "GameEngine", fish_id: int) -> Optional[tuple]:
+    # (x_low, x_high, y_low, y_high): the box the radar blips of my drones and the habitat
+    # leave to an unseen fish
+    detail = game.fish_details[fish_id]
+    if detail.type == CREATURE_TYPE_MONSTER:
+        return None
+    habitat = {0: (FISH_TYPE_0_MIN_Y, FISH_TYPE_0_MAX_Y), 1: (FISH_TYPE_1_MIN_Y, FISH_TYPE_1_MAX_Y),
+               2: (FISH_TYPE_2_MIN_Y, FISH_TYPE_2_MAX_Y)}
+    x_low, x_high = 0, MAP_SIZE - 1
+    y_low, y_high = habitat[detail.type]
+    seen = False
+    for drone in game.my_drones:
+        for blip in game.my_radar_blips.get(drone.drone_id, []):
+            if blip.fish_id != fish_id:
+                continue
+            seen = True
+            if blip.dir[1] == "L":
+                x_high = min(x_high, drone.pos.x)
+            else:
+                x_low = max(x_low, drone.pos.x)
+            if blip.dir[0] == "T":
+                y_high = min(y_high, drone.pos.y)
+            else:
+                y_low = max(y_low, drone.pos.y)
+    if not seen:
+        return None
+    return x_low, x_high, y_low, y_high
+
+
+def guess_from_radar(game: "GameEngine", fish_id: int) -> Optional[Vector]:
+    # center of the radar box
+    box = radar_box(game, fish_id)
+    if not box:
+        return None
+    x_low, x_high, y_low, y_high = box
+    return Vector((x_low + x_high) // 2, (y_low + y_high) // 2)
+
+
+def is_tracked(game: "GameEngine", fish_id: int) -> bool:
+    # seen recently enough for its last seen speed to tell where it is
+    fs = game.fish_global_map.get(fish_id)
+    return bool(fs and fs.predicted_pos.x >= 0 and game.loop - fs.last_seen_loop < TOUR_PREDICTION_TURNS)  # type:ignore
+
+
+def fish_left(game: "GameEngine") -> Dict[int, tuple]:
+    # fish id -> (position, speed) of the fish still in the map that none of my drones scanned
+    in_map = {blip.fish_id for blips in game.my_radar_blips.values() for blip in blips}
+    scanned = set(game.my_scans)
+    for drone in game.my_drones:
+        scanned.update(drone.scans)
+    fish = {}
+    for fish_id in in_map - scanned:
+        if game.fish_details[fish_id].type == CREATURE_TYPE_MONSTER:
+            continue
+        if is_tracked(game, fish_id):
+            fs = game.fish_global_map[fish_id]
+            fish[fish_id] = (fs.predicted_pos, fs.last_seen_speed or Vector(0, 0))
+        else:
+            guess = guess_from_radar(game, fish_id)
+            if guess:
+                fish[fish_id] = (guess, Vector(0, 0))
+    return fish
+
+
+def fish_values(game: "GameEngine", fish_ids) -> Dict[int, float]:
+    # points a fish brings: its own, doubled if the foe did not save it yet, and a share of the
+    # combos it helps complete (the bonus over the fish of the combo I still need)
+    mine = set(game.my_scans)
+    for drone in game.my_drones:
+        mine.update(drone.scans)
+    foe = set(game.foe_scans)
+    fish = [f for f, d in game.fish_details.items() if d.type != CREATURE_TYPE_MONSTER]
+    type_points = (SCAN_POINTS_TYPE_0, SCAN_POINTS_TYPE_1, SCAN_POINTS_TYPE_2)
+    values = {}
+    for fish_id in fish_ids:
+        detail = game.fish_details[fish_id]
+        value = float(type_points[detail.type]) * (1 if fish_id in foe else FIRST_TO_SAVE_MULTIPLIER)
+        for same, bonus in ((lambda d: d.color == detail.color, BONUS_POINTS_SAME_COLOR),
+                            (lambda d: d.type == detail.type, BONUS_POINTS_SAME_TYPE)):
+            combo = [f for f in fish if same(game.fish_details[f])]
+            missing = [f for f in combo if f not in mine]
+            foe_done = all(f in foe for f in combo)
+            value += bonus * (1 if foe_done else FIRST_TO_SAVE_MULTIPLIER) / len(missing)
+        values[fish_id] = value
+    return values
+
+
+def intercept_turns(drone: Drone, pos: Vector, speed: Vector, radius: int = DRONE_LIGHT_RADIUS) -> float:
+    for k in range(TOUR_PREDICTION_TURNS + 1):
+        if dist(drone.pos, Vector(pos.x + speed.x * k, pos.y + speed.y * k)) - radius <= DRONE_MOVE_SPEED * k:
+            return float(k)
+    later = Vector(pos.x + speed.x * TOUR_PREDICTION_TURNS, pos.y + speed.y * TOUR_PREDICTION_TURNS)
+    return max(0.0, dist(drone.pos, later) - radius) / DRONE_MOVE_SPEED
+
+
+def assign_fish(game: "GameEngine") -> Dict[int, List[int]]:
+    # drone id -> its fish ids, best value per turn of travel first
+    drones = [d for d in game.my_drones if not d.dead]
+    fish = fish_left(game)
+    ids = sorted(fish)
+    assignment: Dict[int, List[int]] = {d.drone_id: [] for d in game.my_drones}
+    if not drones or not ids:
+        game.assignment = assignment
+        return assignment
+    values = fish_values(game, ids)
+    previous = {f: drone_id for drone_id, fs in game.assignment.items() for f in fs}
+    turns = {(d.drone_id, f): intercept_turns(d, *fish[f]) for d in drones for f in ids}
+    cost = {}
+    for d in drones:
+        for f in ids:
+            switch = ASSIGN_SWITCH_TURNS if previous.get(f, d.drone_id) != d.drone_id else 0
+            cost[d.drone_id, f] = turns[d.drone_id, f] - ASSIGN_POINT_TURNS * values[f] + switch
+
+    if len(drones) == 1:
+        split = {f: drones[0].drone_id for f in ids}
+    elif len(ids) <= ASSIGN_EXACT_MAX:
+        # loads of every subset of the fish, one bit per fish
+        a, b = drones[0].drone_id, drones[1].drone_id
+        n = len(ids)
+        load_a, load_b = [0.0] * (1 << n), [0.0] * (1 << n)
+        for mask in range(1, 1 << n):
+            low = mask & -mask
+            i = low.bit_length() - 1
+            load_a[mask] = load_a[mask ^ low] + cost[a, ids[i]]
+            load_b[mask] = load_b[mask ^ low] + cost[b, ids[i]]
+        # the other drone gets the complement: full ^ mask, i.e. load_b read backwards
+        objective = [max(x, y) + ASSIGN_TOTAL_WEIGHT * (x + y) for x, y in zip(load_a, reversed(load_b))]
+        best = objective.index(min(objective))
+        split = {f: a if (best >> i) & 1 else b for i, f in enumerate(ids)}
+    else:
+        # greedy: the most valuable fish first, each to the drone with the smaller load after it
+        loads = {d.drone_id: 0.0 for d in drones}
+        split = {}
+        for f in sorted(ids, key=lambda f: -values[f]):
+            drone_id = min(loads, key=lambda i: loads[i] + cost[i, f])
+            loads[drone_id] += cost[drone_id, f]
+            split[f] = drone_id
+    for f, drone_id in split.items():
+        assignment[drone_id].append(f)
+    need = game.endgame.need if game.endgame else []
+    for drone_id, fs in assignment.items():
+        # the fish that would win first
+        fs.sort(key=lambda f: (f not in need, -values[f] / (1 + turns.get((drone_id, f), 0))))
+    game.assignment = assignment
+    print_debug("assignment %s", assignment)
+    return assignment
 
 
+#===================================================================================================
+#                                          Coverage map
+# Which water my drones lit recently, on a grid of COVERAGE_CELL cells. A cell holds the turn
+# until which it is known to hide no fish: lit at turn t, a cell at distance d from the
+# center of a scan disc of radius r stays known until t + (r - d) / 200, the time a fish
+# needs to swim in from the edge of the disc. Cells above the fish habitats are always
+# known. Needs numpy: without it, the game has no coverage map.
+#===================================================================================================
 
+COVERAGE_CELL = 250  # u
 
 
+class Coverage:
+    def __init__(self):
+        self.size = MAP_SIZE // COVERAGE_CELL
+        self.centers = (np.arange(self.size) + 0.5) * COVERAGE_CELL
+        self.known_until = np.full((self.size, self.size), -1.0)  # [x, y]
+        self.known_until[:, self.centers < FISH_TYPE_0_MIN_Y] = np.inf
 
+    def window(self, pos: Vector, radius: float):
+        # slices of the cells around the disc, and the distances of their centers to pos
+        def cells(c):
+            return slice(max(0, int((c - radius) // COVERAGE_CELL)), min(self.size, int((c + radius) // COVERAGE_CELL) + 1))
+        window = (cells(pos.x), cells(pos.y))
+        d = np.sqrt((self.centers[window[0]] - pos.x)[:, None] ** 2 + (self.centers[window[1]] - pos.y)[None, :] ** 2)
+        return window, d
 
+    def stamp(self, pos: Vector, radius: float, turn: int):
+        window, d = self.window(pos, radius)
+        until = np.where(d <= radius, turn + (radius - d) / FISH_MOVE_DISTANCE, -1.0)
+        np.maximum(self.known_until[window], until, out=self.known_until[window])
 
+    def is_known(self, pos: Vector, turn: int) -> bool:
+        x = min(self.size - 1, max(0, int(pos.x // COVERAGE_CELL)))
+        y = min(self.size - 1, max(0, int(pos.y // COVERAGE_CELL)))
+        return bool(self.known_until[x, y] > turn)
 
+    def new_coverage(self, pos: Vector, radius: float, turn: int) -> float:
+        # share of the disc not known at that turn: what lighting it would add
+        window, d = self.window(pos, radius)
+        inside = d <= radius
+        cells = np.count_nonzero(inside)
+        return float(np.count_nonzero(inside & (self.known_until[window] <= turn))) / cells if cells else 0.0
 
 
+def stamp_coverage(game: "GameEngine"):
+    # the scan discs of my drones at the end of last turn, where they are now
+    if game.coverage is None:
+        return
+    for drone in game.my_drones:
+        if not drone.dead:
+            game.coverage.stamp(drone.pos, DRONE_LIGHT_RADIUS_POWERFUL if drone.lit else DRONE_LIGHT_RADIUS, game.loop)
 
 
+#===================================================================================================
+#                                          Path coverage
+# What a drone would scan on its way: each fish left to scan is one point, where its last seen
+# speed brings it, or a grid of points over its radar box, each worth its share of the fish,
+# the points in water the coverage map knows being dropped (fish_samples). A path heads to
+# its target at full speed, and on in the same heading past it (drone_path); the scans happen
+# at the end of each turn, so the light corridor is a disc per turn. candidate_paths and
+# covered_samples score a batch of candidate targets in one numpy computation over candidates
+# x turns x points: the expected number of fish scanned within PATH_COVERAGE_TURNS and their
+# expected value.
+#===================================================================================================
 
+PATH_COVERAGE_TURNS = 5
+SAMPLE_GRID = 4  # points per side of the grid over a radar box
+
+
+def drone_path(drone: Drone, turns: int) -> List[Vector]:
+    # positions at the end of each of the next turns, where the scans happen
+    path = []
+    pos = drone.pos
+    d = dist(pos, drone.target)
+    if drone.waiting or d == 0:
+        step = Vector(0, DRONE_SINK_SPEED)
+    else:
+        step = Vector((drone.target.x - pos.x) * DRONE_MOVE_SPEED / d, (drone.target.y - pos.y) * DRONE_MOVE_SPEED / d)
+    for _ in range(turns):
+        pos = Vector(clamp(pos.x + step.x, 0, MAP_SIZE - 1), clamp(pos.y + step.y, 0, MAP_SIZE - 1))
+        path.append(pos)
+    return path
+
+
+def fish_samples(game: "GameEngine") -> List[tuple]:
+    # (fish id, weight, position, speed) points of the fish left to scan, weights summing to 1 per fish;
+    # computed once per turn
+    if game.samples and game.samples[0] == game.loop:
+        return game.samples[1]
+    samples = []
+    for fish_id, (pos, speed) in fish_left(game).items():
+        box = None if is_tracked(game, fish_id) else radar_box(game, fish_id)
+        if not box:
+            samples.append((fish_id, 1.0, pos, speed))
+            continue
+        x_low, x_high, y_low, y_high = box
+        grid = [Vector(x_low + (x_high - x_low) * (i + 0.5) / SAMPLE_GRID, y_low + (y_high - y_low) * (j + 0.5) / SAMPLE_GRID)
+                for i in range(SAMPLE_GRID) for j in range(SAMPLE_GRID)]
+        if game.coverage:
+            grid = [p for p in grid if not game.coverage.is_known(p, game.loop)] or grid
+        samples.extend((fish_id, 1.0 / len(grid), p, speed) for p in grid)
+    game.samples = (game.loop, samples)
+    return samples
+
+
+def candidate_paths(pos: Vector, targets: List[Vector], turns: int):
+    # numpy (targets, turns, 2): the positions at the end of each turn, like drone_path
+    start = np.array(pos, dtype=float)
+    heading = np.array(targets, dtype=float) - start
+    length = np.hypot(heading[:, 0], heading[:, 1])
+    step = np.where(length[:, None] > 0, heading * (DRONE_MOVE_SPEED / np.maximum(length, 1))[:, None], (0, DRONE_SINK_SPEED))
+    return np.clip(start + np.arange(1, turns + 1)[None, :, None] * step[:, None, :], 0, MAP_SIZE - 1)
+
+
+def covered_samples(game: "GameEngine", samples: List[tuple], paths, radii):
+    # numpy (expected fish scanned, expected value) per path, scanning radii (paths, turns)
+    if not samples:
+        return np.zeros(len(paths)), np.zeros(len(paths))
+    values = fish_values(game, {s[0] for s in samples})
+    weight = np.array([s[1] for s in samples])
+    value = weight * np.array([values[s[0]] for s in samples])
+    ahead = np.minimum(np.arange(1, paths.shape[1] + 1), TOUR_PREDICTION_TURNS)
+    # points (turns, samples, 2), where their fish should be at the end of each turn
+    fish = np.array([s[2] for s in samples], dtype=float)[None] \
+        + ahead[:, None, None] * np.array([s[3] for s in samples], dtype=float)[None]
+    gap = paths[:, :, None, :] - fish[None]
+    covered = ((gap ** 2).sum(axis=-1) <= radii[:, :, None] ** 2).any(axis=1)  # (paths, samples)
+    return covered @ weight, covered @ value
+
+
+#===================================================================================================
+#                                          Move evaluation
+# One batched evaluation of candidate moves (target, light) for a drone: roles generate the
+# candidates and weigh the criteria, choose_move picks the best. Over the next
+# PATH_COVERAGE_TURNS turns of each candidate's path (candidate_paths), the light being on
+# the first turn only:
+# - risk: for each known monster, 1 at contact down to 0 MOVE_RISK_RADIUS further, at its
+#   closest; a monster that detects the drone (1100u, 2300u after a lit turn) swims at it at
+#   full speed, the others keep their last seen speed;
+# - scans and score: the expected fish scanned and their value (covered_samples), plus the
+#   points of the scans carried if the path reaches the surface;
+# - surface: the distance left to the surface after the first turn;
+# - battery: after the first turn.
+# The work is counted in the turn budget: move_candidates, move_us. Only the GREEDY role and
+# the side the default role picks when both have fish (prefers_left) choose this way so far;
+# the other targets of the roles and the evasion (find_safe_direction) keep their own rules.
+#===================================================================================================
+
+MOVE_RISK_RADIUS = 1200  # u beyond contact
+
+
+class Move(NamedTuple):
+    target: Vector
+    light: bool
+
+
+class MoveScores(NamedTuple):
+    # numpy arrays, one value per move
+    risk: Any
+    scans: Any
+    surface: Any
+    battery: Any
+    score: Any
+
+
+class MoveWeights(NamedTuple):
+    risk: float = 0.0
+    scans: float = 0.0
+    surface: float = 0.0
+    battery: float = 0.0
+    score: float = 0.0
+
+
+def evaluate_moves(game: "GameEngine", drone: Drone, moves: List[Move], turns: int = PATH_COVERAGE_TURNS,
+                   samples: Optional[List[tuple]] = None) -> MoveScores:
+    # needs numpy
+    started = time.perf_counter()
+    samples = fish_samples(game) if samples is None else samples
+    paths = candidate_paths(drone.pos, [m.target for m in moves], turns)
+    lit = np.array([m.light for m in moves]) & (drone.battery >= BATTERY_DRAIN_POWERFUL_LIGHT)
+    radii = np.full(paths.shape[:2], float(DRONE_LIGHT_RADIUS))
+    radii[:, 0] = np.where(lit, DRONE_LIGHT_RADIUS_POWERFUL, DRONE_LIGHT_RADIUS)
+    scans, value = covered_samples(game, samples, paths, radii)
+    surfaced = (paths[:, :, 1] < DRONE_SURFACE_Y_THRESHOLD).any(axis=1)
+    score = value + surfaced * Score.estimated_drone_save(drone)
+    surface = np.maximum(0.0, paths[:, 0, 1] - DRONE_SURFACE_Y_THRESHOLD)
+    battery = np.where(lit, drone.battery - BATTERY_DRAIN_POWERFUL_LIGHT, min(BATTERY_CAPACITY, drone.battery + BATTERY_RECHARGE_RATE))
+
+    risk = np.zeros(len(moves))
+    monsters = [fs for fs in game.fish_global_map.values() if fs.is_monster and is_tracked(game, fs.fish_id)]
+    if monsters:
+        # monsters (moves, monsters, 2), each turn detecting with the light of the turn before
+        monster = np.repeat(np.array([fs.predicted_pos for fs in monsters], dtype=float)[None], len(moves), axis=0)
+        speed = np.array([fs.last_seen_speed or (0, 0) for fs in monsters], dtype=float)[None]
+        last_turn = DRONE_LIGHT_RADIUS_POWERFUL if drone.lit else DRONE_LIGHT_RADIUS
+        before = np.concatenate([np.full((len(moves), 1), float(last_turn)), radii[:, :-1]], axis=1)
+        detection = before + MONSTER_MIN_DETECTION_RADIUS - DRONE_LIGHT_RADIUS
+        at = np.repeat(np.array(drone.pos, dtype=float)[None], len(moves), axis=0)
+        closest = np.full(monster.shape[:2], np.inf)
+        for t in range(turns):
+            gap = at[:, None, :] - monster
+            d = np.hypot(gap[..., 0], gap[..., 1])
+            chase = (d <= detection[:, t, None])[..., None]
+            monster = monster + np.where(chase, gap * (MONSTER_AGGRESSIVE_SPEED / np.maximum(d, 1))[..., None], speed)
+            at = paths[:, t]
+            gap = at[:, None, :] - monster
+            closest = np.minimum(closest, np.hypot(gap[..., 0], gap[..., 1]))
+        risk = np.clip(1 - (closest - MONSTER_INTERACTION_RADIUS) / MOVE_RISK_RADIUS, 0, 1).sum(axis=1)
+
+    if game.budget:
+        game.budget.count("move_candidates", len(moves))
+        game.budget.count("move_us", int((time.perf_counter() - started) * 1e6))
+    return MoveScores(risk, scans, surface, battery, score)
+
+
+def choose_move(drone: Drone, moves: List[Move], weights: MoveWeights, samples: Optional[List[tuple]] = None) -> Move:
+    # the best weighted sum of the criteria, the first move on a tie
+    scores = evaluate_moves(drone.game, drone, moves, samples=samples)
+    utility = np.zeros(len(moves))
+    for weight, values in zip(weights, scores):
+        if weight:
+            utility += weight * values
+    best = int(np.argmax(utility))
+    print_debug("%s: move %s of %d, utility %.2f", drone.name(), moves[best], len(moves), utility[best])
+    return moves[best]
+
+
+#===================================================================================================
+#                                          Light schedule
+# The powerful light is planned over the next LIGHT_HORIZON turns (fewer when the game ends
+# sooner) along the drone's path: towards its target at full speed, and on in the same
+# heading, or sinking when it waits (drone_path). Each point of the fish left to scan
+# (fish_samples) counts at the turn the path passes closest to it, if it is then within
+# 2000u but never within 800u (scanned without the light anyway). Lighting while a known
+# monster is in detection range of the light but not of the plain scan attracts it: that
+# costs LIGHT_MONSTER_RISK times the scans the drone carries, plus one. A dynamic program
+# over the turns and the battery (drain 5, recharge 1) then picks the turns to light; the
+# battery left after the horizon is worth LIGHT_BATTERY_VALUE per point, unless the game is
+# over by then.
+#===================================================================================================
+
+LIGHT_HORIZON = 10
+
+
+def light_gains(drone: Drone, path: List[Vector], samples: List[tuple], monsters: List[tuple]) -> List[float]:
+    # expected new scans of lighting at each turn of the path, minus the monster risk
+    if np:
+        return light_gains_np(drone, path, samples, monsters)
+    gains = [0.0] * len(path)
+    for _, weight, pos, speed in samples:
+        distances = [dist(p, Vector(pos.x + speed.x * min(k + 1, TOUR_PREDICTION_TURNS),
+                                    pos.y + speed.y * min(k + 1, TOUR_PREDICTION_TURNS)))
+                     for k, p in enumerate(path)]
+        closest = min(distances)
+        if DRONE_LIGHT_RADIUS < closest <= DRONE_LIGHT_RADIUS_POWERFUL:
+            gains[distances.index(closest)] += weight
+    risk = LIGHT_MONSTER_RISK * (1 + len(drone.scans))
+    for pos, speed in monsters:
+        for k, p in enumerate(path):
+            later = Vector(pos.x + speed.x * min(k + 1, TOUR_PREDICTION_TURNS),
+                           pos.y + speed.y * min(k + 1, TOUR_PREDICTION_TURNS))
+            if MONSTER_MIN_DETECTION_RADIUS < dist(p, later) <= MONSTER_MAX_DETECTION_RADIUS:
+                gains[k] -= risk
+    return gains
+
+
+def light_gains_np(drone: Drone, path: List[Vector], samples: List[tuple], monsters: List[tuple]) -> List[float]:
+    # light_gains in one numpy computation over points x turns, same results
+    ahead = np.minimum(np.arange(1, len(path) + 1), TOUR_PREDICTION_TURNS)[None, :, None]
+    points = np.array(path, dtype=float)[None]
+
+    def distances(moving):
+        # dist() (truncated) from each point of the path to where each (position, speed) is then
+        pos, speed = np.array(moving, dtype=float).reshape(-1, 1, 2, 2).transpose(2, 0, 1, 3)
+        gap = points - (pos + speed * ahead)
+        return np.floor(np.hypot(gap[..., 0], gap[..., 1]))
+
+    gains = np.zeros(len(path))
+    if samples:
+        d = distances([(pos, speed) for _, _, pos, speed in samples])
+        closest = d.argmin(axis=1)
+        reached = (d.min(axis=1) > DRONE_LIGHT_RADIUS) & (d.min(axis=1) <= DRONE_LIGHT_RADIUS_POWERFUL)
+        gains = np.bincount(closest[reached], np.array([s[1] for s in samples])[reached], minlength=len(path))
+    if monsters:
+        risk = LIGHT_MONSTER_RISK * (1 + len(drone.scans))
+        d = distances(monsters)
+        for attracted in (d > MONSTER_MIN_DETECTION_RADIUS) & (d <= MONSTER_MAX_DETECTION_RADIUS):
+            gains = gains - risk * attracted
+    return gains.tolist()
+
+
+def schedule_light(gains: List[float], battery: int, battery_value: float) -> List[bool]:
+    # the turns to light: best total gain over (turn, battery), battery left worth battery_value
+    value = [b * battery_value for b in range(BATTERY_CAPACITY + 1)]
+    light_at = []
+    if np:
+        # the same, a battery level per element
+        levels = np.arange(BATTERY_CAPACITY + 1)
+        recharged = np.minimum(BATTERY_CAPACITY, levels + BATTERY_RECHARGE_RATE)
+        drained = np.maximum(0, levels - BATTERY_DRAIN_POWERFUL_LIGHT)
+        value = np.array(value)
+        for gain in reversed(gains):
+            off = value[recharged]
+            on = np.where(levels >= BATTERY_DRAIN_POWERFUL_LIGHT, gain + value[drained], off)
+            value = np.maximum(on, off)
+            light_at.append((on > off).tolist())
+    else:
+        for gain in reversed(gains):
+            new_value = []
+            light = []
+            for b in range(BATTERY_CAPACITY + 1):
+                off = value[min(BATTERY_CAPACITY, b + BATTERY_RECHARGE_RATE)]
+                on = gain + value[b - BATTERY_DRAIN_POWERFUL_LIGHT] if b >= BATTERY_DRAIN_POWERFUL_LIGHT else off
+                new_value.append(max(on, off))
+                light.append(on > off)
+            value = new_value
+            light_at.append(light)
+    light_at.reverse()
+    schedule = []
+    for light in light_at:
+        schedule.append(light[battery])
+        battery = battery - BATTERY_DRAIN_POWERFUL_LIGHT if light[battery] \
+            else min(BATTERY_CAPACITY, battery + BATTERY_RECHARGE_RATE)
+    return schedule
+
+
+def plan_light(drone: Drone) -> List[bool]:
+    game = drone.game
+    turns = max(1, min(LIGHT_HORIZON, MAX_TURNS - game.loop))
+    monsters = [(fs.predicted_pos, fs.last_seen_speed or Vector(0, 0)) for fs in game.fish_global_map.values()
+                if fs.is_monster and is_tracked(game, fs.fish_id)]
+    gains = light_gains(drone, drone_path(drone, turns), fish_samples(game), monsters)
+    battery_value = LIGHT_BATTERY_VALUE if game.loop + turns < MAX_TURNS else 0.0
+    schedule = schedule_light(gains, drone.battery, battery_value)
+    print_debug("%s: light %s gains %s", drone.name(), "".join("1" if l else "0" for l in schedule),
+                " ".join(f"{g:.2f}" for g in gains))
+    return schedule
 
 
 #===================================================================================================
@@ -861,7 +1475,7 @@ def move_drone_safely(drone_position: Vector, bots_positions: List[Vector], targ
 #===================================================================================================
 def run_rush(drone):
     drone.target = Vector(drone.pos.x, 499)
-    
+
 #===================================================================================================
 #                                          Chase strategy
 #===================================================================================================
@@ -869,16 +1483,16 @@ def run_chase(drone):
     # Follow foe drone associated to your drone
     # Assign the drone target just behind the foe drone y - 100
     # If the foe is dead, evade and leave the zone
-    if(loop == 0):
-        foes_by_distance = sorted(foe_drones, key=lambda foe: dist(drone.pos, foe.pos))
+    if(drone.game.loop == 0):
+        foes_by_distance = sorted(drone.game.foe_drones, key=lambda foe: dist(drone.pos, foe.pos))
         drone.context["chasing_id"] = foes_by_distance[0].drone_id
-    
-    foe = [foe for foe in foe_drones if foe.drone_id == drone.context["chasing_id"]][0]
+
+    foe = [foe for foe in drone.game.foe_drones if foe.drone_id == drone.context["chasing_id"]][0]
     if foe.dead:
         drone.target = Vector(foe.pos.x, 500)
     else:
         drone.target = Vector(foe.pos.x, foe.pos.y - CHASER_DISTANCE_FROM_FOE)
-        
+
 def run_fast(drone):
     if drone.pos.x % 800 == 0:
         drone.target = Vector(drone.target.x + 1600, FAST_MAX_DEPTH if drone.target.y < 500 else 499)
@@ -902,7 +1516,7 @@ def run_sinker(y_max_depth, is_full=False):
                 drone.context["target_stack"] = [Vector(X_LEFT_MARGIN, y_max_depth), Vector(X_RIGHT_MARGIN, y_max_depth), Vector(X_RIGHT_MARGIN, Y_SURFACE)]
             else:
                 drone.context["target_stack"] = [Vector(X_RIGHT_MARGIN, y_max_depth), Vector(X_LEFT_MARGIN, y_max_depth), Vector(X_LEFT_MARGIN, Y_SURFACE)]
-        
+
         drone.state = StrategyState.SINKING
 
     def inner(drone):
@@ -918,31 +1532,6 @@ def run_sinker(y_max_depth, is_full=False):
             init(drone)
         drone.target = drone.context["target_stack"][0]
 
-
-        #===========================
-        #     Change state
-        #===========================
-        # target1 = if SinkerSide.FULL_RIGHT else
-
-        # if drone.pos.y >= y_max_depth and drone.state == StrategyState.SINKING:
-        #     drone.state = StrategyState.CROSSING
-        # elif drone.pos.y >= y_max_depth and drone.state == StrategyState.CROSSING \
-        #         and checkpoints - 400 <= drone.pos.x <= checkpoints + 400:
-        #     drone.state = StrategyState.RISING
-        # elif drone.pos.y <= 500 and drone.state == StrategyState.RISING:
-        #     drone.state = StrategyState.SINKING
-        #     drone.role = DroneRole.SINKER_MID2 if drone.role == DroneRole.SINKER_MID1 else DroneRole.SINKER_LOW
-        #     drone.context["side"] = SinkerSide.RIGHT if drone.context["side"] == SinkerSide.LEFT else SinkerSide.LEFT
-
-        # #===========================
-        # #     state -> target
-        # #===========================
-        # if(drone.state == StrategyState.SINKING):
-        #     drone.target = Vector(X_RIGHT_MARGIN if drone.context["side"] == SinkerSide.RIGHT else X_LEFT_MARGIN, y_max_depth)
-        # elif(drone.state == StrategyState.CROSSING):
-        #     drone.target = Vector(X_LEFT_MARGIN if drone.context["side"] == SinkerSide.RIGHT else X_RIGHT_MARGIN, y_max_depth)
-        # elif(drone.state == StrategyState.RISING):
-        #     drone.target = Vector(drone.pos.x, 499)
     return inner
 
 #===================================================================================================
@@ -972,12 +1561,24 @@ Right bot:
   - rise: x=L
 """
 #===================================================================================================
+FEUILLE_MORTE_SIDE_WEIGHTS = MoveWeights(score=1.0)
+
+
+def prefers_left(drone: Drone, left: Vector, right: Vector) -> bool:
+    # both sides have fish: the one where the drone should score more, else its own side
+    own_first = [left, right] if drone.context["side"] == SinkerSide.LEFT else [right, left]
+    if not np:
+        return own_first[0] == left
+    return choose_move(drone, [Move(target, False) for target in own_first], FEUILLE_MORTE_SIDE_WEIGHTS).target == left
+
+
 def run_feuille_morte_v2(directions=[RADAR_BOTTOM_LEFT, RADAR_BOTTOM_RIGHT], y_direction = 1):
     def init(drone: Drone):
       drone.context["side"] = SinkerSide.LEFT if drone.pos.x < 5000 else SinkerSide.RIGHT
       drone.state = StrategyState.SINKING
 
     def inner(drone: Drone):
+        loop = drone.game.loop
         if loop == 0 or drone.state == StrategyState.INIT:
             init(drone)
 
@@ -985,14 +1586,13 @@ def run_feuille_morte_v2(directions=[RADAR_BOTTOM_LEFT, RADAR_BOTTOM_RIGHT], y_d
         #     State check
         #===========================
         # If there are many more fishes above than below, change state to rising
-        ABOVE_UNSCANNED_FISH_COEFFICIENT = 1.5
         if drone.state == StrategyState.SINKING \
                 and (drone.get_radar_blips_unscanned_fish_count(RADAR_TOP_LEFT, RADAR_TOP_RIGHT) * ABOVE_UNSCANNED_FISH_COEFFICIENT) > drone.get_radar_blips_unscanned_fish_count(RADAR_BOTTOM_LEFT, RADAR_BOTTOM_RIGHT):
-            # drone.set_role(DroneRole.FEUILLE_MORTE_TOP)
             drone.state = StrategyState.RISING
 
         # Drone is at the bottom of the map, need to go to the middle
-        if drone.pos.y >= (7250 if loop < 40 else 8500)  and drone.state == StrategyState.SINKING:
+        if drone.pos.y >= (FEUILLE_MORTE_CROSSING_DEPTH_EARLY if loop < 40 else FEUILLE_MORTE_CROSSING_DEPTH) \
+                and drone.state == StrategyState.SINKING:
             drone.state = StrategyState.CROSSING
         # Drone is at the middle of the map, need to go to the top
         elif 3250 <= drone.pos.x <= 6750 and drone.state == StrategyState.CROSSING:
@@ -1005,7 +1605,7 @@ def run_feuille_morte_v2(directions=[RADAR_BOTTOM_LEFT, RADAR_BOTTOM_RIGHT], y_d
         #===========================
         if(drone.state == StrategyState.SINKING):
             # Scan for fishes above/below
-            drone.refresh_radar(my_radar_blips[drone.drone_id])
+            drone.refresh_radar(drone.game.my_radar_blips[drone.drone_id])
             # If there is a fish above, go to the specific location
 
             target_y = min(drone.pos.y + y_direction * 3000, 7500 if loop < 40 else 8500)
@@ -1018,7 +1618,8 @@ def run_feuille_morte_v2(directions=[RADAR_BOTTOM_LEFT, RADAR_BOTTOM_RIGHT], y_d
 
             # If both sides have fishes, go to the side of the drone
             if fishes_left and fishes_right:
-                if drone.context["side"] == SinkerSide.LEFT or drone.get_radar_blips_monsters(RADAR_BOTTOM_RIGHT):
+                if drone.get_radar_blips_monsters(RADAR_BOTTOM_RIGHT) \
+                        or prefers_left(drone, Vector(left_new_target, target_y), Vector(right_new_target, target_y)):
                     drone.target = Vector(left_new_target, target_y)
                 else:
                     drone.target = Vector(right_new_target, target_y)
@@ -1031,21 +1632,11 @@ def run_feuille_morte_v2(directions=[RADAR_BOTTOM_LEFT, RADAR_BOTTOM_RIGHT], y_d
             # If nothing detected, go to the middle
             else:
               drone.target = Vector(1500 if drone.context["side"] == SinkerSide.LEFT else 8500, target_y)
-            # if drone.get_radar_blips_unscanned_fish_count(directions[0]):  #? Can be improved by giving a drone a preference on a side to go first
-            #   print_debug("%s found fish above/below left", drone.drone_id)
-            #   drone.target = Vector(1500 if drone.context["side"] == SinkerSide.LEFT else 6500, 10000)
-            # elif drone.get_radar_blips_unscanned_fish_count(directions[1]):
-            #   print_debug("%s found fish above/below right", drone.drone_id)
-            #   drone.target = Vector(3500 if drone.context["side"] == SinkerSide.LEFT else 8500, 10000)
-            # else:
-              # Nothing detected, go to the middle
-            #   drone.target = Vector(2500 if drone.context["side"] == SinkerSide.LEFT else 7500, 10000)
         elif(drone.state == StrategyState.CROSSING):
             drone.target = Vector(3500 if drone.context["side"] == SinkerSide.LEFT else 6500, 7500 if loop < 40 else 8500)
         elif(drone.state == StrategyState.RISING):
-            # drone.target = Vector(3500 if drone.context["side"] == SinkerSide.LEFT else 6500, 0)
             # Scan for fishes above/below
-            drone.refresh_radar(my_radar_blips[drone.drone_id])
+            drone.refresh_radar(drone.game.my_radar_blips[drone.drone_id])
             # If there is a fish above, go to the specific location
 
             fishes_left = drone.get_radar_blips_unscanned_fish_count(RADAR_TOP_LEFT)
@@ -1058,7 +1649,8 @@ def run_feuille_morte_v2(directions=[RADAR_BOTTOM_LEFT, RADAR_BOTTOM_RIGHT], y_d
 
             # If both sides have fishes, go to the side of the drone
             if fishes_left and fishes_right:
-                if drone.context["side"] == SinkerSide.LEFT or drone.get_radar_blips_monsters(RADAR_TOP_RIGHT):
+                if drone.get_radar_blips_monsters(RADAR_TOP_RIGHT) \
+                        or prefers_left(drone, Vector(left_new_target, target_y), Vector(right_new_target, target_y)):
                     drone.target = Vector(left_new_target, target_y)
                 else:
                     drone.target = Vector(right_new_target, target_y)
@@ -1074,47 +1666,6 @@ def run_feuille_morte_v2(directions=[RADAR_BOTTOM_LEFT, RADAR_BOTTOM_RIGHT], y_d
     return inner
 
 
-def run_feuille_morte():
-    def init(drone: Drone):
-      drone.context["side"] = SinkerSide.LEFT if drone.pos.x < 5000 else SinkerSide.RIGHT
-      drone.state = StrategyState.SINKING
-
-    def inner(drone: Drone):
-        if loop == 0:
-            init(drone)
-
-        #===========================
-        #     State check
-        #===========================
-        # Drone is at the bottom of the map, need to go to the middle
-        if drone.pos.y >= 8000 and drone.state == StrategyState.SINKING:
-            drone.state = StrategyState.CROSSING
-        # Drone is at the middle of the map, need to go to the top
-        elif 3750 <= drone.pos.x <= 6250 and drone.state == StrategyState.CROSSING:
-            drone.state = StrategyState.RISING
-
-        #===========================
-        #     State resolution
-        #===========================
-        if(drone.state == StrategyState.SINKING):
-            # Scan for fishes above
-            drone.refresh_radar(my_radar_blips[drone.drone_id])
-            # If there is a fish above, go to the specific location
-            if drone.get_radar_blips_unscanned_fish_count(RADAR_TOP_LEFT):  #? Can be improved by giving a drone a preference on a side to go first
-              print_debug("%s found fish above left", drone.drone_id)
-              drone.target = Vector(1500 if drone.context["side"] == SinkerSide.LEFT else 6500, 10000)
-            elif drone.get_radar_blips_unscanned_fish_count(RADAR_TOP_RIGHT):
-              print_debug("%s found fish above right", drone.drone_id)
-              drone.target = Vector(3500 if drone.context["side"] == SinkerSide.LEFT else 8500, 10000)
-            else:
-              # Nothing detected, go to the middle
-              drone.target = Vector(2500 if drone.context["side"] == SinkerSide.LEFT else 7500, 10000)
-        elif(drone.state == StrategyState.CROSSING):
-            drone.target = Vector(3500 if drone.context["side"] == SinkerSide.LEFT else 6500, 7000)
-        elif(drone.state == StrategyState.RISING):
-            drone.target = Vector(3500 if drone.context["side"] == SinkerSide.LEFT else 6500, 0)
-    return inner
-
 strategies = {
     DroneRole.FAST: run_fast,
     DroneRole.SINKER_LOW: run_sinker(8000),
@@ -1127,28 +1678,13 @@ strategies = {
 }
 
 
-
-
 class Score:
-    global_estimated_ally_score: int = 0
-    global_estimated_enemy_score: int = 0
-
-    drone_score_details: Dict[int, dict] = {}
-
-    @staticmethod
-    def update_global_scores(my_score, foe_score):
-        Score.global_ally_score = my_score
-        Score.global_enemy_score = foe_score
+    # Stateless: the scores and score details live in the GameEngine of the drones
 
     @staticmethod
-    def update_estimated_global_scores():
-        global my_drones, foe_drones
-        Score.global_estimated_ally_score = Score.estimated_drones_score(my_drones)
-        Score.global_estimated_enemy_score = Score.estimated_drones_score(foe_drones)
-
-    @staticmethod
-    def estimated_drones_score(drones: List[Drone]):
-        return sum([Score.estimated_drone_save(drone) for drone in drones])
+    def update_global_scores(game: "GameEngine", my_score, foe_score):
+        game.global_ally_score = my_score
+        game.global_enemy_score = foe_score
 
     # Fishes score :
     # - type 0 : 1 point
@@ -1173,7 +1709,7 @@ class Score:
         }
 
         for scan_id in drone.scans:
-            fish: FishDetail = fish_details[scan_id]
+            fish: FishDetail = drone.game.fish_details[scan_id]
             score += fish.type + 1
             fish_types[fish.type] += fish
             fish_colors[fish.color] += fish
@@ -1185,246 +1721,545 @@ class Score:
             if len(f_color) == 3:
                 score += 3
 
-        # save values in the drone_score_details
-        Score.drone_score_details[drone.drone_id] = {
-            "fish_types": fish_types,
-            "fish_colors": fish_colors,
-        }
-
         return score
 
-    @staticmethod
-    def estimated_score_with_bonus(drones: list[Drone], other_drones: list[Drone]):
-        score = 0
-        fish_types = {
-            0: [],
-            1: [],
-            2: [],
-        }
-        fish_colors = {
-            0: [],
-            1: [],
-            2: [],
-            3: [],
-        }
 
-        for drone in drones:
-            score += Score.estimated_drone_save(drone)
-        # update the score of the other drones
-        for drone in other_drones:
-            Score.estimated_drone_save(drone)
-
-        drone_ids = [drone.drone_id for drone in drones]
-        for id in drone_ids:
-            for x in range(3):
-                fish_types[x] += Score.drone_score_details[id]["fish_types"][x]
-                score += len(fish_types[x]) * (x + 1)
-            for x in range(4):
-                fish_colors[x] += Score.drone_score_details[id]["fish_colors"][x]
-
-        #================================================
-        #                Score without bonus
-        #================================================
-        other_drone_ids = [drone.drone_id for drone in other_drones]
-        for id in other_drone_ids:
-            for x in range(3):
-                other_fish_types = Score.drone_score_details[id]["fish_types"][x]
-                for fish in other_fish_types:
-                    if fish not in fish_types[x]:
-                        score += x + 1  # bonus for being the first to save
-                fish_types[x] += Score.drone_score_details[id]["fish_types"][x]
-            for x in range(4):
-                fish_colors[x] += Score.drone_score_details[id]["fish_colors"][x]
-                for fish in Score.drone_score_details[id]["fish_colors"][x]:
-                    if fish in fish_colors[x]:
-                        # fish_colors[x].remove(fish)
-                        pass
+#===================================================================================================
+#                                          Game engine
+# The decision core: takes the init data and one TurnInput per turn, returns the commands.
+# It keeps all the state of one game, so many games can be played in the same process.
+#===================================================================================================
 
-        for f_type in fish_types.values():
-            if len(f_type) == 3:
-                score += 4
-        for f_color in fish_colors.values():
-            if len(f_color) == 3:
-                score += 3
+class DroneStatus(NamedTuple):
+    drone_id: int
+    pos: Vector
+    dead: bool
+    battery: int
 
-        #================================================
-        #                Score only with bonus
-        #================================================
-        for id in other_drone_ids:
-            for x in range(3):
-                other_fish_types = Score.drone_score_details[id]["fish_types"][x]
-                for fish in other_fish_types:
-                    if fish in fish_types[x]:
-                        fish_types[x].remove(fish)
-                fish_types[x] += Score.drone_score_details[id]["fish_types"][x]
-            for x in range(4):
-                fish_colors[x] += Score.drone_score_details[id]["fish_colors"][x]
-                for fish in Score.drone_score_details[id]["fish_colors"][x]:
-                    if fish in fish_colors[x]:
-                        fish_colors[x].remove(fish)
+class VisibleCreature(NamedTuple):
+    fish_id: int
+    pos: Vector
+    speed: Vector
 
-        for f_type in fish_types.values():
-            if len(f_type) == 3:
-                score += 4
-        for f_color in fish_colors.values():
-            if len(f_color) == 3:
-                score += 3
+class TurnInput(NamedTuple):
+    my_score: int
+    foe_score: int
+    # the fish scans that have been validated (giving us points)
+    my_scans: List[int]
+    foe_scans: List[int]
+    my_drones: List[DroneStatus]
+    foe_drones: List[DroneStatus]
+    # the fishes the drone carried at some point, validated or not: (drone_id, fish_id)
+    drone_scans: List[tuple]
+    # all fish visible (within DRONE_LIGHT_RADIUS or more for monsters) by both drones
+    visible_creatures: List[VisibleCreature]
+    # (drone_id, blip), TL=TopLeft etc.
+    radar_blips: List[tuple]
+    # time.perf_counter() when the first line of the turn arrived
+    received_at: float
+
+
+def read_init(read_line=input) -> Dict[int, FishDetail]:
+    fish_details: Dict[int, FishDetail] = {}
+    fish_count = int(read_line())
+    for _ in range(fish_count):
+        fish_id, color, _type = map(int, read_line().split())
+        fish_details[fish_id] = FishDetail(color, _type)
+    return fish_details
+
+
+def read_turn(read_line=input, on_arrival=None) -> TurnInput:
+    my_score = int(read_line())
+    # the clock starts as soon as the referee sends the turn
+    received_at = time.perf_counter()
+    if on_arrival:
+        on_arrival()
+    foe_score = int(read_line())
+
+    def read_ids():
+        return [int(read_line()) for _ in range(int(read_line()))]
+
+    def read_drones():
+        drones = []
+        for _ in range(int(read_line())):
+            drone_id, drone_x, drone_y, dead, battery = map(int, read_line().split())
+            drones.append(DroneStatus(drone_id, Vector(drone_x, drone_y), dead == 1, battery))
+        return drones
+
+    my_scans = read_ids()
+    foe_scans = read_ids()
+    my_drones = read_drones()
+    foe_drones = read_drones()
+    drone_scans = [tuple(map(int, read_line().split())) for _ in range(int(read_line()))]
+    visible_creatures = []
+    for _ in range(int(read_line())):
+        fish_id, fish_x, fish_y, fish_vx, fish_vy = map(int, read_line().split())
+        visible_creatures.append(VisibleCreature(fish_id, Vector(fish_x, fish_y), Vector(fish_vx, fish_vy)))
+    radar_blips = []
+    for _ in range(int(read_line())):
+        drone_id, fish_id, dir = read_line().split()
+        radar_blips.append((int(drone_id), RadarBlip(int(fish_id), dir)))
+    return TurnInput(my_score, foe_score, my_scans, foe_scans, my_drones, foe_drones, drone_scans,
+                     visible_creatures, radar_blips, received_at)
+
+
+def initial_role() -> DroneRole:
+    # INITIAL_ROLE when this file has its strategy: the planner roles come with extras.py
+    role = DroneRole[INITIAL_ROLE]
+    if role not in strategies:
+        print_debug("no strategy for %s here, playing %s", role.name, DroneRole.FEUILLE_MORTE.name)
+        return DroneRole.FEUILLE_MORTE
+    return role
+
+
+# Retrieve the list of all scans done by all drones and scored ones
+def update_scan_status(drones: list[Drone], my_scans: list[int]):
+    scan_list = []
+    for drone in drones:
+        for scan in drone.scans:
+            if scan not in scan_list:
+                scan_list.append(scan)
+    for scan in my_scans:
+        if scan not in scan_list:
+            scan_list.append(scan)
+    return scan_list
+
+
+class GameEngine:
+    fish_details: Dict[int, FishDetail]
+    loop: int
+    # Map of all fish with capture status
+    fish_global_map: Dict[FishId, FishGlobalState]
+    drone_by_id: Dict[int, Drone]
+    # position and battery/dead of my drones
+    my_drones: List[Drone]
+    # position and battery/dead of the enemy drones
+    foe_drones: List[Drone]
+    my_scans: List[int]
+    foe_scans: List[int]
+    scan_list: List[int]
+    visible_fish: List[VisibleFish]
+    # for each drone_id, a list of blips (TL=TopLeft etc.)
+    my_radar_blips: Dict[int, List[RadarBlip]]
+    ponder: Ponder
+    budget: Optional[TurnBudget]  # of the turn being played
+    # MCTS role: (loop, plan of the turn)
+    plan: Optional[tuple]
+    mcts_table: Dict[tuple, "MctsNode"]  # kept across turns
+    rhea_best: Optional[tuple]  # rhea_search: (turn, best sequences), shifted by one on the next turn
+    # drone id -> the fish it should scan, see assign_fish
+    assignment: Dict[int, List[int]]
+    endgame: Optional["Endgame"]  # solved again when the scans change
+    coverage: Optional["Coverage"]  # None without numpy
+    samples: Optional[tuple]  # (loop, fish_samples of the turn)
+    # TOUR role: drone id -> order of the fish ids, improved from turn to turn
+    tours: Dict[int, List[int]]
+    tours_loop: int
+
+    def __init__(self, fish_details: Dict[int, FishDetail]):
+        self.fish_details = fish_details
+        self.loop = 0
+        self.fish_global_map = {}
+        self.drone_by_id = {}
+        self.my_drones = []
+        self.foe_drones = []
+        self.my_scans = []
+        self.foe_scans = []
+        self.scan_list = []
+        self.visible_fish = []
+        self.my_radar_blips = {}
+        self.global_ally_score = 0
+        self.global_enemy_score = 0
+        self.ponder = Ponder(self)
+        self.budget = None
+        self.plan = None
+        self.mcts_table = {}
+        self.rhea_best = None
+        self.assignment = {}
+        self.endgame = None
+        self.coverage = Coverage() if np else None
+        self.samples = None
+        self.tours = {}
+        self.tours_loop = -1
+
+    def update(self, turn: TurnInput):
+        self.my_scans = turn.my_scans
+        self.foe_scans = turn.foe_scans
+        Score.update_global_scores(self, turn.my_score, turn.foe_score)
+
+        for statuses, drones in ((turn.my_drones, self.my_drones), (turn.foe_drones, self.foe_drones)):
+            for status in statuses:
+                if status.drone_id not in self.drone_by_id:
+                    drone = Drone(status.drone_id, status.pos, status.dead, status.battery, [], self)
+                    self.drone_by_id[status.drone_id] = drone
+                    drones.append(drone)
+                else:
+                    drone = self.drone_by_id[status.drone_id]
+                    drone.pos = status.pos
+                    drone.dead = status.dead
+                    drone.lit = status.battery < drone.battery
+                    drone.battery = status.battery
+                    drone.scans = []
+        self.my_radar_blips = {status.drone_id: [] for status in turn.my_drones}
+
+        for drone_id, fish_id in turn.drone_scans:
+            if fish_id not in self.drone_by_id[drone_id].scans:
+                self.drone_by_id[drone_id].scans.append(fish_id)
+
+        self.visible_fish = [VisibleFish(c.fish_id, c.pos, c.speed, self.fish_details[c.fish_id])
+                             for c in turn.visible_creatures]
+        for drone_id, blip in turn.radar_blips:
+            self.my_radar_blips[drone_id].append(blip)
+
+    def play_turn(self, turn: TurnInput) -> List[str]:
+        global debug_loop
+        debug_loop = self.loop
+        budget = TurnBudget(TIME_FIRST_TURN_MS if self.loop == 0 else TIME_PER_TURN_MS)
+        budget.started_at = turn.received_at
+        self.budget = budget
+        self.ponder.stop()
+        self.update(turn)
+
+        print_debug(f'my_scan_count {len(self.my_scans)} {self.my_scans}')
+        for drone in self.my_drones:
+            print_debug(f'{drone.name()} drone_scans {drone.scans} ')
+        # call once
+        update_positions(self, self.my_drones, self.visible_fish)
+        self.scan_list = update_scan_status(self.my_drones, self.my_scans)
+        stamp_coverage(self)
+        update_endgame(self)
+        # which drone goes for which fish, read by the strategies
+        assign_fish(self)
+
+        commands = []
+        for drone in self.my_drones:
+            if self.loop == 0:
+                drone.set_role(initial_role())
+
+            #===========================
+            #     Init each loop
+            #===========================
+            print_debug("Start %s", drone)
+
+            #===========================
+            #     Loop strategy
+            #===========================
+            strategies[drone.role](drone)
+
+            drone.is_light_enabled = drone.should_enable_light()
+
+            # Hard fallback: no time left for evasion, keep the strategy's plain target
+            if budget.is_nearly_spent():
+                budget.cut("fallback-" + drone.name())
+                print_debug("%s: budget nearly spent (%s), plain target", drone.name(), budget)
+            else:
+                drone.force_strategy_change(foes=self.foe_drones, budget=budget)
 
-        return score
+                # Detect any monsters
+                # In case a monster is detected, evade it !
+                drone.evasion_orchestrator(budget)
 
 
-class Zone(Enum):
-    SURFACE = 4  # 0   -3000
-    HIGH = 3     # 3000-5000
-    MID = 2      # 5000-7000
-    LOW = 1      # 7000-10000
+            print_debug(drone.get_order_move())
+            commands.append(f"{drone.get_order_move()} {drone.state.name[:2]}")
 
-    @classmethod
-    def get(cls, y):
-        if y < 3000:
-            return Zone.SURFACE
-        elif y < 5000:
-            return Zone.HIGH
-        elif y < 7000:
-            return Zone.MID
-        else:
-            return Zone.LOW
+        print_debug("%s", budget)
+        print_debug("%s", self.ponder)
+        self.loop = self.loop + 1
+        return commands
 
+    def ponder_next_turn(self):
+        # to be called once the orders are sent, while waiting for the next turn
+        self.ponder.start(self.my_drones)
 
 
 #===================================================================================================
+#                                          Lookahead state
+# Compact copy of what a search needs to branch on: flat lists indexed by drone / creature
+# slot, scans as bitmasks over creature slots. sim_clone (extras.py) copies a few short lists
+# and shares everything that does not change during a search (ids, types, which drones are
+# ours), instead of deep-copying Drone.context, FishGlobalState dicts and radars.
 #===================================================================================================
+
+class SimState:
+    __slots__ = ("turn",
+                 # shared between clones
+                 "drone_ids", "mine", "creature_ids", "creature_types", "monster", "slot_of", "points", "combos",
+                 # per drone slot
+                 "x", "y", "battery", "dead", "scans",
+                 # per creature slot; known: the position is an estimate from a sighting
+                 "known", "alive", "cx", "cy", "cvx", "cvy",
+                 # bitmasks over creature slots
+                 "my_saved", "foe_saved",
+                 "my_score", "foe_score")
+
+    turn: int
+    drone_ids: tuple
+    mine: tuple
+    creature_ids: tuple
+    creature_types: tuple  # -1 for monsters
+    monster: tuple
+    slot_of: Dict[int, int]  # creature id -> slot
+    points: tuple  # per creature slot, 0 for monsters
+    combos: tuple  # (bitmask of a color or a type, bonus points)
+    x: List[int]
+    y: List[int]
+    battery: List[int]
+    dead: List[bool]
+    scans: List[int]
+    known: List[bool]
+    alive: List[bool]
+    cx: List[int]
+    cy: List[int]
+    cvx: List[int]
+    cvy: List[int]
+    my_saved: int
+    foe_saved: int
+    my_score: int
+    foe_score: int
+
+    @classmethod
+    def from_engine(cls, game: "GameEngine") -> "SimState":
+        state = cls.__new__(cls)
+        state.turn = game.loop
+        drones = game.my_drones + game.foe_drones
+        state.drone_ids = tuple(d.drone_id for d in drones)
+        state.mine = tuple(d in game.my_drones for d in drones)
+        state.creature_ids = tuple(sorted(game.fish_details))
+        state.creature_types = tuple(game.fish_details[c].type for c in state.creature_ids)
+        state.monster = tuple(t == CREATURE_TYPE_MONSTER for t in state.creature_types)
+        state.slot_of = {c: i for i, c in enumerate(state.creature_ids)}
+        type_points = (SCAN_POINTS_TYPE_0, SCAN_POINTS_TYPE_1, SCAN_POINTS_TYPE_2)
+        state.points = tuple(0 if t == CREATURE_TYPE_MONSTER else type_points[t] for t in state.creature_types)
+
+        def bits(ids):
+            return sum(1 << state.slot_of[c] for c in set(ids) if c in state.slot_of)
+
+        fish = [c for c, t in zip(state.creature_ids, state.creature_types) if t != CREATURE_TYPE_MONSTER]
+        colors = {game.fish_details[c].color for c in fish}
+        types = {game.fish_details[c].type for c in fish}
+        state.combos = tuple([(bits(c for c in fish if game.fish_details[c].color == color), BONUS_POINTS_SAME_COLOR)
+                              for color in sorted(colors)] +
+                             [(bits(c for c in fish if game.fish_details[c].type == t), BONUS_POINTS_SAME_TYPE)
+                              for t in sorted(types)])
+
+        state.x = [int(d.pos.x) for d in drones]
+        state.y = [int(d.pos.y) for d in drones]
+        state.battery = [d.battery for d in drones]
+        state.dead = [d.dead for d in drones]
+        state.scans = [bits(d.scans) for d in drones]
+        # the radar lists every creature still in the map
+        in_map = {blip.fish_id for blips in game.my_radar_blips.values() for blip in blips}
+        state.known, state.alive = [], []
+        state.cx, state.cy, state.cvx, state.cvy = [], [], [], []
+        for c in state.creature_ids:
+            fs = game.fish_global_map.get(c)
+            known = fs is not None and fs.predicted_pos.x >= 0
+            speed = fs.last_seen_speed if known and fs.last_seen_speed else Vector(0, 0)  # type:ignore
+            state.known.append(known)
+            state.alive.append(c in in_map or not in_map)
+            state.cx.append(int(fs.predicted_pos.x) if known else -1)  # type:ignore
+            state.cy.append(int(fs.predicted_pos.y) if known else -1)  # type:ignore
+            state.cvx.append(int(speed.x))
+            state.cvy.append(int(speed.y))
+        state.my_saved = bits(game.my_scans)
+        state.foe_saved = bits(game.foe_scans)
+        state.my_score = game.global_ally_score
+        state.foe_score = game.global_enemy_score
+        return state
+
+    def __str__(self):
+        drones = " ".join(f"{i}:({x},{y}){'D' if d else ''}b{b}s{bin(s).count('1')}"
+                          for i, x, y, d, b, s in zip(self.drone_ids, self.x, self.y, self.dead, self.battery, self.scans))
+        return f"SimState t{self.turn} {drones} saved={bin(self.my_saved).count('1')}/{bin(self.foe_saved).count('1')}" \
+            f" score={self.my_score}/{self.foe_score}"
+
+    __repr__ = __str__
+
+
 #===================================================================================================
+#                                          Endgame
+# Exact scores on bitmasks of the fish (SimState slots) for one pessimistic scenario. The foe
+# saves first the scans it carries, and the fish my surfacing drones carry that a foe drone
+# could scan and bring up before them (foe_save_turns, from the fish's last known position or
+# its habitat). Then my drones that surface save theirs. Then the foe saves all it can still
+# get: every fish alive or carried, first wherever I have not saved. When my score then beats
+# the foe's best, the referee ends the game on my win: surfacing wins unless a fish is far
+# from its estimate. The fewest of my drones to surface is found over their subsets. When no
+# surfacing wins, the fewest fish still to save that would are found over the subsets of the
+# fish left (up to ENDGAME_MAX_FISH), the best margin among as many, within the turn budget.
+# Solved again only when the scans, the saves, the scores or the fish in the map change.
 #===================================================================================================
 
-loop = 0
-drone_by_id: Dict[int, Drone] = {}
-# position and battery/dead of my drones
-my_drones: List[Drone] = []
-# position and battery/dead of the enemy drones
-foe_drones: List[Drone] = []
-
-# game loop
-while True:
-    my_scans: List[int] = []
-    foe_scans: List[int] = []
-    # all fish visible (within DRONE_LIGHT_RADIUS or more for monsters) by both drones
-    visible_fish: List[VisibleFish] = []
-    # for each drone_id, a list of blips (TL=TopLeft etc.)
-    my_radar_blips: Dict[int, List[RadarBlip]] = {}
+ENDGAME_MAX_FISH = 12
+
+
+class Endgame:
+    key: tuple  # what it was solved from
+    surface: List[int]  # my drone ids whose surfacing wins, empty if none does
+    need: List[int]  # otherwise, the fish ids to save on top of the scans carried to win
+    my_best: int
+    foe_best: int
+
+    def __init__(self, state: SimState):
+        self.state = state
+        fish = sum(1 << c for c, m in enumerate(state.monster) if not m)
+        self.alive = sum(1 << c for c, a in enumerate(state.alive) if a) & fish
+        self.my_drones = [i for i, m in enumerate(state.mine) if m and not state.dead[i]]
+        self.foe_carried = 0
+        for i, m in enumerate(state.mine):
+            if not m:
+                self.foe_carried |= state.scans[i]
+        self.key = (state.my_saved, state.foe_saved, tuple(state.scans), self.alive, state.my_score, state.foe_score)
+        self.surface, self.need = [], []
+        self.my_best = self.foe_best = 0
+
+    def gain(self, saved: int, other: int, new: int) -> int:
+        # points for saving new when the other player saved other, as in sim_save (extras.py)
+        new &= ~saved
+        points = sum(p * (1 if (other >> c) & 1 else FIRST_TO_SAVE_MULTIPLIER)
+                     for c, p in enumerate(self.state.points) if (new >> c) & 1)
+        after = saved | new
+        for mask, bonus in self.state.combos:
+            if saved & mask != mask and after & mask == mask:
+                points += bonus * (1 if other & mask == mask else FIRST_TO_SAVE_MULTIPLIER)
+        return points
+
+    def foe_save_turns(self, c: int) -> int:
+        # the fewest turns for a foe drone to get fish slot c within its light, then surface
+        s = self.state
+        best = MAX_TURNS
+        for i in (i for i, mine in enumerate(s.mine) if not mine and not s.dead[i]):
+            radius = DRONE_LIGHT_RADIUS_POWERFUL if s.battery[i] >= BATTERY_DRAIN_POWERFUL_LIGHT else DRONE_LIGHT_RADIUS
+            # unseen: the top of its habitat
+            fish_y = s.cy[c] if s.known[c] else (FISH_TYPE_0_MIN_Y, FISH_TYPE_1_MIN_Y, FISH_TYPE_2_MIN_Y)[s.creature_types[c]]
+            distance = math.hypot(s.cx[c] - s.x[i], fish_y - s.y[i]) if s.known[c] else fish_y - s.y[i]
+            best = min(best, math.ceil(max(0, distance - radius) / DRONE_MOVE_SPEED)
+                       + math.ceil(max(0, fish_y - radius - DRONE_SURFACE_Y_THRESHOLD) / DRONE_MOVE_SPEED))
+        return best
+
+    def early_saves(self, drones) -> int:
+        # the fish my drones carry that the foe can save before the first of them carrying it surfaces
+        s = self.state
+        early, done = 0, s.my_saved | s.foe_saved | self.foe_carried | ~self.alive
+        for c in range(len(s.points)):
+            turns = [math.ceil((s.y[i] - DRONE_SURFACE_Y_THRESHOLD) / DRONE_MOVE_SPEED) for i in drones if (s.scans[i] >> c) & 1]
+            if turns and not (done >> c) & 1 and self.foe_save_turns(c) < min(turns):
+                early |= 1 << c
+        return early
+
+    def outcome(self, mine: int, early: int = 0) -> Tuple[int, int]:
+        # (my score, the foe's best) when my drones save mine after the foe saves its scans and early
+        s = self.state
+        first = self.foe_carried | early
+        foe_saved = s.foe_saved | first
+        foe_score = s.foe_score + self.gain(s.foe_saved, s.my_saved, first)
+        my_score = s.my_score + self.gain(s.my_saved, foe_saved, mine)
+        return my_score, foe_score + self.gain(foe_saved, s.my_saved | mine, self.alive | self.foe_carried)
+
+    def wins(self, mine: int, early: int = 0) -> bool:
+        my_score, foe_best = self.outcome(mine, early)
+        return my_score > foe_best
+
+    def solve(self, budget: Optional[TurnBudget] = None):
+        s = self.state
+        my_carried = 0
+        for i in self.my_drones:
+            my_carried |= s.scans[i]
+        self.my_best = s.my_score + self.gain(s.my_saved, s.foe_saved, self.alive | my_carried)
+        self.foe_best = s.foe_score + self.gain(s.foe_saved, s.my_saved, self.alive | self.foe_carried)
+
+        # the fewest drones, the shallowest first
+        carrying = sorted((i for i in self.my_drones if s.scans[i] & ~s.my_saved), key=lambda i: s.y[i])
+        for k in range(1, len(carrying) + 1):
+            for drones in itertools.combinations(carrying, k):
+                mine = 0
+                for i in drones:
+                    mine |= s.scans[i]
+                if self.wins(mine, self.early_saves(drones)):
+                    self.surface = [s.drone_ids[i] for i in drones]
+                    return
+
+        # saving more only helps me: when saving all of it does not win, nothing does
+        left = self.alive & ~s.my_saved & ~my_carried
+        slots = [c for c in range(len(s.points)) if (left >> c) & 1]
+        if not slots or len(slots) > ENDGAME_MAX_FISH or not self.wins(my_carried | left):
+            return
+        for k in range(1, len(slots) + 1):
+            best = None
+            for subset in itertools.combinations(slots, k):
+                if budget and budget.is_expired():
+                    # out of time: all of them
+                    budget.cut("endgame")
+                    self.need = [s.creature_ids[c] for c in slots]
+                    return
+                my_score, foe_best = self.outcome(my_carried | sum(1 << c for c in subset))
+                if my_score > foe_best and (best is None or my_score - foe_best > best[0]):
+                    best = (my_score - foe_best, subset)
+            if best:
+                self.need = [s.creature_ids[c] for c in best[1]]
+                return
+
+
+def update_endgame(game: "GameEngine"):
+    endgame = Endgame(SimState.from_engine(game))
+    if game.endgame is None or game.endgame.key != endgame.key:
+        endgame.solve(game.budget)
+        game.endgame = endgame
+        if endgame.surface or endgame.need:
+            print_debug("endgame: surface %s need %s (best %d/%d)", endgame.surface, endgame.need,
+                        endgame.my_best, endgame.foe_best)
 
-    my_score = int(input())
-    foe_score = int(input())
 
-    # the fish scans that have been validated (giving us points)
-    my_scan_count = int(input())
-    for _ in range(my_scan_count):
-        fish_id = int(input())
-        my_scans.append(fish_id)
-
-    foe_scan_count = int(input())
-    for _ in range(foe_scan_count):
-        fish_id = int(input())
-        foe_scans.append(fish_id)
-
-    my_drone_count = int(input())
-    for _ in range(my_drone_count):
-        drone_id, drone_x, drone_y, dead, battery = map(int, input().split())
-        pos = Vector(drone_x, drone_y)
-        if loop == 0:
-            drone = Drone(drone_id, pos, dead == '1', battery, [])
-            drone_by_id[drone_id] = drone
-            my_drones.append(drone)
-        else:
-            drone_by_id[drone_id].pos = pos
-            drone_by_id[drone_id].dead = dead == '1'
-            drone_by_id[drone_id].battery = battery
-            drone_by_id[drone_id].scans = []
-        my_radar_blips[drone_id] = []
-
-    foe_drone_count = int(input())
-    for _ in range(foe_drone_count):
-        drone_id, drone_x, drone_y, dead, battery = map(int, input().split())
-        pos = Vector(drone_x, drone_y)
-        if loop == 0:
-            drone = Drone(drone_id, pos, dead == '1', battery, [])
-            drone_by_id[drone_id] = drone
-            foe_drones.append(drone)
-        else:
-            # update existing drone
-            drone_by_id[drone_id].pos = pos
-            drone_by_id[drone_id].dead = dead == '1'
-            drone_by_id[drone_id].battery = battery
-            drone_by_id[drone_id].scans = []
-
-    # the fishes the drone carried at some point, validated or not
-    drone_scan_count = int(input())
-    for _ in range(drone_scan_count):
-        drone_id, fish_id = map(int, input().split())
-        if fish_id not in drone_by_id[drone_id].scans:
-            drone_by_id[drone_id].scans.append(fish_id)
-
-    visible_fish_count = int(input())
-    for _ in range(visible_fish_count):
-        fish_id, fish_x, fish_y, fish_vx, fish_vy = map(int, input().split())
-        pos = Vector(fish_x, fish_y)
-        speed = Vector(fish_vx, fish_vy)
-        visible_fish.append(VisibleFish(fish_id, pos, speed, fish_details[fish_id]))
-
-    my_radar_blip_count = int(input())
-    for _ in range(my_radar_blip_count):
-        drone_id, fish_id, dir = input().split()
-        drone_id = int(drone_id)
-        fish_id = int(fish_id)
-        my_radar_blips[drone_id].append(RadarBlip(fish_id, dir))
-
-    # Retrieve the list of all scans done by all drones and scored ones
-    def update_scan_status(drones: list[Drone], my_scans: list[int]):
-        scan_list = []
-        for drone in drones:
-            for scan in drone.scans:
-                if scan not in scan_list:
-                    scan_list.append(scan)
-        for scan in my_scans:
-            if scan not in scan_list:
-                scan_list.append(scan)
-        return scan_list
-
-    print_debug(f'my_scan_count {my_scan_count} {my_scans}')
-    for drone in my_drones:
-        print_debug(f'{drone.name()} drone_scans {drone.scans} ')
-    # print_debug("my_radar_blips %s", my_radar_blips)
-    # call once
-    update_positions(my_drones, visible_fish)
-    scan_list = update_scan_status(my_drones, my_scans)
-
-    for drone in my_drones:
-        if loop == 0:
-            # drone.role = DroneRole.SINKER_MID1 if drone.drone_id in FAST_COMPATIBLE_POSITIONS \
-            #     else DroneRole.SINKER_MID2
-            # drone.role = DroneRole.SINKER_MID1 if drone.drone_id in FAST_COMPATIBLE_POSITIONS else DroneRole.SINKER_LOWe DroneRole.SINKER_LOW
-            drone.set_role(DroneRole.FEUILLE_MORTE)
+#===================================================================================================
+#                                          Extras
+# The planner roles (MCTS, TOUR, GREEDY), the experimental RHEA planner, their forward model
+# and serve() live in extras.py, run here in the namespace of this module when the file sits
+# next to it: each loaded copy of the bot gets its own. They are local-only: CodinGame takes a
+# single file under 100,000 characters, so main.py is submitted alone, pondering included,
+# and plays the default roles.
+#===================================================================================================
 
-        #===========================
-        #     Init each loop
-        #===========================
-        print_debug("Start %s", drone)
+EXTRAS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "extras.py")
+EXTRAS_LOADED = os.path.exists(EXTRAS_PATH)
+if EXTRAS_LOADED:
+    with open(EXTRAS_PATH) as extras_file:
+        exec(compile(extras_file.read(), EXTRAS_PATH, "exec"))
 
-        #===========================
-        #     Loop strategy
-        #===========================
-        strategies[drone.role](drone)
 
-        drone.is_light_enabled = drone.should_enable_light()
+#===================================================================================================
+#                                          stdin driver
+#===================================================================================================
 
-        drone.force_strategy_change(foes=foe_drones)
+def main():
+    if RECORD_INPUT_PATH:
+        record_file = open(RECORD_INPUT_PATH, "w", buffering=1)  # line buffered: survives a timeout kill
 
-        # Detect any monsters
-        # In case a monster is detected, evade it !
-        drone.evasion_orchestrator()
+        def recording_reader(*a):
+            line = input(*a)
+            record_file.write(line + "\n")
+            return line
 
+        read_line = recording_reader
+    else:
+        read_line = input
 
-        print_debug(drone.get_order_move())
-        print(drone.get_order_move(), drone.state.name[:2])
+    if PONDER_ENABLED:
+        # the worker holds the GIL for a whole switch interval: keep it short so the
+        # main thread gets back quickly once the turn input arrives
+        sys.setswitchinterval(0.001)
 
-    loop = loop + 1
+    game = GameEngine(read_init(read_line))
+    # game loop
+    while True:
+        turn = read_turn(read_line, on_arrival=game.ponder.stop)
+        for command in game.play_turn(turn):
+            print(command)
+        game.ponder_next_turn()
+
+
+if __name__ == "__main__":
+    if SERVE_ENABLED:
+        serve()
+    else:
+        main()
@@ -0,0 +1,139 @@
+# Profile the bot over a corpus of recorded games.
+#
+# Every recording of the directory is replayed (see replay.py) under cProfile. The
+# profiles are merged into one report of cumulative and per-call time for each function
+# of the bot, followed by the distribution of turn times and the slowest turns.
+#
+#   python profile_replays.py recordings/
+#   python profile_replays.py recordings/ --top 30 --save corpus.prof   # for snakeviz & co
+
+import argparse
+import ast
+import cProfile
+import glob
+import os
+import pstats
+import sys
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from replay import BOT_PATH, bot_sources, load_bot, load_recording, replay
+
+
+class SlowTurn(NamedTuple):
+    elapsed_ms: float
+    recording: str
+    turn: int
+    commands: List[str]
+
+
+class FunctionStats(NamedTuple):
+    name: str
+    calls: int
+    total_ms: float  # time in the function itself
+    cumulative_ms: float  # including callees
+
+
+def qualified_names(source_path: str) -> Dict[int, str]:
+    # pstats only knows `estimated_drone_save`, map the line back to `Score.estimated_drone_save`
+    with open(source_path) as f:
+        tree = ast.parse(f.read())
+    names = {}
+
+    def visit(node, prefix):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                name = prefix + child.name
+                # code objects of decorated functions start at the first decorator
+                names[child.decorator_list[0].lineno if child.decorator_list else child.lineno] = name
+                visit(child, name + ".")
+            else:
+                visit(child, prefix)
+
+    visit(tree, "")
+    return names
+
+
+def profile_corpus(paths: List[str], bot_path: str) -> Tuple[pstats.Stats, List[SlowTurn]]:
+    merged: Optional[pstats.Stats] = None
+    turns: List[SlowTurn] = []
+    for path in paths:
+        recording = load_recording(path)
+        profile = cProfile.Profile()
+        profile.enable()
+        results = replay(recording, bot_path)
+        profile.disable()
+        if merged is None:
+            merged = pstats.Stats(profile)
+        else:
+            merged.add(profile)
+        turns += [SlowTurn(r.elapsed_ms, path, r.turn, r.commands) for r in results]
+        print(f"profiled {path}: {len(results)} turns", file=sys.stderr)
+    if merged is None:
+        raise SystemExit("no recording to profile")
+    return merged, turns
+
+
+def bot_functions(stats: pstats.Stats, bot_path: str) -> List[FunctionStats]:
+    # the functions of the bot file and of its extras.py
+    names = {os.path.abspath(path): qualified_names(path) for path in bot_sources(bot_path)}
+    functions = []
+    for (filename, lineno, name), (_, calls, total, cumulative, _) in stats.stats.items():  # type:ignore
+        file_names = names.get(os.path.abspath(filename))
+        if file_names is None:
+            continue
+        functions.append(FunctionStats(file_names.get(lineno, name), calls, total * 1000, cumulative * 1000))
+    return functions
+
+
+def print_functions(title: str, functions: List[FunctionStats], top: int, out=sys.stdout):
+    print(f"\n{title}", file=out)
+    print(f"{'function':45s} {'calls':>9s} {'total ms':>10s} {'us/call':>9s} {'cumul ms':>10s} {'us/call':>9s}", file=out)
+    for f in functions[:top]:
+        print(f"{f.name:45.45s} {f.calls:9d} {f.total_ms:10.1f} {1000 * f.total_ms / f.calls:9.1f}"
+              f" {f.cumulative_ms:10.1f} {1000 * f.cumulative_ms / f.calls:9.1f}", file=out)
+
+
+def print_turns(turns: List[SlowTurn], slowest: int, limit_ms: float, out=sys.stdout):
+    # the first turn pays for imports and has a 1s budget, keep it out of the distribution
+    later = sorted((t for t in turns if t.turn > 0), reverse=True)
+    if not later:
+        return
+    times = sorted(t.elapsed_ms for t in later)
+
+    def percentile(p):
+        return times[min(len(times) - 1, int(len(times) * p))]
+
+    over = len([t for t in times if t > limit_ms])
+    print(f"\n{len(times)} turns: p50 {percentile(0.5):.2f}ms p90 {percentile(0.9):.2f}ms"
+          f" p99 {percentile(0.99):.2f}ms max {times[-1]:.2f}ms, {over} over {limit_ms}ms", file=out)
+    print("\nslowest turns", file=out)
+    for t in later[:slowest]:
+        flag = "  !!! over budget" if t.elapsed_ms > limit_ms else ""
+        print(f"{t.elapsed_ms:8.2f}ms  {os.path.basename(t.recording)} #{t.turn + 1}  {' | '.join(t.commands)}{flag}", file=out)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Profile the bot over a directory of recorded games")
+    parser.add_argument("directory")
+    parser.add_argument("--pattern", default="*.txt", help="recording file names in the directory")
+    parser.add_argument("--bot", default=BOT_PATH)
+    parser.add_argument("--top", type=int, default=20, help="functions listed per table")
+    parser.add_argument("--slowest", type=int, default=10, help="slowest turns listed")
+    parser.add_argument("--save", help="also dump the merged profile, readable by pstats/snakeviz")
+    args = parser.parse_args(argv)
+
+    paths = sorted(glob.glob(os.path.join(args.directory, args.pattern)))
+    stats, turns = profile_corpus(paths, args.bot)
+    if args.save:
+        stats.dump_stats(args.save)
+
+    functions = bot_functions(stats, args.bot)
+    print(f"{len(paths)} games, {len(turns)} turns")
+    print_functions("by cumulative time", sorted(functions, key=lambda f: -f.cumulative_ms), args.top)
+    print_functions("by own time", sorted(functions, key=lambda f: -f.total_ms), args.top)
+    # the bot's own turn limit
+    print_turns(turns, args.slowest, load_bot(args.bot).TIME_PER_TURN_MS)
+
+
+if __name__ == "__main__":
+    main()
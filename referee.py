@@ -0,0 +1,684 @@
+# Headless local referee for the game (see regles1-bronze.txt and regles2-silver.pdf).
+#
+# Deterministic for a given seed: randomness is only used to lay out the map, then every turn
+# is a pure function of the state and of the commands. Bots are driven in-process through
+# their GameEngine (see main.py), or through the text protocol (format_init/format_turn).
+#
+#   python referee.py --games 100                      # main.py against itself
+#   python referee.py --bot0 main.py --bot1 old.py --seed 42 --games 20 --record games/
+#
+# The bots are the bottleneck: the referee alone plays about 5,000 turns/s (bots that only
+# WAIT), two main.py bots about 200 turns/s in-process (about 500 before the per-turn planning
+# of the light schedule and the move evaluation). The summary line of a run gives its rate and
+# the share of the time spent in the bots.
+#
+# Turn order, as in the contest referee:
+#   1. lights and battery (drain 5 with the powerful light, else recharge 1)
+#   2. drone moves (600u towards the target, sink 300u on WAIT, rise 300u in emergency)
+#   3. swept collisions between each drone move and each monster move: emergency, scans lost
+#   4. drones, fish and monsters move with the speeds announced last turn
+#   5. scans within 800u (2000u with the light), saves at y <= 500 with first-to-save bonuses
+#   6. next speeds: fish flee drones within 1400u at 400u, else avoid the nearest fish within
+#      600u, else keep swimming at 200u, rebounding on their habitat; monsters chase the closest
+#      drone whose light (+300u) reaches them at 540u, else slow down to 270u
+#   7. end after 200 turns, when a player cannot catch up any more, or when both players have
+#      saved every fish left; unsaved scans are saved at the end
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+MAP_SIZE = 10000
+MAX_TURNS = 200
+TIME_FIRST_TURN_MS = 1000
+TIME_PER_TURN_MS = 100
+
+DRONE_MOVE_SPEED = 600
+DRONE_SINK_SPEED = 300
+DRONE_EMERGENCY_SPEED = 300
+DRONE_LIGHT_RADIUS = 800
+DRONE_LIGHT_RADIUS_POWERFUL = 2000
+DRONE_SURFACE_Y_THRESHOLD = 500
+DRONE_START_Y = 500
+BATTERY_CAPACITY = 30
+BATTERY_DRAIN_POWERFUL_LIGHT = 5
+BATTERY_RECHARGE_RATE = 1
+
+FISH_MOVE_DISTANCE = 200
+FISH_FRIGHTENED_MOVE_DISTANCE = 400
+FISH_FRIGHTENED_DISTANCE_THRESHOLD = 1400
+FISH_AVOID_DISTANCE = 600
+FISH_HABITATS = {0: (2500, 5000), 1: (5000, 7500), 2: (7500, 10000)}
+
+MONSTER_AGGRESSIVE_SPEED = 540
+MONSTER_NON_AGGRESSIVE_SPEED = 270
+MONSTER_DETECTION_EXTRA = 300  # monsters see a drone's light from this much further
+MONSTER_INTERACTION_RADIUS = 500
+MONSTER_HABITAT = (2500, 10000)
+MONSTER_SPAWN_MIN_Y = 5000
+
+COLOR_COUNT = 4
+TYPE_COUNT = 3
+TYPE_POINTS = (1, 2, 3)
+BONUS_POINTS_SAME_COLOR = 3
+BONUS_POINTS_SAME_TYPE = 4
+FIRST_TO_SAVE_MULTIPLIER = 2
+
+FIRST_CREATURE_ID = 4  # drones are 0..3
+DRONE_START_X = ((2000, 6666), (3333, 8000))
+
+
+def rnd(v: float) -> int:
+    # half-up rounding, like Java's Math.round in the contest referee
+    return math.floor(v + 0.5)
+
+
+# Distances are compared squared, on integer coordinates, and ties go to the first in id
+# order: the results are exact and batch_env.py reproduces them bit for bit with numpy.
+def dist2(x1: int, y1: int, x2: int, y2: int) -> int:
+    return (x1 - x2) * (x1 - x2) + (y1 - y2) * (y1 - y2)
+
+
+def normalize(x: float, y: float, length: float) -> Tuple[float, float]:
+    norm = math.sqrt(x * x + y * y)
+    if norm == 0:
+        return 0.0, 0.0
+    return x * length / norm, y * length / norm
+
+
+class Creature:
+    fish_id: int
+    color: int  # -1 for monsters
+    type: int  # -1 for monsters
+    x: int
+    y: int
+    vx: int
+    vy: int
+    alive: bool  # fish can flee out of the map
+    frightened: bool
+    min_y: int
+    max_y: int
+
+    def __init__(self, fish_id, color, type, x, y, vx=0, vy=0):
+        self.fish_id = fish_id
+        self.color = color
+        self.type = type
+        self.x, self.y = x, y
+        self.vx, self.vy = vx, vy
+        self.alive = True
+        self.frightened = False
+        self.min_y, self.max_y = MONSTER_HABITAT if type == -1 else FISH_HABITATS[type]
+
+    @property
+    def is_monster(self):
+        return self.type == -1
+
+    def __str__(self):
+        return f"{'M' if self.is_monster else 'F'}{self.fish_id}({self.x},{self.y} v={self.vx},{self.vy})"
+
+    __repr__ = __str__
+
+
+class RefDrone:
+    drone_id: int
+    owner: int
+    x: int
+    y: int
+    battery: int
+    light: bool
+    emergency: bool
+    scans: List[int]  # unsaved, in scan order
+
+    def __init__(self, drone_id, owner, x, y):
+        self.drone_id = drone_id
+        self.owner = owner
+        self.x, self.y = x, y
+        self.battery = BATTERY_CAPACITY
+        self.light = False
+        self.emergency = False
+        self.scans = []
+
+    def light_radius(self):
+        return DRONE_LIGHT_RADIUS_POWERFUL if self.light else DRONE_LIGHT_RADIUS
+
+    def __str__(self):
+        return f"D{self.drone_id}({self.x},{self.y} b={self.battery}{' E' if self.emergency else ''} scans={self.scans})"
+
+    __repr__ = __str__
+
+
+class Command(NamedTuple):
+    target: Optional[Tuple[int, int]]  # None for WAIT
+    light: bool
+
+
+class InvalidCommand(Exception):
+    pass
+
+
+def parse_command(line: str) -> Command:
+    parts = line.split()
+    try:
+        if parts[0] == "MOVE":
+            return Command((int(parts[1]), int(parts[2])), parts[3] == "1")
+        if parts[0] == "WAIT":
+            return Command(None, parts[1] == "1")
+    except (IndexError, ValueError):
+        pass
+    raise InvalidCommand(line)
+
+
+class PlayerView(NamedTuple):
+    # what one player receives for a turn, in protocol order
+    my_score: int
+    foe_score: int
+    my_scans: List[int]
+    foe_scans: List[int]
+    my_drones: List[Tuple[int, int, int, int, int]]  # id, x, y, emergency, battery
+    foe_drones: List[Tuple[int, int, int, int, int]]
+    drone_scans: List[Tuple[int, int]]
+    visible: List[Tuple[int, int, int, int, int]]  # id, x, y, vx, vy
+    radar: List[Tuple[int, int, str]]  # drone id, creature id, TL/TR/BL/BR
+
+
+class GameResult(NamedTuple):
+    seed: int
+    scores: Tuple[int, int]
+    turns: int
+    winner: Optional[int]  # None on a draw
+    error: Optional[str]  # a bot crashed or sent an invalid command
+
+
+#===========================================================================
+#                            Scoring
+#===========================================================================
+
+class Scoring:
+    # First-to-save: the player saving a fish or completing a combo before the other
+    # gets double points; saving it on the same turn doubles for both.
+    def __init__(self, creatures: List[Creature]):
+        fish = [c for c in creatures if not c.is_monster]
+        self.fish_by_id = {c.fish_id: c for c in fish}
+        self.colors = {color: {c.fish_id for c in fish if c.color == color} for color in range(COLOR_COUNT)}
+        self.types = {t: {c.fish_id for c in fish if c.type == t} for t in range(TYPE_COUNT)}
+        self.saved: Tuple[Set[int], Set[int]] = (set(), set())
+        self.combos: Tuple[Set[tuple], Set[tuple]] = (set(), set())
+        self.scores = [0, 0]
+
+    def save(self, new_scans: Tuple[Set[int], Set[int]]):
+        # both players' saves of one turn, applied at once
+        new_scans = tuple(s - saved for s, saved in zip(new_scans, self.saved))  # type:ignore
+        for player in (0, 1):
+            other = 1 - player
+            for fish_id in new_scans[player]:
+                points = TYPE_POINTS[self.fish_by_id[fish_id].type]
+                if fish_id not in self.saved[other]:
+                    points *= FIRST_TO_SAVE_MULTIPLIER
+                self.scores[player] += points
+        for player in (0, 1):
+            self.saved[player].update(new_scans[player])
+        new_combos = (self.completed_combos(0) - self.combos[0], self.completed_combos(1) - self.combos[1])
+        for player in (0, 1):
+            for combo in new_combos[player]:
+                points = BONUS_POINTS_SAME_COLOR if combo[0] == "color" else BONUS_POINTS_SAME_TYPE
+                if combo not in self.combos[1 - player]:
+                    points *= FIRST_TO_SAVE_MULTIPLIER
+                self.scores[player] += points
+        for player in (0, 1):
+            self.combos[player].update(new_combos[player])
+
+    def completed_combos(self, player) -> Set[tuple]:
+        saved = self.saved[player]
+        combos = {("color", color) for color, ids in self.colors.items() if ids and ids <= saved}
+        combos |= {("type", t) for t, ids in self.types.items() if ids and ids <= saved}
+        return combos
+
+    def max_score(self, player, obtainable: Set[int]) -> int:
+        # best case for `player` if it saved every fish still obtainable, first everywhere it can be
+        other = 1 - player
+        score = self.scores[player]
+        saved = self.saved[player] | obtainable
+        for fish_id in obtainable - self.saved[player]:
+            points = TYPE_POINTS[self.fish_by_id[fish_id].type]
+            score += points * (FIRST_TO_SAVE_MULTIPLIER if fish_id not in self.saved[other] else 1)
+        for kind, groups, bonus in (("color", self.colors, BONUS_POINTS_SAME_COLOR), ("type", self.types, BONUS_POINTS_SAME_TYPE)):
+            for key, ids in groups.items():
+                combo = (kind, key)
+                if combo in self.combos[player] or not ids <= saved:
+                    continue
+                score += bonus * (FIRST_TO_SAVE_MULTIPLIER if combo not in self.combos[other] else 1)
+        return score
+
+
+#===========================================================================
+#                            Game
+#===========================================================================
+
+class Game:
+    seed: int
+    turn: int
+    creatures: List[Creature]
+    drones: List[RefDrone]
+    scoring: Scoring
+    over: bool
+
+    def __init__(self, seed: int, monster_pairs: Optional[int] = None):
+        self.seed = seed
+        rng = random.Random(seed)
+        self.turn = 0
+        self.over = False
+        self.creatures = []
+
+        # fish are laid out in mirrored pairs around x=5000, for fairness
+        fish_id = FIRST_CREATURE_ID
+        for fish_type in range(TYPE_COUNT):
+            min_y, max_y = FISH_HABITATS[fish_type]
+            for color in range(0, COLOR_COUNT, 2):
+                x = rng.randint(1000, 4000)
+                y = rng.randint(min_y + 500, max_y - 500)
+                vx, vy = normalize(rng.uniform(-1, 1), rng.uniform(-1, 1), FISH_MOVE_DISTANCE)
+                self.creatures.append(Creature(fish_id, color, fish_type, x, y, rnd(vx), rnd(vy)))
+                self.creatures.append(Creature(fish_id + 1, color + 1, fish_type, MAP_SIZE - 1 - x, y, -rnd(vx), rnd(vy)))
+                fish_id += 2
+        if monster_pairs is None:
+            monster_pairs = rng.randint(1, 3)
+        for _ in range(monster_pairs):
+            x = rng.randint(500, 4500)
+            y = rng.randint(MONSTER_SPAWN_MIN_Y, MONSTER_HABITAT[1] - 500)
+            self.creatures.append(Creature(fish_id, -1, -1, x, y))
+            self.creatures.append(Creature(fish_id + 1, -1, -1, MAP_SIZE - 1 - x, y))
+            fish_id += 2
+
+        layout = rng.randint(0, 1)
+        self.drones = []
+        for player in (0, 1):
+            xs = DRONE_START_X[layout ^ player]
+            for i, x in enumerate(xs):
+                self.drones.append(RefDrone(2 * i + player, player, x, DRONE_START_Y))
+        self.drones.sort(key=lambda d: d.drone_id)
+        self.scoring = Scoring(self.creatures)
+
+    @property
+    def fish(self) -> List[Creature]:
+        return [c for c in self.creatures if not c.is_monster]
+
+    @property
+    def monsters(self) -> List[Creature]:
+        return [c for c in self.creatures if c.is_monster]
+
+    @property
+    def scores(self) -> Tuple[int, int]:
+        return self.scoring.scores[0], self.scoring.scores[1]
+
+    def player_drones(self, player) -> List[RefDrone]:
+        return [d for d in self.drones if d.owner == player]
+
+    #---------------------------
+    #     Players' view
+    #---------------------------
+    def init_view(self) -> List[Tuple[int, int, int]]:
+        return [(c.fish_id, c.color, c.type) for c in self.creatures]
+
+    def view(self, player) -> PlayerView:
+        other = 1 - player
+
+        def drone_line(d):
+            return d.drone_id, d.x, d.y, 1 if d.emergency else 0, d.battery
+
+        mine = self.player_drones(player)
+        visible = []
+        for c in self.creatures:
+            if c.alive and any(dist2(c.x, c.y, d.x, d.y) <= d.light_radius() ** 2 for d in mine if not d.emergency):
+                visible.append((c.fish_id, c.x, c.y, c.vx, c.vy))
+        radar = []
+        for d in mine:
+            for c in self.creatures:
+                if c.alive:
+                    direction = ("T" if c.y <= d.y else "B") + ("L" if c.x <= d.x else "R")
+                    radar.append((d.drone_id, c.fish_id, direction))
+        return PlayerView(
+            self.scoring.scores[player], self.scoring.scores[other],
+            sorted(self.scoring.saved[player]), sorted(self.scoring.saved[other]),
+            [drone_line(d) for d in mine], [drone_line(d) for d in self.player_drones(other)],
+            [(d.drone_id, fish_id) for d in self.drones for fish_id in d.scans],
+            visible, radar)
+
+    #---------------------------
+    #     Turn
+    #---------------------------
+    def step(self, commands: Dict[int, Command]):
+        # commands by drone id
+        assert not self.over
+        moves = {}
+        for d in self.drones:
+            command = commands[d.drone_id]
+            if d.emergency:
+                d.light = False
+            else:
+                d.light = command.light and d.battery >= BATTERY_DRAIN_POWERFUL_LIGHT
+            if d.light:
+                d.battery -= BATTERY_DRAIN_POWERFUL_LIGHT
+            else:
+                d.battery = min(BATTERY_CAPACITY, d.battery + BATTERY_RECHARGE_RATE)
+
+            if d.emergency:
+                vx, vy = 0.0, -DRONE_EMERGENCY_SPEED
+            elif command.target is None:
+                vx, vy = 0.0, DRONE_SINK_SPEED
+            else:
+                tx, ty = command.target
+                vx, vy = tx - d.x, ty - d.y
+                if vx * vx + vy * vy > DRONE_MOVE_SPEED * DRONE_MOVE_SPEED:
+                    vx, vy = normalize(vx, vy, DRONE_MOVE_SPEED)
+            moves[d.drone_id] = (vx, vy)
+
+        # collisions happen during the moves, check them before moving anything
+        for d in self.drones:
+            if d.emergency:
+                continue
+            vx, vy = moves[d.drone_id]
+            for m in self.monsters:
+                if swept_collision(d.x, d.y, vx, vy, m.x, m.y, m.vx, m.vy, MONSTER_INTERACTION_RADIUS):
+                    d.emergency = True
+                    d.light = False
+                    d.scans = []
+                    break
+
+        for d in self.drones:
+            vx, vy = moves[d.drone_id]
+            d.x = min(MAP_SIZE - 1, max(0, rnd(d.x + vx)))
+            d.y = min(MAP_SIZE - 1, max(0, rnd(d.y + vy)))
+        for c in self.creatures:
+            if not c.alive:
+                continue
+            c.x += c.vx
+            c.y = min(c.max_y - 1, max(c.min_y, c.y + c.vy))
+            if c.x < 0 or c.x > MAP_SIZE - 1:
+                if c.is_monster:
+                    c.x = min(MAP_SIZE - 1, max(0, c.x))
+                else:
+                    c.alive = False  # fled out of the map
+
+        self.scan_and_save()
+        self.update_speeds()
+        self.turn += 1
+        self.check_end()
+
+    def scan_and_save(self):
+        for d in self.drones:
+            if d.emergency:
+                continue
+            saved = self.scoring.saved[d.owner]
+            radius = d.light_radius()
+            for c in self.creatures:
+                if c.alive and not c.is_monster and c.fish_id not in saved and c.fish_id not in d.scans \
+                        and dist2(c.x, c.y, d.x, d.y) <= radius * radius:
+                    d.scans.append(c.fish_id)
+        new_saves: Tuple[Set[int], Set[int]] = (set(), set())
+        for d in self.drones:
+            if d.y <= DRONE_SURFACE_Y_THRESHOLD:
+                if d.emergency:
+                    d.emergency = False  # repaired at the surface
+                    continue
+                new_saves[d.owner].update(d.scans)
+                d.scans = []
+        if new_saves[0] or new_saves[1]:
+            self.scoring.save(new_saves)
+            # a fish saved by a player is no use in the other drone of that player any more
+            for d in self.drones:
+                d.scans = [f for f in d.scans if f not in self.scoring.saved[d.owner]]
+
+    def update_speeds(self):
+        active_drones = [d for d in self.drones if not d.emergency]
+        fish = [c for c in self.creatures if c.alive and not c.is_monster]
+        for c in fish:
+            closest_drone, closest_dist = None, FISH_FRIGHTENED_DISTANCE_THRESHOLD ** 2 + 1
+            for d in active_drones:
+                distance = dist2(c.x, c.y, d.x, d.y)
+                if distance < closest_dist:
+                    closest_drone, closest_dist = d, distance
+            c.frightened = closest_drone is not None
+            if closest_drone is not None:
+                vx, vy = normalize(c.x - closest_drone.x, c.y - closest_drone.y, FISH_FRIGHTENED_MOVE_DISTANCE)
+            else:
+                closest_fish, closest_dist = None, FISH_AVOID_DISTANCE ** 2 + 1
+                for other in fish:
+                    if other is c:
+                        continue
+                    distance = dist2(c.x, c.y, other.x, other.y)
+                    if distance < closest_dist:
+                        closest_fish, closest_dist = other, distance
+                if closest_fish is not None:
+                    vx, vy = normalize(c.x - closest_fish.x, c.y - closest_fish.y, FISH_MOVE_DISTANCE)
+                else:
+                    vx, vy = normalize(c.vx, c.vy, FISH_MOVE_DISTANCE)
+            c.vx, c.vy = rnd(vx), rnd(vy)
+            self.rebound(c, escape_x=c.frightened)
+
+        monsters = self.monsters
+        for m in monsters:
+            target, target_dist = None, None
+            for d in active_drones:
+                distance = dist2(m.x, m.y, d.x, d.y)
+                if distance <= (d.light_radius() + MONSTER_DETECTION_EXTRA) ** 2 and (target_dist is None or distance < target_dist):
+                    target, target_dist = d, distance
+            if target is not None:
+                vx, vy = normalize(target.x - m.x, target.y - m.y, MONSTER_AGGRESSIVE_SPEED)
+            else:
+                closest, closest_dist = None, FISH_AVOID_DISTANCE ** 2 + 1
+                for other in monsters:
+                    if other is m:
+                        continue
+                    distance = dist2(m.x, m.y, other.x, other.y)
+                    if distance < closest_dist:
+                        closest, closest_dist = other, distance
+                if closest is not None:
+                    vx, vy = normalize(m.x - closest.x, m.y - closest.y, MONSTER_NON_AGGRESSIVE_SPEED)
+                else:
+                    # lost its prey: keep going, slower
+                    vx, vy = normalize(m.vx, m.vy, MONSTER_NON_AGGRESSIVE_SPEED)
+            m.vx, m.vy = rnd(vx), rnd(vy)
+            self.rebound(m, escape_x=False)
+
+    @staticmethod
+    def rebound(c: Creature, escape_x: bool):
+        # bounce off the habitat (and the sides of the map, unless fleeing)
+        if not c.min_y <= c.y + c.vy <= c.max_y - 1:
+            c.vy = -c.vy
+        if not escape_x and not 0 <= c.x + c.vx <= MAP_SIZE - 1:
+            c.vx = -c.vx
+
+    def obtainable(self, player) -> Set[int]:
+        # fish `player` could still save: alive, or already in one of its drones
+        fish = {c.fish_id for c in self.creatures if c.alive and not c.is_monster}
+        for d in self.player_drones(player):
+            fish.update(d.scans)
+        return fish
+
+    def check_end(self):
+        s0, s1 = self.scoring.scores
+        max0 = self.scoring.max_score(0, self.obtainable(0))
+        max1 = self.scoring.max_score(1, self.obtainable(1))
+        if self.turn >= MAX_TURNS or s0 > max1 or s1 > max0 or (max0 == s0 and max1 == s1):
+            self.finish()
+
+    def finish(self):
+        # unsaved scans are saved at the end of the game
+        new_saves: Tuple[Set[int], Set[int]] = (set(), set())
+        for d in self.drones:
+            new_saves[d.owner].update(d.scans)
+            d.scans = []
+        self.scoring.save(new_saves)
+        self.over = True
+
+    def winner(self) -> Optional[int]:
+        s0, s1 = self.scoring.scores
+        return None if s0 == s1 else (0 if s0 > s1 else 1)
+
+
+def swept_collision(x, y, vx, vy, mx, my, mvx, mvy, radius) -> bool:
+    # closest approach of two points moving in straight lines during one turn
+    px, py = x - mx, y - my
+    rvx, rvy = vx - mvx, vy - mvy
+    speed2 = rvx * rvx + rvy * rvy
+    t = 0.0 if speed2 == 0 else max(0.0, min(1.0, -(px * rvx + py * rvy) / speed2))
+    dx, dy = px + rvx * t, py + rvy * t
+    return dx * dx + dy * dy <= radius * radius
+
+
+#===========================================================================
+#                            Protocol
+#===========================================================================
+
+def format_init(init: List[Tuple[int, int, int]]) -> List[str]:
+    return [str(len(init))] + [f"{fish_id} {color} {type}" for fish_id, color, type in init]
+
+
+def format_turn(view: PlayerView) -> List[str]:
+    lines = [str(view.my_score), str(view.foe_score)]
+    for ids in (view.my_scans, view.foe_scans):
+        lines.append(str(len(ids)))
+        lines += [str(i) for i in ids]
+    for drones in (view.my_drones, view.foe_drones):
+        lines.append(str(len(drones)))
+        lines += [" ".join(map(str, d)) for d in drones]
+    lines.append(str(len(view.drone_scans)))
+    lines += [f"{d} {f}" for d, f in view.drone_scans]
+    lines.append(str(len(view.visible)))
+    lines += [" ".join(map(str, c)) for c in view.visible]
+    lines.append(str(len(view.radar)))
+    lines += [f"{d} {c} {direction}" for d, c, direction in view.radar]
+    return lines
+
+
+#===========================================================================
+#                            In-process bots
+#===========================================================================
+
+class EngineBot:
+    # Plays through the GameEngine of a bot module, without any text protocol
+    def __init__(self, bot: Any, telemetry=None, label: str = ""):
+        # telemetry: a telemetry.TelemetryWriter, gets a row per drone and turn
+        self.bot = bot
+        self.game = None
+        self.telemetry = telemetry
+        self.label = label
+        self.game_index = 0
+        self.elapsed = 0.0  # seconds in the bot
+
+    def init(self, init: List[Tuple[int, int, int]]):
+        bot = self.bot
+        self.game = bot.GameEngine({fish_id: bot.FishDetail(color, type) for fish_id, color, type in init})
+        if self.telemetry:
+            self.game_index = self.telemetry.add_game(self.label)
+
+    def turn_input(self, view: PlayerView):
+        bot = self.bot
+        Vector = bot.Vector
+
+        def drones(lines):
+            return [bot.DroneStatus(i, Vector(x, y), emergency == 1, battery) for i, x, y, emergency, battery in lines]
+
+        return bot.TurnInput(
+            view.my_score, view.foe_score, list(view.my_scans), list(view.foe_scans),
+            drones(view.my_drones), drones(view.foe_drones), list(view.drone_scans),
+            [bot.VisibleCreature(i, Vector(x, y), Vector(vx, vy)) for i, x, y, vx, vy in view.visible],
+            [(d, bot.RadarBlip(c, direction)) for d, c, direction in view.radar],
+            time.perf_counter())
+
+    def play(self, view: PlayerView) -> List[str]:
+        turn = self.turn_input(view)
+        commands = self.game.play_turn(turn)  # type:ignore
+        self.elapsed += time.perf_counter() - turn.received_at
+        if self.telemetry:
+            self.telemetry.record_turn(self.game_index, self.game, (time.perf_counter() - turn.received_at) * 1000)
+        return commands
+
+
+def play_game(seed: int, bots: List[Any], record_dir: Optional[str] = None,
+              monster_pairs: Optional[int] = None) -> GameResult:
+    # bots: one object per player with init(init) and play(view) -> commands
+    game = Game(seed, monster_pairs)
+    init = game.init_view()
+    records: List[List[str]] = [format_init(init), format_init(init)]
+    error = None
+    loser = None
+    for bot in bots:
+        bot.init(init)
+    while not game.over:
+        commands: Dict[int, Command] = {}
+        for player, bot in enumerate(bots):
+            view = game.view(player)
+            if record_dir:
+                records[player] += format_turn(view)
+            drones = game.player_drones(player)
+            try:
+                lines = bot.play(view)
+                if len(lines) != len(drones):
+                    raise InvalidCommand(f"{len(lines)} commands for {len(drones)} drones")
+                for d, line in zip(drones, lines):
+                    commands[d.drone_id] = parse_command(line)
+            except Exception as e:
+                error = f"player {player} turn {game.turn}: {type(e).__name__}: {e}"
+                loser = player
+                break
+        if loser is not None:
+            break
+        game.step(commands)
+    if record_dir:
+        for player in (0, 1):
+            with open(os.path.join(record_dir, f"seed{seed}-p{player}.txt"), "w") as f:
+                f.write("\n".join(records[player]) + "\n")
+    winner = game.winner() if loser is None else 1 - loser
+    return GameResult(seed, game.scores, game.turn, winner, error)
+
+
+def main(argv: Optional[List[str]] = None):
+    from replay import BOT_PATH, load_bot
+
+    parser = argparse.ArgumentParser(description="Play local games between two bots, in-process")
+    parser.add_argument("--bot0", default=BOT_PATH)
+    parser.add_argument("--bot1", default=BOT_PATH)
+    parser.add_argument("--seed", type=int, default=0, help="first seed")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--monster-pairs", type=int)
+    parser.add_argument("--record", help="write each player's input to this directory, for replay.py")
+    parser.add_argument("--telemetry", metavar="DIR", help="append per-drone turn records to this directory")
+    args = parser.parse_args(argv)
+
+    modules = [load_bot(args.bot0), load_bot(args.bot1)]
+    for module in modules:
+        module.DEBUG_ENABLED = False
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+    writer = None
+    if args.telemetry:
+        from telemetry import TelemetryWriter
+        writer = TelemetryWriter(args.telemetry)
+    wins = [0, 0]
+    turns = 0
+    in_bots = 0.0
+    start = time.perf_counter()
+    for seed in range(args.seed, args.seed + args.games):
+        bots = [EngineBot(m, writer, f"seed{seed}-p{player}") for player, m in enumerate(modules)]
+        result = play_game(seed, bots, args.record, args.monster_pairs)
+        turns += result.turns
+        in_bots += sum(bot.elapsed for bot in bots)
+        if result.winner is not None:
+            wins[result.winner] += 1
+        print(f"seed {seed}: {result.scores[0]}-{result.scores[1]} in {result.turns} turns"
+              f"{'' if result.winner is None else f', player {result.winner} wins'}"
+              f"{f' ({result.error})' if result.error else ''}")
+    elapsed = time.perf_counter() - start
+    if writer:
+        writer.close()
+    print(f"{args.games} games, wins {wins[0]}-{wins[1]}, {turns / elapsed:.0f} turns/s,"
+          f" {in_bots / elapsed:.0%} of the time in the bots", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
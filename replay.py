@@ -0,0 +1,174 @@
+# Offline replay of a recorded game.
+#
+# Record a game by running the bot with UTG_RECORD_INPUT=<file> (see main.py), then feed
+# the recording back into the bot's GameEngine, in-process and turn by turn:
+#
+#   python replay.py game.txt                      # commands and timing of each turn
+#   python replay.py game.txt --dump expected.json
+#   python replay.py game.txt --check expected.json  # exits 1 if any command changed
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+from types import ModuleType
+from typing import List, NamedTuple, Optional
+
+
+class Recording(NamedTuple):
+    init: List[str]
+    turns: List[List[str]]
+
+
+class TurnResult(NamedTuple):
+    turn: int
+    commands: List[str]
+    elapsed_ms: float
+
+
+#===========================================================================
+#                            Recording format
+#===========================================================================
+# A recording is the raw stdin of the bot, one protocol line per line.
+# Turns are found back by following the counts of the game protocol.
+
+def split_turns(lines: List[str]) -> Recording:
+    pos = 0
+
+    def take(n):
+        nonlocal pos
+        chunk = lines[pos:pos + n]
+        if len(chunk) < n:
+            raise ValueError(f"truncated recording at line {pos + 1}")
+        pos += n
+        return chunk
+
+    def take_counted():
+        count_line = take(1)
+        return count_line + take(int(count_line[0]))
+
+    init = take_counted()
+    turns = []
+    while pos < len(lines):
+        turn = take(2)  # my_score, foe_score
+        for _ in range(7):  # my scans, foe scans, my drones, foe drones, drone scans, visible, radar
+            turn += take_counted()
+        turns.append(turn)
+    return Recording(init, turns)
+
+
+def load_recording(path: str) -> Recording:
+    with open(path) as f:
+        return split_turns(f.read().splitlines())
+
+
+#===========================================================================
+#                            In-process replay
+#===========================================================================
+
+BOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+
+def bot_sources(bot_path: str = BOT_PATH) -> List[str]:
+    # the bot file, and the extras.py it runs when there is one next to it (see main.py)
+    extras_path = os.path.join(os.path.dirname(os.path.abspath(bot_path)), "extras.py")
+    return [bot_path, extras_path] if os.path.exists(extras_path) else [bot_path]
+
+
+def load_bot(bot_path: str = BOT_PATH, instance: str = "") -> ModuleType:
+    # import a bot file as a module, so several versions can live in the same process;
+    # another `instance` of the same file gets its own globals (e.g. tuned constants)
+    bot_path = os.path.abspath(bot_path)
+    name = "utg_bot_" + hashlib.sha1(bot_path.encode()).hexdigest()[:12] + instance
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, bot_path)
+        module = importlib.util.module_from_spec(spec)  # type:ignore
+        sys.modules[name] = module
+        spec.loader.exec_module(module)  # type:ignore
+    return sys.modules[name]
+
+
+def replay(recording: Recording, bot_path: str = BOT_PATH, ponder_ms: float = 0,
+           debug: bool = False, telemetry=None, label: str = "") -> List[TurnResult]:
+    # telemetry: a telemetry.TelemetryWriter, gets a row per drone and turn
+    bot = load_bot(bot_path)
+    bot.DEBUG_ENABLED = debug
+    game = bot.GameEngine(bot.read_init(iter(recording.init).__next__))
+    game_index = telemetry.add_game(label) if telemetry else 0
+    results: List[TurnResult] = []
+    for turn, lines in enumerate(recording.turns):
+        turn_input = bot.read_turn(iter(lines).__next__, on_arrival=game.ponder.stop)
+        commands = game.play_turn(turn_input)
+        results.append(TurnResult(turn, commands, (time.perf_counter() - turn_input.received_at) * 1000))
+        if telemetry:
+            telemetry.record_turn(game_index, game, results[-1].elapsed_ms)
+        if ponder_ms:
+            # pretend the referee and the opponent take that long, and let the bot ponder meanwhile
+            game.ponder_next_turn()
+            time.sleep(ponder_ms / 1000)
+    game.ponder.stop()
+    return results
+
+
+def print_report(results: List[TurnResult], out=sys.stdout):
+    for r in results:
+        print(f"#{r.turn + 1:3d} {r.elapsed_ms:7.2f}ms  {' | '.join(r.commands)}", file=out)
+    times = [r.elapsed_ms for r in results[1:]] or [r.elapsed_ms for r in results]
+    if times:
+        times_sorted = sorted(times)
+        print(f"{len(results)} turns, first {results[0].elapsed_ms:.2f}ms, then"
+              f" mean {statistics.mean(times):.2f}ms"
+              f" p50 {times_sorted[len(times) // 2]:.2f}ms"
+              f" p95 {times_sorted[min(len(times) - 1, int(len(times) * 0.95))]:.2f}ms"
+              f" max {times_sorted[-1]:.2f}ms", file=out)
+
+
+def check_commands(results: List[TurnResult], expected: List[List[str]]) -> List[str]:
+    errors = []
+    if len(expected) != len(results):
+        errors.append(f"expected {len(expected)} turns, replayed {len(results)}")
+    for r, commands in zip(results, expected):
+        if r.commands != commands:
+            errors.append(f"#{r.turn + 1}: expected {commands}, got {r.commands}")
+    return errors
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Replay a recorded game input into the bot")
+    parser.add_argument("recording")
+    parser.add_argument("--bot", default=BOT_PATH)
+    parser.add_argument("--ponder", type=float, default=0, metavar="MS",
+                        help="let the bot ponder this long between turns, as if waiting for the referee")
+    parser.add_argument("--debug", action="store_true", help="let the bot debug output through")
+    parser.add_argument("--dump", help="write the commands of each turn to this JSON file")
+    parser.add_argument("--check", help="compare the commands of each turn with this JSON file")
+    parser.add_argument("--telemetry", metavar="DIR", help="append per-drone turn records to this directory")
+    args = parser.parse_args(argv)
+
+    writer = None
+    if args.telemetry:
+        from telemetry import TelemetryWriter
+        writer = TelemetryWriter(args.telemetry)
+    results = replay(load_recording(args.recording), args.bot, ponder_ms=args.ponder, debug=args.debug,
+                     telemetry=writer, label=os.path.basename(args.recording))
+    if writer:
+        writer.close()
+    print_report(results)
+    if args.dump:
+        with open(args.dump, "w") as f:
+            json.dump([r.commands for r in results], f, indent=1)
+    if args.check:
+        with open(args.check) as f:
+            errors = check_commands(results, json.load(f))
+        for error in errors:
+            print(error, file=sys.stderr)
+        if errors:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
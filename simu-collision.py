@@ -91,10 +91,17 @@ MONSTER_AGGRESSIVE_SPEED = 400
 
 GRID_SIZE = 50  # printing only
 GRID_CHAR_WIDTH = 200
+MAX_TURNS = 100
+TARGET = Vector(9999, 9999)
+FIXED_BOTS = [(1300, 500), (1500, 500), (3000, 500), (4000, 2000), (9500, 500), (500, 9500), (9500, 9500), (5000, 5000)]
+RANDOM_BOTS = 5
+MIN_RANDOM_BOT_DISTANCE = 2000  # from the drone start
+ANGLES = range(0, 360, 10)
 
 global drone_position, bots_positions
 
 log = print
+RENDER = True
 
 
 
@@ -243,6 +250,8 @@ def move_drone_safely(drone_position: Vector, bots_positions: List[Vector], targ
 
 # Function to print the game board  
 def print_board(drone_position: Vector, bots_positions: List[Vector]) -> None:  
+    if not RENDER:
+        return
     board = [[' ' for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]  
       
     # Place the drone on the board  
@@ -275,16 +284,18 @@ def print_board(drone_position: Vector, bots_positions: List[Vector]) -> None:
 
 
 
-def main_loop():
+def main_loop(rng=random, random_bots=None):
     # Initialize positions
     drone_position: Vector = Vector(0, 0)
-    bots_positions = [Vector(*t) for t in [(1300, 500), (1500, 500), (3000, 500), (4000, 2000), (9500, 500), (500, 9500), (9500, 9500), (5000, 5000)]]
+    bots_positions = [Vector(*t) for t in FIXED_BOTS]
 
     # add random bots
-    for _ in range(5): 
+    if random_bots is not None:
+        bots_positions += [Vector(*bot) for bot in random_bots]
+    for _ in range(RANDOM_BOTS if random_bots is None else 0):
         bot = Vector(0, 0)
-        while bot[0]**2 + bot[1]**2 < 2000**2:
-            bot = Vector(random.randint(0, MAP_SIZE-1), random.randint(0, MAP_SIZE-1))
+        while bot[0]**2 + bot[1]**2 < MIN_RANDOM_BOT_DISTANCE**2:
+            bot = Vector(rng.randint(0, MAP_SIZE-1), rng.randint(0, MAP_SIZE-1))
         bots_positions.append(bot)
 
     loop = 0
@@ -294,7 +305,7 @@ def main_loop():
     # Main game loop  
     while True:  
         loop +=1
-        the_target_position = Vector(9999, 9999)
+        the_target_position = TARGET
 
         previous_drone_position = drone_position
 
@@ -323,21 +334,152 @@ def main_loop():
         # Print the board at each turn  
         print_board(drone_position, bots_positions)  
 
-        if loop == 100:
+        if loop == MAX_TURNS:
             log("Game Over: The drone has run out of turns.")
             return 0
 
 
-def make_stats(nruns=100):
-    global log
+def make_stats(nruns=100, seed=None):
+    # serial, one main_loop at a time
+    global log, RENDER
     log = lambda *args, **kwargs: None
+    RENDER = False
+    rng = random.Random(seed)
 
     succ = 0
     for _ in range(nruns):
-        succ += main_loop()
+        succ += main_loop(rng)
 
     print(succ * 100 / nruns, '% of success')
 
 
-main_loop()
-# make_stats(600)
+#===========================================================================
+#                 Batch mode: many scenarios at once, with numpy
+#===========================================================================
+# Same game as main_loop, and the same move_drone_safely decisions, computed for all the
+# scenarios and all the angles of find_safe_direction at once. No rendering.
+
+def random_bots_batch(rng, nruns):
+    # (nruns, RANDOM_BOTS, 2), at least MIN_RANDOM_BOT_DISTANCE from the drone start
+    bots = rng.integers(0, MAP_SIZE, size=(nruns, RANDOM_BOTS, 2))
+    while True:
+        too_close = (bots ** 2).sum(axis=-1) < MIN_RANDOM_BOT_DISTANCE ** 2
+        if not too_close.any():
+            return bots
+        bots[too_close] = rng.integers(0, MAP_SIZE, size=(int(too_close.sum()), 2))
+
+
+def move_bots_batch(bots, drone, speed):
+    # bots (..., B, 2) towards drone (..., 2), as move_bots
+    import numpy as np
+    d = drone[..., None, :] - bots
+    distance = np.sqrt(d[..., 0] * d[..., 0] + d[..., 1] * d[..., 1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        moved = np.trunc(bots + d / distance[..., None] * speed)
+    return np.where((distance <= speed)[..., None], np.broadcast_to(drone[..., None, :], bots.shape), moved)
+
+
+def move_drone_safely_batch(drone, bots, target):
+    # drone (S, 2), bots (S, B, 2) -> new drone positions (S, 2), as move_drone_safely
+    import numpy as np
+    # math.cos/sin, not numpy's, to get the very same moves as find_safe_direction
+    moves = np.array([(DRONE_MOVE_SPEED * math.cos(math.radians(a)), DRONE_MOVE_SPEED * math.sin(math.radians(a)))
+                      for a in ANGLES])
+    pos = np.broadcast_to(drone[:, None, :], (len(drone), len(moves), 2))
+    temp_bots = np.broadcast_to(bots[:, None], (len(drone), len(moves)) + bots.shape[1:])
+    safe = np.ones(pos.shape[:2], bool)
+    candidates = {}
+    for turns_ahead in (1, 2, 3):
+        pos = np.clip(pos + moves, 0, MAP_SIZE - 1)
+        temp_bots = move_bots_batch(temp_bots, pos, MONSTER_AGGRESSIVE_SPEED)
+        d = temp_bots - pos[:, :, None, :]
+        distance = np.sqrt(d[..., 0] * d[..., 0] + d[..., 1] * d[..., 1])
+        safe = safe & ~(distance <= MONSTER_INTERACTION_RADIUS).any(axis=-1)
+
+        wall1_malus = lambda dist: 1000 - np.minimum(dist, 1000)
+        wall_malus = wall1_malus(pos[..., 0]) + wall1_malus(pos[..., 1]) \
+            + wall1_malus(MAP_SIZE - pos[..., 0]) + wall1_malus(MAP_SIZE - pos[..., 1])
+        safety_distance = np.hypot(d[..., 0], d[..., 1]).min(axis=-1)
+        distance_to_target = np.hypot(target[0] - pos[..., 0], target[1] - pos[..., 1])
+        with np.errstate(divide="ignore"):
+            score = np.where(safe, np.log(safety_distance) - distance_to_target - wall_malus, -np.inf)
+        best = score.argmax(axis=1)
+        found = safe.any(axis=1)
+        new = np.clip(drone + np.trunc(moves[best]), 0, MAP_SIZE - 1)
+        candidates[turns_ahead] = np.where(found[:, None], new, drone)
+
+    # 3 turns ahead, then 2, then 1 when nothing moves the drone
+    new = candidates[3]
+    for turns_ahead in (2, 1):
+        stuck = (new == drone).all(axis=1)
+        new = np.where(stuck[:, None], candidates[turns_ahead], new)
+    near = np.hypot(target[0] - drone[:, 0], target[1] - drone[:, 1]) < DRONE_MOVE_SPEED
+    return np.where(near[:, None], np.asarray(target, float), new)
+
+
+def play_batch(random_bots):
+    # returns (success (S,), turns (S,)): the turn of the victory or of the end
+    import numpy as np
+    nruns = len(random_bots)
+    bots = np.concatenate([np.broadcast_to(np.array(FIXED_BOTS, float), (nruns, len(FIXED_BOTS), 2)),
+                           random_bots.astype(float)], axis=1)
+    drone = np.zeros((nruns, 2))
+    target = np.array(TARGET, float)
+    running = np.ones(nruns, bool)
+    success = np.zeros(nruns, bool)
+    turns = np.full(nruns, MAX_TURNS)
+    for loop in range(1, MAX_TURNS + 1):
+        active = np.flatnonzero(running)
+        if not len(active):
+            break
+        previous = drone[active]
+        new_drone = np.trunc(move_drone_safely_batch(previous, bots[active], target))
+        bots[active] = move_bots_batch(bots[active], previous, MONSTER_AGGRESSIVE_SPEED)
+        drone[active] = new_drone
+        d = bots[active] - new_drone[:, None, :]
+        caught = (np.sqrt(d[..., 0] * d[..., 0] + d[..., 1] * d[..., 1]) <= MONSTER_INTERACTION_RADIUS).any(axis=1)
+        arrived = ~caught & (new_drone == target).all(axis=1)
+        success[active[arrived]] = True
+        turns[active[caught | arrived]] = loop
+        running[active[caught | arrived]] = False
+    return success, turns
+
+
+def make_stats_batch(nruns=600, seed=0, check=0):
+    # seeded Monte Carlo: success rate with its 95% confidence interval (Wilson), turns to target;
+    # check=N also replays the first N scenarios with main_loop and counts disagreements
+    import numpy as np
+    random_bots = random_bots_batch(np.random.default_rng(seed), nruns)
+    success, turns = play_batch(random_bots)
+    n, k, z = nruns, int(success.sum()), 1.96
+    center = (k + z * z / 2) / (n + z * z)
+    half = z * math.sqrt(k * (n - k) / n + z * z / 4) / (n + z * z)
+    print(f"{k * 100 / n:.1f}% of success, 95% CI [{100 * (center - half):.1f}%, {100 * (center + half):.1f}%] over {n} runs")
+    if k:
+        q = np.percentile(turns[success], [10, 50, 90])
+        print(f"turns to target: min {turns[success].min()} p10 {q[0]:.0f} p50 {q[1]:.0f} p90 {q[2]:.0f} max {turns[success].max()}")
+        print("histogram: " + "  ".join(f"{lo}-{lo + 9}: {c}" for lo, c in
+                                        zip(range(0, MAX_TURNS, 10), np.histogram(turns[success], bins=10, range=(0, MAX_TURNS))[0])))
+    if check:
+        global log, RENDER
+        log = lambda *args, **kwargs: None
+        RENDER = False
+        serial = [main_loop(random_bots=[tuple(map(int, b)) for b in bots]) for bots in random_bots[:check]]
+        differences = sum(1 for a, b in zip(serial, success[:check]) if a != int(b))
+        print(f"main_loop disagrees on {differences} of {check} scenarios")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Drone evasion simulation")
+    parser.add_argument("--stats", type=int, metavar="RUNS", help="batch Monte Carlo over this many scenarios")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check", type=int, default=0, metavar="RUNS", help="compare that many runs with main_loop")
+    parser.add_argument("--serial", action="store_true", help="with --stats, the original serial make_stats")
+    args = parser.parse_args()
+    if args.stats and args.serial:
+        make_stats(args.stats, args.seed)
+    elif args.stats:
+        make_stats_batch(args.stats, args.seed, args.check)
+    else:
+        main_loop()
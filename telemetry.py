@@ -0,0 +1,193 @@
+# Per-turn, per-drone telemetry of the bot, in a columnar binary format.
+#
+# replay.py --telemetry DIR and referee.py --telemetry DIR append one row per drone and turn:
+# position, role, strategy state, target, light, battery, scans, distance to the closest known
+# monster and decision time. A telemetry directory holds one raw little-endian file per
+# column and meta.json (row count, dtypes, game labels, enum names). Rows are written in
+# chunks and the row count is only updated once a chunk is on disk, so a killed run leaves
+# a readable directory. Columns are memory-mapped with numpy for the analysis:
+#
+#   python referee.py --games 500 --telemetry runs/t1
+#   python telemetry.py runs/t1                 # where and when drones get caught, battery use
+#
+#   columns = telemetry.load("runs/t1")         # dict of numpy memmaps
+#   caught = columns["dead"] ...
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from array import array
+from typing import Any, Dict, List, Optional
+
+# name -> array typecode (and numpy dtype, little-endian)
+COLUMNS = {
+    "game": ("i", "<i4"),  # index in meta["games"]
+    "turn": ("h", "<i2"),
+    "drone_id": ("b", "i1"),
+    "x": ("i", "<i4"),
+    "y": ("i", "<i4"),
+    "role": ("b", "i1"),  # DroneRole value, 0 if none
+    "state": ("b", "i1"),  # StrategyState value
+    "target_x": ("i", "<i4"),
+    "target_y": ("i", "<i4"),
+    "light": ("b", "i1"),
+    "battery": ("b", "i1"),
+    "dead": ("b", "i1"),  # emergency mode
+    "scans": ("b", "i1"),  # unsaved scans in the drone
+    "monster_distance": ("i", "<i4"),  # closest monster the bot knows of, -1 if none
+    "decision_ms": ("f", "<f4"),  # time of the whole turn, same for both drones
+}
+CHUNK_ROWS = 65536
+NO_MONSTER = -1
+
+
+class TelemetryWriter:
+    def __init__(self, path: str, chunk_rows: int = CHUNK_ROWS):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            # append to an existing directory
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+            for name in COLUMNS:
+                # drop a chunk written after the last meta update
+                with open(self.column_path(name), "ab") as column:
+                    column.truncate(self.meta["rows"] * array(COLUMNS[name][0]).itemsize)
+        else:
+            self.meta = {"rows": 0, "columns": {name: dtype for name, (_, dtype) in COLUMNS.items()},
+                         "games": [], "enums": {}}
+        self.buffers = {name: array(typecode) for name, (typecode, _) in COLUMNS.items()}
+
+    def column_path(self, name: str) -> str:
+        return os.path.join(self.path, name + ".bin")
+
+    def add_game(self, label: str) -> int:
+        self.meta["games"].append(label)
+        return len(self.meta["games"]) - 1
+
+    def record_turn(self, game_index: int, engine: Any, decision_ms: float):
+        # engine: a GameEngine right after play_turn
+        if not self.meta["enums"]:
+            bot = sys.modules[type(engine).__module__]
+            self.meta["enums"] = {"role": {str(r.value): r.name for r in bot.DroneRole},
+                                  "state": {str(s.value): s.name for s in bot.StrategyState}}
+        monsters = [fs.predicted_pos for fs in engine.fish_global_map.values() if fs.is_monster and fs.predicted_pos.x >= 0]
+        b = self.buffers
+        for drone in engine.my_drones:
+            b["game"].append(game_index)
+            b["turn"].append(engine.loop - 1)
+            b["drone_id"].append(drone.drone_id)
+            b["x"].append(int(drone.pos.x))
+            b["y"].append(int(drone.pos.y))
+            b["role"].append(drone.role.value if drone.role else 0)
+            b["state"].append(drone.state.value)
+            b["target_x"].append(int(round(drone.target.x)))
+            b["target_y"].append(int(round(drone.target.y)))
+            b["light"].append(1 if drone.is_light_enabled else 0)
+            b["battery"].append(drone.battery)
+            b["dead"].append(1 if drone.dead else 0)
+            b["scans"].append(min(127, len(drone.scans)))
+            b["monster_distance"].append(
+                int(min(math.dist(drone.pos, m) for m in monsters)) if monsters else NO_MONSTER)
+            b["decision_ms"].append(decision_ms)
+        if len(b["game"]) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        rows = len(self.buffers["game"])
+        if rows:
+            for name, buffer in self.buffers.items():
+                if sys.byteorder != "little":
+                    buffer.byteswap()
+                with open(self.column_path(name), "ab") as f:
+                    buffer.tofile(f)
+            self.buffers = {name: array(typecode) for name, (typecode, _) in COLUMNS.items()}
+            self.meta["rows"] += rows
+        meta_path = os.path.join(self.path, "meta.json")
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(self.meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def close(self):
+        self.flush()
+
+
+def load(path: str) -> Dict[str, Any]:
+    # columns as read-only numpy memmaps, plus "meta"
+    import numpy as np
+
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    columns: Dict[str, Any] = {"meta": meta}
+    for name, dtype in meta["columns"].items():
+        if meta["rows"]:
+            columns[name] = np.memmap(os.path.join(path, name + ".bin"), dtype=dtype, mode="r", shape=(meta["rows"],))
+        else:
+            columns[name] = np.zeros(0, dtype)
+    return columns
+
+
+#===========================================================================
+#                            Analysis
+#===========================================================================
+
+def caught(columns: Dict[str, Any]):
+    # rows where a drone enters emergency mode: (depth, turn) of the turn before
+    import numpy as np
+
+    order = np.lexsort((columns["turn"], columns["drone_id"], columns["game"]))
+    game, drone, dead = columns["game"][order], columns["drone_id"][order], columns["dead"][order]
+    same = (game[1:] == game[:-1]) & (drone[1:] == drone[:-1])
+    entering = same & (dead[1:] == 1) & (dead[:-1] == 0)
+    before = order[:-1][entering]
+    return columns["y"][before], columns["turn"][before]
+
+
+def print_report(columns: Dict[str, Any], out=sys.stdout):
+    import numpy as np
+
+    meta = columns["meta"]
+    rows = meta["rows"]
+    print(f"{rows} drone turns, {len(meta['games'])} games", file=out)
+    if not rows:
+        return
+    depth, turn = caught(columns)
+    print(f"\n{len(depth)} drones caught", file=out)
+    if len(depth):
+        print("by depth:   " + "  ".join(f"{lo}-{lo + 1000}: {n}" for lo, n in
+                                         zip(range(0, 10000, 1000), np.histogram(depth, bins=10, range=(0, 10000))[0])), file=out)
+        print("by turn:    " + "  ".join(f"{lo}-{lo + 20}: {n}" for lo, n in
+                                         zip(range(0, 200, 20), np.histogram(turn, bins=10, range=(0, 200))[0])), file=out)
+
+    alive = columns["dead"] == 0
+    light = columns["light"] == 1
+    full = columns["battery"] >= 30
+    print(f"\nlight on {light[alive].mean():.1%} of the turns alive", file=out)
+    # recharging is capped: a full battery with the light off is a recharge thrown away
+    print(f"battery wasted: {np.count_nonzero(alive & full & ~light)} turns full with the light off"
+          f" ({(alive & full & ~light).mean():.1%})", file=out)
+    print(f"light wanted with too little battery: {np.count_nonzero(light & (columns['battery'] < 5))} turns", file=out)
+    names = meta["enums"].get("state", {})
+    states, counts = np.unique(columns["state"], return_counts=True)
+    print("\nstates: " + "  ".join(f"{names.get(str(s), s)}: {c / rows:.1%}" for s, c in zip(states, counts)), file=out)
+    ms = np.asarray(columns["decision_ms"])[columns["turn"] > 0]
+    if len(ms):
+        print(f"decision time p50 {np.percentile(ms, 50):.2f}ms p99 {np.percentile(ms, 99):.2f}ms max {ms.max():.2f}ms", file=out)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Summarize a telemetry directory")
+    parser.add_argument("directory")
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    print_report(load(args.directory))
+    print(f"analyzed in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,122 +1,592 @@
-import sys
-from typing import NamedTuple
-import unittest
-
-
-# ===========================================================================
-#                            Imported Modules
-# ===========================================================================
-class RadarBlip(NamedTuple):
-    fish_id: int
-    dir: str  # "TL"RADAR_TOP_LEFT etc.
-
-
-class Drone:
-    drone_id: int
-    # pos: Vector #type: ignore
-    dead: bool
-    battery: int
-    scans: list[int]
-    # role: DroneRole # type: ignore
-    # target: Vector  # type: ignore
-    waiting: bool
-    is_light_enabled: bool
-    context: dict[str, object]
-    monsters_nearby = dict[int, int]
-
-
-RADAR_TOP_LEFT = "TL"
-RADAR_TOP_RIGHT = "TR"
-RADAR_BOTTOM_RIGHT = "BR"
-RADAR_BOTTOM_LEFT = "BL"
-# ===========================================================================
-
-
-class Radar:
-    drone: Drone
-    detected: dict[str, list[RadarBlip]]
-
-    def __init__(self, drone: Drone, radar_blips: list[RadarBlip]) -> None:
-        self.drone = drone
-        self.detected = {
-            RADAR_TOP_LEFT: [],
-            RADAR_TOP_RIGHT: [],
-            RADAR_BOTTOM_LEFT: [],
-            RADAR_BOTTOM_RIGHT: [],
-        }
-        self.scan(radar_blips)
-
-    def get_blips(self, direction: str) -> list[RadarBlip]:
-        return self.detected[direction]
-
-    def scan(self, radar_blips: RadarBlip) -> None:
-        for blip in radar_blips:
-          if blip.dir == RADAR_TOP_LEFT:
-              self.detected[RADAR_TOP_LEFT].append(blip)
-          elif blip.dir == RADAR_TOP_RIGHT:
-              self.detected[RADAR_TOP_RIGHT].append(blip)
-          elif blip.dir == RADAR_BOTTOM_LEFT:
-              self.detected[RADAR_BOTTOM_LEFT].append(blip)
-          elif blip.dir == RADAR_BOTTOM_RIGHT:
-              self.detected[RADAR_BOTTOM_RIGHT].append(blip)
-          else:
-              raise ValueError("Invalid blip direction")
-
-
-class MyTestCase(unittest.TestCase):
-    radar_blips = [
-            RadarBlip(1, RADAR_TOP_LEFT),
-            RadarBlip(2, RADAR_TOP_LEFT),
-            RadarBlip(3, RADAR_TOP_RIGHT),
-            RadarBlip(4, RADAR_TOP_RIGHT),
-            RadarBlip(5, RADAR_BOTTOM_LEFT),
-            RadarBlip(6, RADAR_BOTTOM_LEFT),
-            RadarBlip(7, RADAR_BOTTOM_RIGHT),
-            RadarBlip(8, RADAR_BOTTOM_RIGHT),
-        ]
-
-    def test_init_radar(self):
-        drone = Drone()
-        drone.drone_id = 1
-
-
-        radar = Radar(drone, self.radar_blips)
-        self.maxDiff = None
-        self.assertEqual(
-            radar.detected,
-            {
-                RADAR_TOP_LEFT: [
-                    RadarBlip(1, RADAR_TOP_LEFT),
-                    RadarBlip(2, RADAR_TOP_LEFT),
-                ],
-                RADAR_TOP_RIGHT: [
-                    RadarBlip(3, RADAR_TOP_RIGHT),
-                    RadarBlip(4, RADAR_TOP_RIGHT),
-                ],
-                RADAR_BOTTOM_LEFT: [
-                    RadarBlip(5, RADAR_BOTTOM_LEFT),
-                    RadarBlip(6, RADAR_BOTTOM_LEFT),
-                ],
-                RADAR_BOTTOM_RIGHT: [
-                    RadarBlip(7, RADAR_BOTTOM_RIGHT),
-                    RadarBlip(8, RADAR_BOTTOM_RIGHT),
-                ],
-            },
-        )
-
-    def test_get_blips(self):
-        drone = Drone()
-        drone.drone_id = 1
-
-        radar = Radar(drone, self.radar_blips)
-        self.assertEqual(
-            radar.get_blips(RADAR_TOP_LEFT),
-            [
-                RadarBlip(1, RADAR_TOP_LEFT),
-                RadarBlip(2, RADAR_TOP_LEFT),
-            ],
-        )
-
-
-if __name__ == "__main__":
-    unittest.main()
+import asyncio
+import importlib.util
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from main import (
+    GameEngine,
+    Radar,
+    RadarBlip,
+    RADAR_BOTTOM_LEFT,
+    RADAR_BOTTOM_RIGHT,
+    RADAR_TOP_LEFT,
+    RADAR_TOP_RIGHT,
+    read_init,
+    read_turn,
+)
+import arena
+import bench
+import evasion
+import main
+import profile_replays
+import referee
+import replay
+import tournament
+import tune
+
+main.DEBUG_ENABLED = False
+
+
+class MyTestCase(unittest.TestCase):
+    radar_blips = [
+            RadarBlip(1, RADAR_TOP_LEFT),
+            RadarBlip(2, RADAR_TOP_LEFT),
+            RadarBlip(3, RADAR_TOP_RIGHT),
+            RadarBlip(4, RADAR_TOP_RIGHT),
+            RadarBlip(5, RADAR_BOTTOM_LEFT),
+            RadarBlip(6, RADAR_BOTTOM_LEFT),
+            RadarBlip(7, RADAR_BOTTOM_RIGHT),
+            RadarBlip(8, RADAR_BOTTOM_RIGHT),
+        ]
+
+    def test_init_radar(self):
+        radar = Radar()
+        radar.scan(self.radar_blips)
+        self.maxDiff = None
+        self.assertEqual(
+            radar.detected,
+            {
+                RADAR_TOP_LEFT: [
+                    RadarBlip(1, RADAR_TOP_LEFT),
+                    RadarBlip(2, RADAR_TOP_LEFT),
+                ],
+                RADAR_TOP_RIGHT: [
+                    RadarBlip(3, RADAR_TOP_RIGHT),
+                    RadarBlip(4, RADAR_TOP_RIGHT),
+                ],
+                RADAR_BOTTOM_LEFT: [
+                    RadarBlip(5, RADAR_BOTTOM_LEFT),
+                    RadarBlip(6, RADAR_BOTTOM_LEFT),
+                ],
+                RADAR_BOTTOM_RIGHT: [
+                    RadarBlip(7, RADAR_BOTTOM_RIGHT),
+                    RadarBlip(8, RADAR_BOTTOM_RIGHT),
+                ],
+            },
+        )
+
+    def test_get_blips(self):
+        radar = Radar()
+        radar.scan(self.radar_blips)
+        self.assertEqual(
+            radar.get_blips(RADAR_TOP_LEFT),
+            [
+                RadarBlip(1, RADAR_TOP_LEFT),
+                RadarBlip(2, RADAR_TOP_LEFT),
+            ],
+        )
+
+
+class GameEngineTestCase(unittest.TestCase):
+    init_lines = ["3", "4 0 0", "5 1 1", "6 -1 -1"]
+
+    def turn_lines(self, x):
+        return [
+            "0", "0",
+            "0",  # my scans
+            "0",  # foe scans
+            "2", f"0 {x} 500 0 30", f"2 {9999 - x} 500 0 30",
+            "2", "1 3000 500 0 30", "3 7000 500 0 30",
+            "1", "0 4",  # drone scans
+            "1", "4 3000 3000 0 200",  # visible creatures
+            "2", "0 4 BR", "2 5 BL",
+        ]
+
+    def play(self, game, lines):
+        return game.play_turn(read_turn(iter(lines).__next__))
+
+    def played(self):
+        # an engine after its first turn: drone 0 at (2000, 500) carries fish 4
+        game = GameEngine(read_init(iter(self.init_lines).__next__))
+        self.play(game, self.turn_lines(2000))
+        return game
+
+    def add_monster(self, game, pos, speed):
+        # monster 6, seen this turn and in the radar of drone 0
+        monster = game.fish_global_map[6] = main.FishGlobalState(6, game.fish_details[6])
+        monster.predicted_pos, monster.last_seen_speed, monster.last_seen_loop = pos, speed, game.loop
+        game.my_radar_blips[0].append(RadarBlip(6, RADAR_BOTTOM_LEFT))
+
+    def test_engines_are_isolated(self):
+        game1 = GameEngine(read_init(iter(self.init_lines).__next__))
+        game2 = GameEngine(read_init(iter(self.init_lines).__next__))
+        commands1 = self.play(game1, self.turn_lines(2000))
+        self.play(game1, self.turn_lines(2300))
+        commands2 = self.play(game2, self.turn_lines(2000))
+
+        self.assertEqual(commands1, commands2)
+        self.assertEqual(len(commands1), 2)
+        self.assertTrue(all(c.startswith("MOVE ") for c in commands1))
+        self.assertEqual((game1.loop, game2.loop), (2, 1))
+        self.assertEqual(game1.drone_by_id[0].pos.x, 2300)
+        self.assertEqual(game2.drone_by_id[0].pos.x, 2000)
+        self.assertEqual(game1.drone_by_id[0].scans, [4])
+        self.assertIn(4, game1.fish_global_map)
+
+    def test_late_turn_keeps_the_plain_targets(self):
+        game = self.played()
+        turn = read_turn(iter(self.turn_lines(2300)).__next__)
+        # the turn arrived a second ago: no time for evasion
+        commands = game.play_turn(turn._replace(received_at=turn.received_at - 1))
+        self.assertEqual(len(commands), 2)
+        self.assertIn("fallback-FEUILLE_MORTE-0", game.budget.cut_short)
+        self.assertIn("fallback-FEUILLE_MORTE-2", game.budget.cut_short)
+
+        budget = main.TurnBudget(0)
+        pos = main.Vector(2000, 3000)
+        self.assertEqual(main.find_safe_direction(pos, [main.Vector(2000, 3600)], main.Vector(2000, 9000), 3, budget=budget),
+                         pos)
+        self.assertEqual(budget.cut_short, ["find_safe_direction"])
+
+    def test_ponder_answers_the_predicted_evasion(self):
+        game = self.played()
+        self.add_monster(game, main.Vector(2000, 2000), main.Vector(0, 0))
+        drone = game.drone_by_id[0]
+        game.ponder.start([drone])
+        game.ponder.thread.join()
+        pos = main.predict_next_drone_pos(drone)
+        bots, target = [main.Vector(2000, 2000)], drone.target
+        expected = main.find_safe_direction(pos, bots, target, 3)
+        self.assertEqual(main.find_safe_direction(pos, bots, target, 3, ponder=game.ponder), expected)
+        # the monster moved, the cache has nothing for it
+        main.find_safe_direction(pos, [main.Vector(2100, 2000)], target, 3, ponder=game.ponder)
+        self.assertEqual((game.ponder.hits, game.ponder.misses), (1, 1))
+
+    def test_sim_state_clone_is_independent(self):
+        game = self.played()
+        state = main.SimState.from_engine(game)
+        self.assertEqual(state.drone_ids, (0, 2, 1, 3))
+        self.assertEqual(state.scans[0], 1 << state.slot_of[4])
+        self.assertEqual((state.cx[0], state.cy[0], state.known), (3000, 3000, [True, False, False]))
+
+        clone = main.sim_clone(state)
+        clone.x[0] += 600
+        clone.scans[1] |= 2
+        clone.cx[0] = 0
+        self.assertEqual((state.x[0], state.scans[1], state.cx[0]), (2000, 0, 3000))
+        self.assertIs(clone.creature_ids, state.creature_ids)
+
+    def test_sim_step_saves_with_referee_scoring(self):
+        game = self.played()
+        state = main.SimState.from_engine(game)
+        # my drone 0 carries fish 4 and surfaces: first to save it (1 x 2), and it is the only
+        # fish of its color (3 x 2) and of its type (4 x 2)
+        main.sim_step(state, [(2000, 0), None, (3000, 500), (7000, 500)], [False] * 4)
+        self.assertEqual((state.my_score, state.my_saved, state.scans[0]), (16, 1 << state.slot_of[4], 0))
+        self.assertEqual(state.turn, 2)
+
+    def test_assignment_splits_the_fish_left(self):
+        game = self.played()
+        # fish 4 is carried by drone 0, 6 is a monster: only 5 is left, somewhere left of drone 2,
+        # guessed at x=4000: closer to drone 0
+        self.assertEqual(game.assignment, {0: [5], 2: []})
+        self.assertEqual(main.assign_fish(game), {0: [5], 2: []})
+
+    def test_endgame_surfaces_when_it_wins(self):
+        game = self.played()
+        # saving fish 4 gives 16, the foe can then get 26 with fish 4 and 5: fish 5 is needed
+        self.assertEqual((game.endgame.surface, game.endgame.need), ([], [5]))
+        self.assertEqual(game.assignment[0], [5])
+        state = main.SimState.from_engine(game)
+        self.assertEqual(main.Endgame(state).outcome(state.scans[0]), (16, 26))
+
+        state.my_score = 11
+        endgame = main.Endgame(state)
+        endgame.solve()
+        self.assertEqual((endgame.surface, endgame.need), ([0], []))
+        state.my_score, state.foe_score = 0, 30
+        endgame = main.Endgame(state)
+        endgame.solve()
+        self.assertEqual((endgame.surface, endgame.need), ([], []))
+
+    def test_endgame_counts_the_foe_saving_first(self):
+        state = main.SimState.from_engine(self.played())
+        state.my_score = 11
+        # from y=6000 drone 0 needs 10 turns up, the foe drone at (3000, 500) scans fish 4 at
+        # (3000, 3000) and saves it in 2: its first-save bonus is lost
+        state.y[0] = 6000
+        endgame = main.Endgame(state)
+        endgame.solve()
+        self.assertEqual(endgame.early_saves([0]), 1 << state.slot_of[4])
+        self.assertEqual(endgame.surface, [])
+        state.y[0] = 1000
+        endgame = main.Endgame(state)
+        endgame.solve()
+        self.assertEqual((endgame.early_saves([0]), endgame.surface), (0, [0]))
+
+    def test_endgame_rush_gives_the_role_back(self):
+        game = self.played()
+        state = main.SimState.from_engine(game)
+        state.my_score = 11
+        game.endgame = main.Endgame(state)
+        game.endgame.solve()
+        drone = game.drone_by_id[0]
+        drone.role, drone.pos = main.DroneRole.MCTS, main.Vector(2000, 3000)
+        drone.force_strategy_change(game.foe_drones)
+        self.assertEqual(drone.role, main.DroneRole.RUSH_TOP)
+        drone.pos = main.Vector(2000, 400)
+        drone.force_strategy_change(game.foe_drones)
+        self.assertEqual(drone.role, main.DroneRole.MCTS)
+
+    @unittest.skipUnless(importlib.util.find_spec("numpy"), "numpy is not installed")
+    def test_covered_samples_match_the_paths(self):
+        game = self.played()
+        drone = game.drone_by_id[0]
+        samples = main.fish_samples(game)
+        targets = [main.Vector(x, 9000) for x in range(0, 10000, 500)]
+        paths = main.candidate_paths(drone.pos, targets, main.PATH_COVERAGE_TURNS)
+        radii = main.np.full(paths.shape[:2], float(main.DRONE_LIGHT_RADIUS_POWERFUL))
+        counts, values = main.covered_samples(game, samples, paths, radii)
+        fish_values = main.fish_values(game, {s[0] for s in samples})
+        for target, candidate, count, value in zip(targets, paths, counts, values):
+            drone.target = target
+            path = main.drone_path(drone, main.PATH_COVERAGE_TURNS)
+            main.np.testing.assert_allclose(candidate, path, atol=1)  # drone_path steps by the truncated dist()
+            covered = [s for s in samples if any(main.dist(p, s[2]) <= main.DRONE_LIGHT_RADIUS_POWERFUL for p in path)]
+            self.assertAlmostEqual(count, sum(s[1] for s in covered))
+            self.assertAlmostEqual(value, sum(s[1] * fish_values[s[0]] for s in covered))
+        self.assertGreater(counts.max(), 0)
+
+    @unittest.skipUnless(importlib.util.find_spec("numpy"), "numpy is not installed")
+    def test_evaluate_moves(self):
+        game = self.played()
+        self.add_monster(game, main.Vector(2000, 2600), main.Vector(0, 0))
+        drone = game.drone_by_id[0]
+        moves = [main.Move(main.Vector(2000, 0), False), main.Move(main.Vector(2000, 1100), True)]
+        scores = main.evaluate_moves(game, drone, moves)
+        self.assertEqual(scores.surface.tolist(), [0, 600])
+        self.assertEqual(scores.battery.tolist(), [30, 25])
+        # sinking onto the monster
+        self.assertEqual(scores.risk[0], 0)
+        self.assertGreater(scores.risk[1], 0.5)
+        # fish 4 is carried: surfacing saves it
+        self.assertEqual(scores.score[0], main.Score.estimated_drone_save(drone))
+        self.assertEqual(main.choose_move(drone, moves, main.MoveWeights(risk=-1)), moves[0])
+        self.assertEqual(main.choose_move(drone, moves, main.MoveWeights(battery=-1)), moves[1])
+
+    def test_mcts_plans_both_drones(self):
+        game = self.played()
+        plan = main.mcts_search(game, main.TurnBudget(main.TIME_PER_TURN_MS))
+        self.assertEqual(set(plan), {0, 2})
+        self.assertTrue(all(action in main.MCTS_ACTIONS for action in plan.values()))
+        self.assertTrue(game.mcts_table)
+
+    def test_mcts_avoids_a_monster_on_the_way(self):
+        game = self.played()
+        # a monster 900u below drone 0, rising at it at full speed: sinking gets it caught
+        game.drone_by_id[0].pos = main.Vector(2000, 4000)
+        self.add_monster(game, main.Vector(2000, 4900), main.Vector(0, -main.MONSTER_AGGRESSIVE_SPEED))
+        plan = main.mcts_search(game, main.TurnBudget(main.TIME_PER_TURN_MS))
+        heading, _ = plan[0]
+        self.assertLessEqual(main.MCTS_HEADINGS[heading][1], 0)
+        state = main.mcts_root_state(game)
+        main.mcts_play(state, [0, 1], [main.MCTS_ACTIONS.index(plan[0]), main.MCTS_ACTIONS.index(plan[2])])
+        self.assertFalse(state.dead[0])
+
+    def test_rhea_carries_its_best_sequences(self):
+        game = self.played()
+        budget = main.TurnBudget(main.TIME_PER_TURN_MS)
+        plan = main.rhea_search(game, budget)
+        turn, best = game.rhea_best
+        self.assertEqual((turn, len(best), len(best[0])), (game.loop, 2, main.RHEA_HORIZON))
+        self.assertEqual(plan[0], main.MCTS_ACTIONS[best[0][0]])
+        self.assertGreaterEqual(budget.counters["rhea_generations"], 1)
+
+    def test_serve_multiplexes_games(self):
+        first_turn = self.init_lines + self.turn_lines(2000)
+        messages = [f"a {len(first_turn)}", *first_turn,
+                    f"b {len(first_turn)}", *first_turn,
+                    "a 18", *self.turn_lines(2300),
+                    "b END"]
+        lines = iter(messages)
+
+        def read_line():
+            # like input() at the end of stdin
+            try:
+                return next(lines)
+            except StopIteration:
+                raise EOFError
+
+        out = []
+        main.serve(read_line, out.append)
+
+        expected = self.play(GameEngine(read_init(iter(self.init_lines).__next__)), self.turn_lines(2000))
+        self.assertEqual(out[:3], ["a 2", *expected])
+        self.assertEqual(out[3:6], ["b 2", *expected])
+        self.assertEqual(out[6], "a 2")
+        self.assertEqual(len(out), 9)
+
+    def test_recorded_game_replays_the_same_commands(self):
+        with tempfile.TemporaryDirectory() as path:
+            stdin = "\n".join(self.init_lines + self.turn_lines(2000) + self.turn_lines(2300)) + "\n"
+            # the bot stops on the end of its input
+            bot = subprocess.run([sys.executable, main.__file__], input=stdin, capture_output=True, text=True,
+                                 env={**os.environ, "UTG_RECORD_INPUT": f"{path}/game.txt"})
+            recording = replay.load_recording(f"{path}/game.txt")
+        self.assertEqual(recording, replay.Recording(self.init_lines, [self.turn_lines(2000), self.turn_lines(2300)]))
+        results = replay.replay(recording)
+        self.assertEqual([c for r in results for c in r.commands], bot.stdout.splitlines())
+        self.assertEqual(len(bot.stdout.splitlines()), 4)
+
+    def test_profile_names_the_bot_functions(self):
+        with tempfile.TemporaryDirectory() as path:
+            with open(f"{path}/game.txt", "w") as f:
+                f.write("\n".join(self.init_lines + self.turn_lines(2000) + self.turn_lines(2300)))
+            bot = replay.load_bot()
+            bot.INITIAL_ROLE = "TOUR"  # from extras.py
+            try:
+                stats, turns = profile_replays.profile_corpus([f"{path}/game.txt"], replay.BOT_PATH)
+            finally:
+                bot.INITIAL_ROLE = main.INITIAL_ROLE
+        functions = {f.name: f for f in profile_replays.bot_functions(stats, replay.BOT_PATH)}
+        self.assertEqual(functions["GameEngine.play_turn"].calls, 2)
+        self.assertIn("ScanTour.improve", functions)
+        self.assertEqual([t.turn for t in turns], [0, 1])
+
+    def test_main_alone_plays_the_default_role(self):
+        # what CodinGame runs: main.py without extras.py next to it
+        with tempfile.TemporaryDirectory() as path:
+            with open(main.__file__) as source, open(f"{path}/main.py", "w") as copy:
+                copy.write(source.read())
+            spec = importlib.util.spec_from_file_location("utg_bot_alone", f"{path}/main.py")
+            bot = importlib.util.module_from_spec(spec)  # type:ignore
+            spec.loader.exec_module(bot)  # type:ignore
+        bot.DEBUG_ENABLED = False
+        bot.INITIAL_ROLE = "MCTS"
+        self.assertFalse(bot.EXTRAS_LOADED)
+        game = bot.GameEngine(bot.read_init(iter(self.init_lines).__next__))
+        commands = game.play_turn(bot.read_turn(iter(self.turn_lines(2000)).__next__))
+        self.assertEqual(len(commands), 2)
+        # pondering comes with it
+        game.ponder_next_turn()
+        game.ponder.thread.join()
+        self.assertTrue(game.ponder.distances)
+        self.assertEqual([d.role for d in game.my_drones], [bot.DroneRole.FEUILLE_MORTE] * 2)
+
+
+class SubmissionTestCase(unittest.TestCase):
+    def test_main_fits_codingame(self):
+        # CodinGame rejects a bot over 100,000 characters, and main.py is submitted alone
+        with open(main.__file__) as source:
+            self.assertLess(len(source.read()), 100_000)
+
+
+class ScanTourTestCase(unittest.TestCase):
+    def test_improve_finds_the_best_order(self):
+        rng = random.Random(5)
+        fish = {i: (main.Vector(rng.randrange(10000), rng.randrange(2500, 10000)), main.Vector(0, 0)) for i in range(7)}
+        tour = main.ScanTour(main.Vector(5000, 500), fish, main.DRONE_LIGHT_RADIUS)
+        order = tour.improve(list(reversed(tour.ids)), max_ms=1000)
+        best = min(itertools.permutations(tour.ids), key=lambda o: tour.cost(list(o)))
+        self.assertAlmostEqual(tour.cost(order), tour.cost(list(best)), places=6)
+        waypoints = tour.waypoints(order)
+        self.assertEqual(waypoints[-1].y, main.DRONE_SURFACE_Y_THRESHOLD - 1)
+
+
+class LightScheduleTestCase(unittest.TestCase):
+    def test_schedule_saves_the_battery_for_the_best_turns(self):
+        gains = [0.5, 0.0, 1.0, -1.0, 0.0, 2.0]
+        # one light only, the battery cannot recharge 5 points in time for a second
+        self.assertEqual(main.schedule_light(gains, 5, 0.0), [False] * 5 + [True])
+        self.assertEqual(main.schedule_light(gains, 10, 0.0), [False, False, True, False, False, True])
+        # with the battery left worth more than a light, none...
+        self.assertEqual(main.schedule_light(gains, 20, 1.0), [False] * 6)
+        # ...but a full battery recharges the light of the first turn by the end
+        self.assertEqual(main.schedule_light(gains, 30, 1.0), [True] + [False] * 5)
+
+    @unittest.skipUnless(importlib.util.find_spec("numpy"), "numpy is not installed")
+    def test_numpy_matches_the_python_loops(self):
+        rng = random.Random(3)
+        drone = main.Drone(0, main.Vector(5000, 3000), False, 30, [4], None)
+        for _ in range(50):
+            path = [main.Vector(5000 + 424 * k, 3000 + 424 * k) for k in range(1, 11)]
+            samples = [(i, rng.random(), main.Vector(rng.randrange(10000), rng.randrange(10000)),
+                        main.Vector(rng.randrange(-200, 201), rng.randrange(-200, 201))) for i in range(20)]
+            monsters = [(main.Vector(rng.randrange(10000), rng.randrange(10000)), main.Vector(0, 270)) for _ in range(3)]
+            gains, battery = [rng.choice([0.0, 0.5, rng.uniform(-1, 2)]) for _ in range(10)], rng.randrange(31)
+            with_numpy = (main.light_gains(drone, path, samples, monsters), main.schedule_light(gains, battery, 0.02))
+            np, main.np = main.np, None
+            try:
+                self.assertEqual((main.light_gains(drone, path, samples, monsters), main.schedule_light(gains, battery, 0.02)),
+                                 with_numpy)
+            finally:
+                main.np = np
+
+
+@unittest.skipUnless(importlib.util.find_spec("numpy"), "numpy is not installed")
+class CoverageTestCase(unittest.TestCase):
+    def test_lit_water_fades_at_fish_speed(self):
+        coverage = main.Coverage()
+        coverage.stamp(main.Vector(5000, 5000), main.DRONE_LIGHT_RADIUS_POWERFUL, 10)
+        # fish swim 200u per turn: the center is known for 10 turns, 100u from the edge for half a turn
+        self.assertTrue(coverage.is_known(main.Vector(5000, 5000), 19))
+        self.assertFalse(coverage.is_known(main.Vector(5000, 5000), 20))
+        self.assertTrue(coverage.is_known(main.Vector(6875, 5000), 10))
+        self.assertFalse(coverage.is_known(main.Vector(6875, 5000), 11))
+        self.assertTrue(coverage.is_known(main.Vector(5000, 1000), 100))  # no fish above 2500u
+        self.assertEqual(coverage.new_coverage(main.Vector(5000, 5000), main.DRONE_LIGHT_RADIUS, 10), 0.0)
+        self.assertAlmostEqual(coverage.new_coverage(main.Vector(7000, 5000), main.DRONE_LIGHT_RADIUS_POWERFUL, 10),
+                               0.6, delta=0.1)
+
+
+class RefereeTestCase(unittest.TestCase):
+    def test_seeded_games_are_deterministic(self):
+        results = [referee.play_game(7, [referee.EngineBot(main), referee.EngineBot(main)]) for _ in range(2)]
+        self.assertEqual(results[0], results[1])
+        self.assertIsNone(results[0].error)
+        self.assertLessEqual(results[0].turns, referee.MAX_TURNS)
+
+    def test_swept_collision(self):
+        # the drone crosses the monster's path during the turn, both ends are out of reach
+        self.assertTrue(referee.swept_collision(0, 0, 600, 0, 300, 600, 0, -600, 500))
+        self.assertFalse(referee.swept_collision(0, 0, 600, 0, 300, 1200, 0, 0, 500))
+
+    def test_first_to_save_bonus(self):
+        game = referee.Game(0)
+        game.scoring.save(({4, 5}, {4}))
+        # type 0 fish: 1 point, doubled for both players when saved on the same turn
+        self.assertEqual(game.scores, (4, 2))
+        game.scoring.save((set(), {5}))
+        self.assertEqual(game.scores, (4, 3))
+
+
+class ArenaTestCase(unittest.TestCase):
+    def test_late_answer_is_a_timeout(self):
+        # answers the first line of each turn only
+        bot = arena.BotProcess([sys.executable, "-c", "import sys\nfor line in sys.stdin: print('WAIT 0', flush=True)"], "bot")
+
+        async def play():
+            await bot.start()
+            try:
+                answers = await bot.play(["1"], 1, 5000)
+                with self.assertRaises(arena.BotTimeout):
+                    await bot.play(["2"], 2, 100)
+            finally:
+                await bot.stop()
+            return answers
+
+        self.assertEqual(asyncio.run(play()), ["WAIT 0"])
+
+
+class BenchTestCase(unittest.TestCase):
+    def test_kernels_run_and_regressions_are_flagged(self):
+        scenarios = bench.make_scenarios(3, 1)
+        self.assertEqual(scenarios, bench.make_scenarios(3, 1))
+        calls = bench.kernel_calls(bench.setup_game(scenarios[2][0]))
+        self.assertIn("find_safe_direction", calls)
+        for call in calls.values():
+            call()
+        results = {"a[monsters=0]": 11.0, "b[monsters=0]": 10.4, "c[monsters=0]": 1.0}
+        self.assertEqual(bench.compare(results, {"a[monsters=0]": 10.0, "b[monsters=0]": 10.0}, 0.05),
+                         ["a[monsters=0]"])
+
+
+class TournamentTestCase(unittest.TestCase):
+    def test_cached_games_are_not_played_again(self):
+        with tempfile.TemporaryDirectory() as path:
+            hashes = (tournament.source_hash(main.__file__), tournament.source_hash(main.__file__), tournament.setup_hash())
+            with open(f"{path}/cache.jsonl", "w") as f:
+                for a_side in (0, 1):
+                    # not a real result: it would differ if the game were played
+                    f.write(json.dumps({"key": tournament.cache_key(*hashes, 7, a_side),
+                                        "match": [7, a_side, 1, 2, 3, None]}) + "\n")
+            matches = tournament.run_tournament(main.__file__, main.__file__, [7], cache_path=f"{path}/cache.jsonl")
+            self.assertEqual(matches, [tournament.Match(7, 0, 1, 2, 3, None), tournament.Match(7, 1, 1, 2, 3, None)])
+
+            # another version of extras.py, role or config plays them again
+            for name in ("main.py", "extras.py"):
+                with open(os.path.join(os.path.dirname(main.__file__), name)) as source, open(f"{path}/{name}", "w") as copy:
+                    copy.write(source.read())
+            self.assertEqual(tournament.source_hash(f"{path}/main.py"), hashes[0])
+            with open(f"{path}/extras.py", "a") as f:
+                f.write("\nTOUR_MAX_MS = 20\n")
+            self.assertNotEqual(tournament.source_hash(f"{path}/main.py"), hashes[0])
+            with open(f"{path}/config.json", "w") as f:
+                f.write("{}")
+            with mock.patch.dict(os.environ, {"UTG_ROLE": "MCTS"}):
+                self.assertNotEqual(tournament.setup_hash(), hashes[2])
+            with mock.patch.dict(os.environ, {"UTG_CONFIG": f"{path}/config.json"}):
+                setup = tournament.setup_hash()
+                with open(f"{path}/config.json", "w") as f:
+                    f.write('{"RICH_SCORING": 9}')
+                self.assertNotEqual(tournament.setup_hash(), setup)
+
+
+class TuneTestCase(unittest.TestCase):
+    def test_config_round_trip(self):
+        constants = {name: getattr(main, name) for name in main.TUNABLE_CONSTANTS}
+        config = tune.to_config(tune.from_config(constants))
+        self.assertEqual({name: tuple(v) if isinstance(v, list) else v for name, v in config.items()}, constants)
+
+
+class EvasionTestCase(unittest.TestCase):
+    def test_sprt_counts_differing_seeds_only(self):
+        test = evasion.Sprt("a", "b", delta=0.1, alpha=0.05)
+        arrived = evasion.Outcome(0, evasion.ARRIVED, 30, [])
+        caught = evasion.Outcome(0, evasion.CAUGHT, 10, [])
+        for _ in range(20):
+            test.add(arrived, arrived)
+            test.update()
+        self.assertIsNone(test.decision)
+        for _ in range(8):
+            test.add(caught, arrived)
+            test.update()
+        self.assertEqual(test.decision, "b")
+
+    def test_scenarios_are_deterministic(self):
+        first = evasion.play_scenario("simu", 3, referee.MONSTER_AGGRESSIVE_SPEED)
+        second = evasion.play_scenario("simu", 3, referee.MONSTER_AGGRESSIVE_SPEED)
+        self.assertEqual(first[:3], second[:3])
+
+
+@unittest.skipUnless(importlib.util.find_spec("numpy"), "numpy is not installed")
+class BatchEnvTestCase(unittest.TestCase):
+    def test_matches_referee(self):
+        import batch_env
+
+        self.assertEqual(batch_env.check_against_referee(range(8)), [])
+        self.assertEqual(batch_env.check_against_referee(range(8), batch_env.SinkerPolicy), [])
+
+
+@unittest.skipUnless(importlib.util.find_spec("numpy"), "numpy is not installed")
+class SimuCollisionTestCase(unittest.TestCase):
+    def test_batch_agrees_with_main_loop(self):
+        import numpy
+
+        # not importable by name, because of the hyphen
+        spec = importlib.util.spec_from_file_location("simu_collision", os.path.join(os.path.dirname(__file__), "simu-collision.py"))
+        simu = importlib.util.module_from_spec(spec)  # type:ignore
+        spec.loader.exec_module(simu)  # type:ignore
+        simu.log, simu.RENDER = (lambda *args, **kwargs: None), False
+        random_bots = simu.random_bots_batch(numpy.random.default_rng(1), 20)
+        success, turns = simu.play_batch(random_bots)
+        serial = [simu.main_loop(random_bots=[tuple(map(int, b)) for b in bots]) for bots in random_bots]
+        self.assertEqual(serial, [int(s) for s in success])
+        self.assertTrue(0 < sum(serial) < 20)
+
+
+@unittest.skipUnless(importlib.util.find_spec("numpy"), "numpy is not installed")
+class TelemetryTestCase(unittest.TestCase):
+    def test_referee_game_round_trip(self):
+        import telemetry
+
+        with tempfile.TemporaryDirectory() as path:
+            writer = telemetry.TelemetryWriter(path, chunk_rows=100)
+            result = referee.play_game(7, [referee.EngineBot(main, writer, "p0"), referee.EngineBot(main)])
+            writer.close()
+            columns = telemetry.load(path)
+            self.assertEqual(columns["meta"]["rows"], 2 * result.turns)
+            self.assertEqual(list(columns["turn"][:4]), [0, 0, 1, 1])
+            self.assertEqual(list(columns["drone_id"][:2]), [0, 2])
+            self.assertTrue((columns["y"] >= 0).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
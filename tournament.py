@@ -0,0 +1,183 @@
+# Self-play tournament between two versions of the bot, on the local referee.
+#
+# Every seed is played twice with the sides swapped, on all cores. Results are cached by
+# the hash of both bot sources (with their extras.py), of the referee and of the bot settings
+# in the environment (UTG_ROLE, UTG_CONFIG and the config file), and the seed, so re-running
+# a comparison after a change only plays the games that are new:
+#
+#   mkdir /tmp/before; cp main.py extras.py /tmp/before; <edit main.py>
+#   python tournament.py main.py /tmp/before/main.py --games 200
+#   python tournament.py main.py /tmp/before/main.py --games 400   # plays the 200 new seeds only
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from referee import EngineBot, play_game
+from replay import bot_sources, load_bot
+
+DEFAULT_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".tournament_cache.jsonl")
+REFEREE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "referee.py")
+SETUP_ENVIRONMENT = ("UTG_ROLE", "UTG_CONFIG")  # read by both bots when they are loaded
+Z_95 = 1.96
+
+
+class Match(NamedTuple):
+    # one game, from the point of view of bot A
+    seed: int
+    a_side: int  # player index of bot A
+    a_score: int
+    b_score: int
+    turns: int
+    error: Optional[str]
+
+    def points(self) -> float:
+        # 1 for a win of A, 0.5 for a draw
+        if self.error:
+            # the crashing bot loses, whatever the scores
+            return 0.0 if self.error.startswith(f"player {self.a_side} ") else 1.0
+        return 1.0 if self.a_score > self.b_score else 0.5 if self.a_score == self.b_score else 0.0
+
+
+def source_hash(path: str) -> str:
+    # the bot file and its extras.py
+    digest = hashlib.sha1()
+    for source in bot_sources(path):
+        with open(source, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def setup_hash() -> str:
+    # what else the games depend on: the referee and the bot settings of the environment
+    digest = hashlib.sha1()
+    with open(REFEREE_PATH, "rb") as f:
+        digest.update(f.read())
+    for name in SETUP_ENVIRONMENT:
+        digest.update(f"{name}={os.environ.get(name, '')}\n".encode())
+    config_path = os.environ.get("UTG_CONFIG")
+    if config_path:
+        with open(config_path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def cache_key(hash_a: str, hash_b: str, setup: str, seed: int, a_side: int) -> str:
+    return f"{hash_a}:{hash_b}:{setup}:{seed}:{a_side}"
+
+
+def load_cache(path: str) -> Dict[str, Match]:
+    cache = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                entry = json.loads(line)
+                cache[entry["key"]] = Match(*entry["match"])
+    return cache
+
+
+def play_match(bot_a: str, bot_b: str, seed: int, a_side: int) -> Match:
+    # runs in a worker process
+    modules = [load_bot(bot_a), load_bot(bot_b)]
+    for module in modules:
+        module.DEBUG_ENABLED = False
+    if a_side == 1:
+        modules.reverse()
+    result = play_game(seed, [EngineBot(m) for m in modules])
+    return Match(seed, a_side, result.scores[a_side], result.scores[1 - a_side], result.turns, result.error)
+
+
+def run_tournament(bot_a: str, bot_b: str, seeds: List[int], workers: Optional[int] = None,
+                   cache_path: str = DEFAULT_CACHE) -> List[Match]:
+    hash_a, hash_b, setup = source_hash(bot_a), source_hash(bot_b), setup_hash()
+    cache = load_cache(cache_path)
+    jobs = [(seed, a_side) for seed in seeds for a_side in (0, 1)]
+    todo = [job for job in jobs if cache_key(hash_a, hash_b, setup, *job) not in cache]
+    print(f"{len(jobs) - len(todo)} games cached, {len(todo)} to play", file=sys.stderr)
+    if todo:
+        start = time.perf_counter()
+        with ProcessPoolExecutor(workers) as pool, open(cache_path, "a") as f:
+            futures = [pool.submit(play_match, bot_a, bot_b, seed, a_side) for seed, a_side in todo]
+            for done, future in enumerate(futures, 1):
+                match = future.result()
+                key = cache_key(hash_a, hash_b, setup, match.seed, match.a_side)
+                cache[key] = match
+                # written as they come, an interrupted run keeps what it played
+                f.write(json.dumps({"key": key, "match": list(match)}) + "\n")
+                f.flush()
+                if done % 50 == 0:
+                    print(f"{done}/{len(todo)} games", file=sys.stderr)
+        elapsed = time.perf_counter() - start
+        print(f"played {len(todo)} games in {elapsed:.1f}s ({len(todo) / elapsed:.1f} games/s)", file=sys.stderr)
+    return [cache[cache_key(hash_a, hash_b, setup, *job)] for job in jobs]
+
+
+#===========================================================================
+#                            Report
+#===========================================================================
+
+def mean_ci(values: List[float]) -> Tuple[float, float]:
+    # mean and half-width of its 95% confidence interval
+    mean = statistics.mean(values)
+    if len(values) < 2:
+        return mean, math.inf
+    return mean, Z_95 * statistics.stdev(values) / math.sqrt(len(values))
+
+
+def paired_points(matches: List[Match]) -> List[float]:
+    # side-swapped games of a seed are one sample: the map's own bias cancels out
+    by_seed: Dict[int, List[float]] = {}
+    for m in matches:
+        by_seed.setdefault(m.seed, []).append(m.points())
+    return [statistics.mean(points) for points in by_seed.values()]
+
+
+def quantiles(values: List[int]) -> str:
+    values = sorted(values)
+
+    def q(p):
+        return values[min(len(values) - 1, int(len(values) * p))]
+
+    return f"min {values[0]} p10 {q(0.1)} p50 {q(0.5)} p90 {q(0.9)} max {values[-1]}"
+
+
+def print_report(matches: List[Match], name_a: str, name_b: str, out=sys.stdout):
+    wins = len([m for m in matches if m.points() == 1])
+    draws = len([m for m in matches if m.points() == 0.5])
+    rate, rate_ci = mean_ci(paired_points(matches))
+    diff, diff_ci = mean_ci([m.a_score - m.b_score for m in matches])
+    print(f"{name_a} vs {name_b}: {len(matches)} games, {wins} wins, {draws} draws, {len(matches) - wins - draws} losses", file=out)
+    print(f"win rate {rate:.1%} +/- {rate_ci:.1%} (95%, side-swapped pairs)", file=out)
+    print(f"score difference {diff:+.1f} +/- {diff_ci:.1f}", file=out)
+    print(f"{name_a} scores: {quantiles([m.a_score for m in matches])}", file=out)
+    print(f"{name_b} scores: {quantiles([m.b_score for m in matches])}", file=out)
+    print(f"turns: {quantiles([m.turns for m in matches])}", file=out)
+    errors = [m for m in matches if m.error]
+    for m in errors[:10]:
+        print(f"seed {m.seed} ({name_a} is player {m.a_side}): {m.error}", file=out)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Play bot A against bot B on the local referee")
+    parser.add_argument("bot_a")
+    parser.add_argument("bot_b")
+    parser.add_argument("--games", type=int, default=100, help="seeds, each played on both sides")
+    parser.add_argument("--seed", type=int, default=0, help="first seed")
+    parser.add_argument("--workers", type=int, help="processes, all cores by default")
+    parser.add_argument("--cache", default=DEFAULT_CACHE)
+    args = parser.parse_args(argv)
+
+    seeds = list(range(args.seed, args.seed + args.games))
+    matches = run_tournament(args.bot_a, args.bot_b, seeds, args.workers, args.cache)
+    print_report(matches, os.path.basename(args.bot_a), os.path.basename(args.bot_b))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# Tune the strategy constants of the bot on the local referee.
+#
+# The constants listed in main.TUNABLE_CONSTANTS form the parameter vector. Each candidate
+# plays against the bot with its current constants, on the same seeds for every candidate
+# (common random numbers: the differences between candidates are not drowned by the maps)
+# and on both sides, over a process pool. The search starts with random samples of the
+# whole ranges, then samples around the best candidate with a shrinking step, (1+1)-ES style.
+#
+# Every evaluation is appended to the checkpoint: re-running the same command resumes.
+# The best candidate is written as a config the bot loads with UTG_CONFIG=<file>:
+#
+#   python tune.py --candidates 60 --seeds 30
+#   UTG_CONFIG=tune_best.json python main.py
+#   python tune.py --candidates 100 --seeds 30      # 40 more, same checkpoint
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from referee import EngineBot, play_game
+from replay import BOT_PATH, load_bot
+
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tune_checkpoint.jsonl")
+DEFAULT_BEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tune_best.json")
+RANDOM_CANDIDATES = 12  # before sampling around the best
+INITIAL_STEP = 0.25  # fraction of each range
+MIN_STEP = 0.03
+
+
+class Parameter(NamedTuple):
+    name: str  # "NAME[1]" for an element of a tuple constant
+    low: float
+    high: float
+    integer: bool
+
+
+# only constants the default role reads: FAST_MAX_DEPTH (FAST role) is left out
+PARAMETERS = [
+    Parameter("RICH_SCORING", 3, 20, True),
+    Parameter("RUSH_DISTANCE_WITH_FOE", 200, 2500, True),
+    Parameter("ABOVE_UNSCANNED_FISH_COEFFICIENT", 0.5, 4.0, False),
+    Parameter("FEUILLE_MORTE_CROSSING_DEPTH_EARLY", 6000, 9000, True),
+    Parameter("FEUILLE_MORTE_CROSSING_DEPTH", 7000, 9500, True),
+    Parameter("LIGHT_MONSTER_RISK", 0, 1.5, False),
+    Parameter("LIGHT_BATTERY_VALUE", 0, 0.2, False),
+    Parameter("SAFETY_WEIGHT", 0, 2000, False),
+]
+
+
+#===========================================================================
+#                            Parameter vector
+#===========================================================================
+
+def to_config(vector: List[float]) -> Dict[str, object]:
+    # vector in [0, 1] per parameter -> constants for the bot
+    config: Dict[str, object] = {}
+    elements: Dict[str, Dict[int, object]] = {}
+    for p, u in zip(PARAMETERS, vector):
+        value = p.low + u * (p.high - p.low)
+        value = int(round(value)) if p.integer else round(value, 3)
+        if p.name.endswith("]"):
+            name, index = p.name[:-1].split("[")
+            elements.setdefault(name, {})[int(index)] = value
+        else:
+            config[p.name] = value
+    for name, values in elements.items():
+        config[name] = [values[i] for i in sorted(values)]
+    return config
+
+
+def from_config(config: Dict[str, object]) -> List[float]:
+    vector = []
+    for p in PARAMETERS:
+        if p.name.endswith("]"):
+            name, index = p.name[:-1].split("[")
+            value = config[name][int(index)]  # type:ignore
+        else:
+            value = config[p.name]
+        vector.append(min(1.0, max(0.0, (value - p.low) / (p.high - p.low))))  # type:ignore
+    return vector
+
+
+def apply_config(bot, config: Dict[str, object]):
+    for name, value in config.items():
+        setattr(bot, name, tuple(value) if isinstance(value, list) else value)
+
+
+#===========================================================================
+#                            Evaluation
+#===========================================================================
+
+def play_candidate(bot_path: str, config: Dict[str, object], seed: int, side: int) -> Tuple[int, int]:
+    # runs in a worker process: (candidate score, reference score)
+    candidate = load_bot(bot_path, instance="_candidate")
+    reference = load_bot(bot_path)
+    for bot in (candidate, reference):
+        bot.DEBUG_ENABLED = False
+    apply_config(candidate, config)
+    bots = [EngineBot(candidate), EngineBot(reference)]
+    if side == 1:
+        bots.reverse()
+    result = play_game(seed, bots)
+    if result.error:
+        # a crash loses the game by a wide margin
+        crashed = int(result.error.split()[1])
+        return (0, 100) if crashed == side else (100, 0)
+    return result.scores[side], result.scores[1 - side]
+
+
+class Evaluation(NamedTuple):
+    vector: List[float]
+    config: Dict[str, object]
+    score_diff: float  # mean candidate - reference score, the fitness
+    win_rate: float
+
+
+def evaluate(pool: ProcessPoolExecutor, bot_path: str, vector: List[float], seeds: List[int]) -> Evaluation:
+    config = to_config(vector)
+    futures = [pool.submit(play_candidate, bot_path, config, seed, side) for seed in seeds for side in (0, 1)]
+    games = [f.result() for f in futures]
+    diffs = [a - b for a, b in games]
+    wins = [1.0 if d > 0 else 0.5 if d == 0 else 0.0 for d in diffs]
+    return Evaluation(vector, config, statistics.mean(diffs), statistics.mean(wins))
+
+
+#===========================================================================
+#                            Search
+#===========================================================================
+
+def load_checkpoint(path: str, seeds: List[int]) -> List[Evaluation]:
+    evaluations = []
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                entry = json.loads(line)
+                # only comparable with the same seeds
+                if entry["seeds"] == seeds:
+                    evaluations.append(Evaluation(entry["vector"], entry["config"], entry["score_diff"], entry["win_rate"]))
+    return evaluations
+
+
+def current_vector(bot_path: str) -> List[float]:
+    bot = load_bot(bot_path)
+    return from_config({name: getattr(bot, name) for name in bot.TUNABLE_CONSTANTS})
+
+
+def propose(i: int, search_seed: int, evaluations: List[Evaluation], start: List[float]) -> List[float]:
+    # candidate i only depends on i and on the evaluations before it: resuming gives the same run
+    rng = random.Random(f"{search_seed}:{i}")
+    if i == 0:
+        # the current constants, should score about even
+        return start
+    if i < RANDOM_CANDIDATES or not evaluations:
+        return [rng.random() for _ in PARAMETERS]
+    best = max(evaluations, key=lambda e: e.score_diff)
+    # shrink the step as the search goes on
+    step = max(MIN_STEP, INITIAL_STEP * (0.97 ** (i - RANDOM_CANDIDATES)))
+    return [min(1.0, max(0.0, u + rng.gauss(0, step))) for u in best.vector]
+
+
+def tune(bot_path: str, candidates: int, seeds: List[int], search_seed: int, checkpoint: str,
+         workers: Optional[int] = None) -> List[Evaluation]:
+    evaluations = load_checkpoint(checkpoint, seeds)
+    start = current_vector(bot_path)
+    if evaluations:
+        print(f"resuming after {len(evaluations)} candidates", file=sys.stderr)
+    with ProcessPoolExecutor(workers) as pool, open(checkpoint, "a") as f:
+        for i in range(len(evaluations), candidates):
+            e = evaluate(pool, bot_path, propose(i, search_seed, evaluations, start), seeds)
+            evaluations.append(e)
+            f.write(json.dumps({"seeds": seeds, **e._asdict()}) + "\n")
+            f.flush()
+            best = max(evaluations, key=lambda e: e.score_diff)
+            print(f"#{i}: score diff {e.score_diff:+.2f}, win rate {e.win_rate:.0%}"
+                  f" (best {best.score_diff:+.2f})", file=sys.stderr)
+    return evaluations
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Tune the bot's strategy constants on the local referee")
+    parser.add_argument("--bot", default=BOT_PATH)
+    parser.add_argument("--candidates", type=int, default=50, help="total, including the checkpointed ones")
+    parser.add_argument("--seeds", type=int, default=20, help="maps per candidate, each played on both sides")
+    parser.add_argument("--first-seed", type=int, default=1000)
+    parser.add_argument("--search-seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="processes, all cores by default")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--output", default=DEFAULT_BEST, help="best config, for UTG_CONFIG")
+    args = parser.parse_args(argv)
+
+    seeds = list(range(args.first_seed, args.first_seed + args.seeds))
+    evaluations = tune(args.bot, args.candidates, seeds, args.search_seed, args.checkpoint, args.workers)
+    best = max(evaluations, key=lambda e: e.score_diff)
+    with open(args.output, "w") as f:
+        json.dump(best.config, f, indent=1)
+    print(f"best: score diff {best.score_diff:+.2f}, win rate {best.win_rate:.0%}, written to {args.output}")
+    # for the submission, which is a single file
+    for name, value in best.config.items():
+        print(f"{name} = {tuple(value) if isinstance(value, list) else value}")
+
+
+if __name__ == "__main__":
+    main()